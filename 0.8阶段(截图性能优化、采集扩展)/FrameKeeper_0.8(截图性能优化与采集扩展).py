@@ -0,0 +1,6272 @@
+# 导入相关模块
+import re  # 正则表达式
+import os  # 操作系统接口 - 文件和目录操作
+import sys  # 系统相关功能 - 命令行参数、退出程序等
+import cv2  # OpenCV 库 - 计算机视觉和图像处理
+import time  # 时间相关功能 - 延时、计时等
+import io  # 内存字节流 - 截图编码
+import json  # JSON 读写 - 截图计数清单
+import queue  # 队列 - 线程间通信
+import psutil  # 内存监控
+import ctypes  # C语言兼容库 - 调用 Windows API
+import shutil  # 高级文件操作 - 复制、移动、删除等
+import struct  # 二进制打包 - 帧包索引记录
+import pystray  # 系统托盘图标创建和管理
+import tempfile  # 临时文件和目录管理
+import threading  # 多线程编程支持
+import multiprocessing  # 多进程 - 独立截图进程
+from multiprocessing import shared_memory  # 共享内存 - 向其它进程发布原始画面
+import gc  # 垃圾回收 - 内存分配自测
+import tracemalloc  # 内存分配跟踪 - 内存分配自测
+import subprocess  # 子进程管理 - 运行外部程序
+import http.server  # HTTP 服务 - 本地请求触发截图
+import urllib.parse  # URL 解析 - 本地请求触发截图
+import html  # HTML 转义 - 实时预览页面
+import webbrowser  # 打开浏览器 - 实时预览
+import secrets  # 安全随机数 - 实时预览的访问密钥
+import numpy as np  # 数组和矩阵处理 - 数值计算
+import configparser  # 配置文件解析器
+import tkinter as tk  # GUI 工具包 - 创建图形界面
+import concurrent.futures  # 并发编程 - 线程池和进程池
+from collections import deque  # 双端队列 - 固定长度的滚动统计
+from datetime import datetime, timedelta  # 时间处理
+from pystray import MenuItem as item  # 系统托盘菜单项
+from PIL import Image, ImageGrab, ImageDraw, ImageFilter, features  # Python 图像处理库 - 图像捕获、编辑等
+from tkinter import ttk, filedialog, messagebox, simpledialog  # Tkinter 扩展组件 - 文件对话框、消息框等
+try:
+    import winreg as reg  # Windows 注册表操作
+except ImportError:  # 非 Windows 系统没有注册表，开机自启功能不可用
+    reg = None
+try:
+    import mss  # 可选依赖：高速截屏库（Windows 下使用 BitBlt，Linux 下使用 XShm）
+except ImportError:
+    mss = None
+try:
+    import turbojpeg  # 可选依赖：PyTurboJPEG，直接调用 libjpeg-turbo 编码 JPG
+except ImportError:
+    turbojpeg = None
+try:
+    import qoi  # 可选依赖：QOI 编码库（未安装时不能选择 QOI 格式，PIL 只能读取 QOI，不能编码）
+except ImportError:
+    qoi = None
+
+exception_queue = queue.Queue()  # 全局变量，用于在多线程中传递异常
+
+'''项目目录结构'''
+# 每个项目可以选择两种目录结构之一（保存在项目文件夹的 .framekeeper_project.json 中）：
+# 编号子文件夹：截图保存在 1、2、3… 编号的子文件夹中，每个子文件夹最多 10000 张，需要计数才能决定何时换文件夹；
+# 按日期/小时：截图保存在 日期/小时 文件夹中（如 2024-05-01/09），文件夹只由截图时刻决定，按时间查找时可以整个跳过无关的文件夹
+NUMBERED_LAYOUT = "编号子文件夹"
+TIME_SHARDED_LAYOUT = "按日期/小时"
+PROJECT_LAYOUTS = (NUMBERED_LAYOUT, TIME_SHARDED_LAYOUT)
+PROJECT_SETTINGS_FILE = ".framekeeper_project.json"  # 项目设置文件名（保存在项目文件夹中）
+TIME_SHARD_DATE_FORMAT = "%Y-%m-%d"  # 按日期/小时结构中日期文件夹的名称格式
+
+# 定义函数：读取项目的目录结构（旧项目没有项目设置文件，使用编号子文件夹）
+def load_project_layout(project_path):
+    try:
+        with open(os.path.join(project_path, PROJECT_SETTINGS_FILE), "r", encoding="utf-8") as f:
+            layout = json.load(f).get("layout")
+    except (OSError, ValueError, AttributeError):
+        return NUMBERED_LAYOUT
+    return layout if layout in PROJECT_LAYOUTS else NUMBERED_LAYOUT
+
+# 定义函数：保存项目的目录结构
+def save_project_layout(project_path, layout):
+    settings_path = os.path.join(project_path, PROJECT_SETTINGS_FILE)
+    with open(settings_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"layout": layout}, f, ensure_ascii=False)
+    os.replace(settings_path + ".tmp", settings_path)
+
+# 定义函数：获取按日期/小时结构中某个文件夹覆盖的时间范围 (开始, 结束)，不是日期或小时文件夹时返回 None
+def get_time_shard_range(parent_path, name):
+    try:
+        day = datetime.strptime(name, TIME_SHARD_DATE_FORMAT)
+        return day, day + timedelta(days=1)
+    except ValueError:
+        pass
+    if len(name) == 2 and name.isdigit() and int(name) < 24:
+        try:
+            day = datetime.strptime(os.path.basename(parent_path), TIME_SHARD_DATE_FORMAT)
+        except ValueError:
+            return None
+        start = day + timedelta(hours=int(name))
+        return start, start + timedelta(hours=1)
+    return None
+
+# 定义函数：在 os.walk 中剔除与时间范围 [start, end] 无关的日期/小时文件夹，不再进入这些文件夹列出文件
+def prune_time_shards(dirpath, dirnames, start, end):
+    kept = []
+    for name in dirnames:
+        shard = get_time_shard_range(dirpath, name)
+        if shard is None or (shard[1] > start and shard[0] <= end):
+            kept.append(name)
+    dirnames[:] = kept
+
+# 项目文件夹结构：截图的保存位置和计数。项目文件夹（全屏画面流）和其它画面流的文件夹共用这套规则
+class NumberedCaptureFolders:
+    MAX_FILES_PER_SUBFOLDER = 10000  # 每个子文件夹最多保存的截图数量
+    layout = NUMBERED_LAYOUT  # 目录结构（由 initialize_folder_counter 从项目设置中读取）
+    current_shard = None  # 按日期/小时结构下最近使用的 日期/小时 文件夹
+
+    # 定义函数：获取采集根目录（由子类实现）
+    def get_capture_root(self):
+        raise NotImplementedError
+
+    # 定义函数：获取所属项目的文件夹（由子类实现）
+    def get_project_path(self):
+        raise NotImplementedError
+
+    # 定义函数：获取某一时刻的截图应保存的文件夹（确保存在）
+    def get_save_path_for(self, timestamp):
+        if self.layout != TIME_SHARDED_LAYOUT:
+            return self.ensure_current_save_path()
+        shard = time.strftime(TIME_SHARD_DATE_FORMAT, time.localtime(timestamp)), time.strftime("%H", time.localtime(timestamp))
+        save_path = os.path.join(self.get_capture_root(), *shard)
+        if shard != self.current_shard or not os.path.isdir(save_path):  # 只由截图时刻决定，换小时时才创建文件夹
+            os.makedirs(save_path, exist_ok=True)
+            self.current_shard = shard
+        return save_path
+
+    # 定义函数：获取正在写入的文件夹（按日期/小时结构下为最近使用的小时文件夹，还没有写入时为 None）
+    def get_active_folder(self):
+        if self.layout == TIME_SHARDED_LAYOUT:
+            return os.path.join(self.get_capture_root(), *self.current_shard) if self.current_shard else None
+        return self.get_current_save_path()
+
+    # 定义函数：切换到新的子文件夹后调用（由子类按需实现）
+    def on_subfolder_changed(self):
+        pass
+
+    # 定义函数：获取当前保存路径
+    def get_current_save_path(self):  # 定义获取当前路径方法
+        return os.path.join(self.get_capture_root(), self.current_subfolder)  # 返回当前子文件夹完整路径
+
+    # 定义函数：确保当前保存路径存在
+    def ensure_current_save_path(self):
+        current_path = self.get_current_save_path()
+        if not os.path.isdir(current_path):  # 当前子文件夹不存在，说明项目或子文件夹在外部被删除
+            self.initialize_folder_counter()  # 只在检测到外部删除时才重新与磁盘核对
+            current_path = self.get_current_save_path()
+            os.makedirs(current_path, exist_ok=True)
+        return current_path
+
+    # 定义函数：增加文件计数并检查是否需要创建新文件夹
+    def increment_file_count(self):  # 定义文件计数增加方法
+        if self.layout == TIME_SHARDED_LAYOUT:
+            return  # 按日期/小时结构由截图时刻决定文件夹，不需要计数
+        self.current_file_count = self.manifest.increment(self.current_subfolder)  # 使用内存计数，无需重新列出文件夹
+        if self.current_file_count >= self.MAX_FILES_PER_SUBFOLDER:  # 检查是否达到文件上限
+            new_folder = str(int(self.current_subfolder) + 1)  # 计算新文件夹编号
+            self.current_subfolder = new_folder  # 更新子文件夹名
+            self.current_file_count = 0  # 重置文件计数器
+            os.makedirs(self.get_current_save_path(), exist_ok=True)  # 创建新子文件夹
+            self.manifest.reset(new_folder)  # 在清单中登记新子文件夹
+            self.manifest.save()  # 换文件夹时立即持久化清单
+            self.on_subfolder_changed()
+
+    # 定义函数：将截图计数清单写入磁盘
+    def flush_manifest(self):
+        if self.manifest is not None:
+            self.manifest.save()
+
+    # 定义函数：初始化文件夹计数器
+    def initialize_folder_counter(self):
+        '''确保采集根目录存在'''
+        root_path = self.get_capture_root()
+        if not os.path.exists(root_path):  # 如果采集根目录不存在
+            os.makedirs(root_path)  # 创建采集根目录
+        self.layout = load_project_layout(self.get_project_path())  # 读取项目的目录结构
+        self.current_shard = None
+
+        '''切换项目前先保存旧项目的清单，然后载入当前项目的清单'''
+        if self.manifest is not None and self.manifest.project_path != root_path:
+            self.manifest.save()
+        self.manifest = CaptureManifest(root_path)
+        if self.layout == TIME_SHARDED_LAYOUT:
+            return  # 按日期/小时结构不需要编号子文件夹和计数
+
+        subfolders = [f for f in os.listdir(root_path) if os.path.isdir(os.path.join(root_path, f)) and f.isdigit()]  # 列出所有数字命名的子文件夹
+
+        '''如果没有子文件夹，初始化为第一个子文件夹'''
+        if not subfolders:  # 如果不存在子文件夹
+            self.current_subfolder = "1"  # 初始化第一个子文件夹名
+            self.current_file_count = 0  # 初始化文件计数器
+            os.makedirs(self.get_current_save_path(), exist_ok=True)  # 创建初始子文件夹
+            self.manifest.reset("1")  # 清单从第一个子文件夹重新开始
+            self.manifest.save()
+            self.on_subfolder_changed()  # 保存当前文件夹编号
+            return  # 结束函数  # 直接返回
+
+        '''找到编号最大的子文件夹'''
+        max_folder = max(subfolders, key=int)  # 找到编号最大的子文件夹
+        self.manifest.retain(subfolders)  # 移除清单中已被外部删除的子文件夹
+
+        '''与磁盘核对截图数量（目录未变化时直接使用清单中的计数）'''
+        self.current_file_count = self.manifest.sync_subfolder(max_folder)
+        self.current_subfolder = max_folder
+
+        '''如果文件数量达到上限，创建新文件夹'''
+        if self.current_file_count >= self.MAX_FILES_PER_SUBFOLDER:  # 如果文件数达到上限
+            new_folder = str(int(max_folder) + 1)  # 计算新文件夹编号
+            self.current_subfolder = new_folder  # 更新当前子文件夹名
+            self.current_file_count = 0  # 重置文件计数器
+            os.makedirs(self.get_current_save_path(), exist_ok=True)  # 创建新子文件夹
+            self.manifest.reset(new_folder)
+
+        self.manifest.save()  # 保存清单
+        self.on_subfolder_changed()  # 保存配置
+
+'''配置管理'''
+class Config(NumberedCaptureFolders):
+    DEFAULT_INTERVAL = 10
+    MIN_INTERVAL = 0.03  # 最小截图间隔（秒），约 30 张/秒
+    DEFAULT_PROJECT_NAME = "默认项目"
+    DEFAULT_FORMAT = "JPG"
+    DEFAULT_JPG_QUALITY = 75
+    DEFAULT_VIDEO_QUALITY = "平衡"
+    DEFAULT_CURRENT_SUBFOLDER = "1"
+    DEFAULT_AUTO_START = False
+    DEFAULT_CAPTURE_BACKEND = "ImageGrab"
+    DEFAULT_MISSED_TICK_POLICY = "跳过"
+    DEFAULT_DUPLICATE_MODE = "关闭"
+    DEFAULT_DUPLICATE_THRESHOLD = 2
+    DEFAULT_STORAGE_MODE = "图片"
+    DEFAULT_RECORD_FPS = 30
+    DEFAULT_VIDEO_SEGMENT_MINUTES = 60
+    DEFAULT_RING_BUFFER_SECONDS = 300
+    DEFAULT_RING_BUFFER_MEMORY_MB = 512
+    DEFAULT_INTERVAL_MODE = "固定"
+    DEFAULT_ADAPTIVE_MIN_INTERVAL = 1.0
+    DEFAULT_ADAPTIVE_MAX_INTERVAL = 30.0
+    DEFAULT_CAPTURE_STREAMS = "全屏"
+    DEFAULT_PACK_MAX_MB = 256
+    DEFAULT_PACK_MAX_MINUTES = 60
+    DEFAULT_QUALITY_MODE = "固定"
+    DEFAULT_DUAL_RATE_CAPTURE = False
+    DEFAULT_LOAD_SHEDDING = "关闭"
+    DEFAULT_CPU_SHED_PERCENT = 90
+    DEFAULT_CAPTURE_PROCESS = False
+    DEFAULT_PROJECT_QUOTA_GB = 0.0
+    DEFAULT_GLOBAL_QUOTA_GB = 0.0
+    DEFAULT_QUOTA_ACTION = "删除最旧截图"
+    DEFAULT_STAGING_PATH = ""
+    DEFAULT_STAGING_FLUSH_SECONDS = 10
+    DEFAULT_TRIGGER_WATCH_PATH = ""
+    DEFAULT_TRIGGER_HTTP_PORT = 0
+    DEFAULT_TRIGGER_WINDOW_CHANGE = False
+    DEFAULT_TRIGGER_DEBOUNCE_SECONDS = 2.0
+    DEFAULT_TRIGGER_MAX_PER_MINUTE = 30
+    DEFAULT_TRIGGER_BURST_COUNT = 1
+    DEFAULT_TRIGGER_BURST_INTERVAL = 0.2
+    DEFAULT_FRAME_BUS_ENABLED = False
+    DEFAULT_FRAME_BUS_NAME = "FrameKeeper"
+    DEFAULT_FRAME_BUS_SLOTS = 4
+    DEFAULT_PREVIEW_PORT = 0
+    DEFAULT_PREVIEW_ALLOW_REMOTE = False
+    DEFAULT_PREVIEW_KEY = ""
+    DEFAULT_THUMBNAIL_SCALE = 25
+    DEFAULT_FULL_FRAME_EVERY = 10
+    DEFAULT_TARGET_FRAME_KB = 150
+    DEFAULT_DAILY_BUDGET_MB = 2048
+
+    @staticmethod
+    def get_default_base_save_path():
+        return os.path.join(os.path.expanduser("~"), "FrameKeeper_Captures")
+
+    # 初始化配置类
+    def __init__(self, config_file):
+        self.config_file = config_file  # 配置文件路径
+        self.config = configparser.ConfigParser()  # 创建配置解析器
+        self.manifest = None  # 当前项目的截图计数清单（由 initialize_folder_counter 载入）
+        self.apply_default_settings()  # 应用程序默认设置
+        self.is_running = False  # 截图运行状态默认为不运行
+        self.load_config()  # 调用函数 load_config 加载配置文件
+        self.initialize_folder_counter()  # 初始化文件夹计数器
+
+    # 定义函数：应用程序默认设置
+    def apply_default_settings(self):
+        self.interval = float(self.DEFAULT_INTERVAL)  # 默认截图间隔为 10 秒（支持小数，最小约 0.03 秒）
+        self.base_save_path = self.get_default_base_save_path()  # 默认保存路径为用户目录下的 FrameKeeper_Captures 文件夹
+        self.project_name = self.DEFAULT_PROJECT_NAME  # 默认项目名称
+        self.project_path = os.path.join(self.base_save_path, self.project_name)  # 默认项目路径为保存路径下的默认项目文件夹
+        self.format = self.DEFAULT_FORMAT  # 默认图片格式为 JPG
+        self.jpg_quality = self.DEFAULT_JPG_QUALITY  # 默认 JPG 压缩质量为 75
+        self.video_quality = self.DEFAULT_VIDEO_QUALITY  # 默认视频质量为 平衡
+        self.current_subfolder = self.DEFAULT_CURRENT_SUBFOLDER  # 当前子文件夹名称
+        self.current_file_count = 0   # 当前子文件夹中的文件计数
+        self.auto_start = self.DEFAULT_AUTO_START  # 程序默认不开机自启
+        self.capture_backend = self.DEFAULT_CAPTURE_BACKEND  # 默认使用 PIL ImageGrab 采集屏幕
+        self.missed_tick_policy = self.DEFAULT_MISSED_TICK_POLICY  # 错过截图时间点时默认跳过
+        self.duplicate_mode = self.DEFAULT_DUPLICATE_MODE  # 重复帧处理方式，默认关闭
+        self.duplicate_threshold = self.DEFAULT_DUPLICATE_THRESHOLD  # 重复帧判定阈值（缩略指纹的最大灰度差）
+        self.storage_mode = self.DEFAULT_STORAGE_MODE  # 截图存储方式，默认保存为图片
+        self.record_fps = self.DEFAULT_RECORD_FPS  # 视频直录模式下视频的播放帧率
+        self.video_segment_minutes = self.DEFAULT_VIDEO_SEGMENT_MINUTES  # 视频直录模式下每个视频片段覆盖的截图时长（分钟）
+        self.ring_buffer_seconds = self.DEFAULT_RING_BUFFER_SECONDS  # 环形缓冲模式下保留最近多少秒的截图
+        self.ring_buffer_memory_mb = self.DEFAULT_RING_BUFFER_MEMORY_MB  # 环形缓冲最多占用的内存（MB）
+        self.interval_mode = self.DEFAULT_INTERVAL_MODE  # 截图间隔模式：固定间隔 / 根据画面变化自适应
+        self.adaptive_min_interval = self.DEFAULT_ADAPTIVE_MIN_INTERVAL  # 自适应模式的最小截图间隔（秒）
+        self.adaptive_max_interval = self.DEFAULT_ADAPTIVE_MAX_INTERVAL  # 自适应模式的最大截图间隔（秒）
+        self.capture_streams = self.DEFAULT_CAPTURE_STREAMS  # 画面流（多个用分号分隔），默认只截取整个主显示器
+        self.dual_rate_capture = self.DEFAULT_DUAL_RATE_CAPTURE  # 双速率截图：每次截图都保存缩略图，每隔几次才保存全分辨率截图
+        self.thumbnail_scale = self.DEFAULT_THUMBNAIL_SCALE  # 缩略图相对原图的比例（%）
+        self.full_frame_every = self.DEFAULT_FULL_FRAME_EVERY  # 每几次截图保存一张全分辨率截图
+        self.load_shedding = self.DEFAULT_LOAD_SHEDDING  # 截图跟不上或 CPU 占用过高时的降级方式
+        self.cpu_shed_percent = self.DEFAULT_CPU_SHED_PERCENT  # CPU 占用超过该百分比时开始降级
+        self.capture_process = self.DEFAULT_CAPTURE_PROCESS  # 是否在独立进程中截图
+        self.pack_max_mb = self.DEFAULT_PACK_MAX_MB  # 帧包存储模式下单个帧包的大小上限（MB）
+        self.pack_max_minutes = self.DEFAULT_PACK_MAX_MINUTES  # 帧包存储模式下单个帧包覆盖的截图时长（分钟）
+        self.quality_mode = self.DEFAULT_QUALITY_MODE  # 压缩质量模式：固定质量 / 按每帧目标大小 / 按每日空间预算自动调节
+        self.target_frame_kb = self.DEFAULT_TARGET_FRAME_KB  # 每帧目标大小（KB）
+        self.daily_budget_mb = self.DEFAULT_DAILY_BUDGET_MB  # 每日空间预算（MB）
+        self.project_quota_gb = self.DEFAULT_PROJECT_QUOTA_GB  # 当前项目的空间配额（GB），0 表示不限制
+        self.global_quota_gb = self.DEFAULT_GLOBAL_QUOTA_GB  # 程序储存目录下所有项目的空间配额（GB），0 表示不限制
+        self.quota_action = self.DEFAULT_QUOTA_ACTION  # 超出配额时：删除最旧截图 / 暂停截图
+        self.staging_path = self.DEFAULT_STAGING_PATH  # 本地暂存目录（为空表示直接写入项目文件夹）
+        self.staging_flush_seconds = self.DEFAULT_STAGING_FLUSH_SECONDS  # 每隔多少秒把暂存的截图批量搬运到项目文件夹
+        self.trigger_watch_path = self.DEFAULT_TRIGGER_WATCH_PATH  # 监视的目录，其中有文件出现或变化时截图（为空表示不监视）
+        self.trigger_http_port = self.DEFAULT_TRIGGER_HTTP_PORT  # 本机请求触发截图的端口（0 表示关闭）
+        self.trigger_window_change = self.DEFAULT_TRIGGER_WINDOW_CHANGE  # 前台窗口切换时截图
+        self.trigger_debounce_seconds = self.DEFAULT_TRIGGER_DEBOUNCE_SECONDS  # 同一个触发器两次触发之间至少间隔的时间（秒）
+        self.trigger_max_per_minute = self.DEFAULT_TRIGGER_MAX_PER_MINUTE  # 所有触发器每分钟最多触发的次数
+        self.trigger_burst_count = self.DEFAULT_TRIGGER_BURST_COUNT  # 每次触发连拍的张数
+        self.trigger_burst_interval = self.DEFAULT_TRIGGER_BURST_INTERVAL  # 连拍时每张之间的间隔（秒）
+        self.frame_bus_enabled = self.DEFAULT_FRAME_BUS_ENABLED  # 是否把每帧原始画面发布到共享内存
+        self.frame_bus_name = self.DEFAULT_FRAME_BUS_NAME  # 共享内存名称
+        self.frame_bus_slots = self.DEFAULT_FRAME_BUS_SLOTS  # 共享内存中保留最近几帧
+        self.preview_port = self.DEFAULT_PREVIEW_PORT  # 实时预览的 HTTP 端口（0 表示关闭）
+        self.preview_allow_remote = self.DEFAULT_PREVIEW_ALLOW_REMOTE  # 是否允许其它电脑访问实时预览
+        self.preview_key = self.DEFAULT_PREVIEW_KEY  # 允许其它电脑访问时，请求必须带上的访问密钥（?key=）
+
+    # 定义函数：重置配置为程序默认值
+    def reset_to_defaults(self):
+        self.apply_default_settings()
+        self.initialize_folder_counter()
+
+    # 定义函数：加载配置文件
+    def load_config(self):
+        if os.path.exists(self.config_file):  # 检查配置文件是否存在
+            self.config.read(self.config_file)  # 读取配置文件
+            self.interval = max(self.MIN_INTERVAL, self.config.getfloat("DEFAULT", "interval"))  # 获取截图间隔（兼容旧版的整数间隔）
+            self.base_save_path = self.config.get("DEFAULT", "base_save_path")  # 获取截图的储存位置
+            self.project_name = self.config.get("DEFAULT", "last_porject_name")  # 获取上次使用的项目名称
+            self.project_path = self.config.get("DEFAULT", "last_project_path")  # 获取上次使用的项目路径
+            self.current_subfolder = self.config.get("DEFAULT", "current_subfolder")  # 获取截图时间间隔
+            self.format = self.config.get("DEFAULT", "format")  # 获取图片格式
+            self.jpg_quality = self.config.getint("DEFAULT", "jpg_quality")  # 获取JPG压缩质量
+            self.video_quality = self.config.get("DEFAULT", "video_quality")  # 获取视频质量，默认为“平衡”
+            self.auto_start = self.config.getboolean("DEFAULT", "auto_start")  # 获取是否开机自启
+            self.capture_backend = self.config.get("DEFAULT", "capture_backend", fallback=self.DEFAULT_CAPTURE_BACKEND)  # 获取截图采集后端（旧版配置文件中没有此项）
+            self.missed_tick_policy = self.config.get("DEFAULT", "missed_tick_policy", fallback=self.DEFAULT_MISSED_TICK_POLICY)  # 获取错过截图时间点的处理策略
+            self.duplicate_mode = self.config.get("DEFAULT", "duplicate_mode", fallback=self.DEFAULT_DUPLICATE_MODE)  # 获取重复帧处理方式
+            self.duplicate_threshold = self.config.getint("DEFAULT", "duplicate_threshold", fallback=self.DEFAULT_DUPLICATE_THRESHOLD)  # 获取重复帧判定阈值
+            self.storage_mode = self.config.get("DEFAULT", "storage_mode", fallback=self.DEFAULT_STORAGE_MODE)  # 获取截图存储方式
+            self.record_fps = self.config.getint("DEFAULT", "record_fps", fallback=self.DEFAULT_RECORD_FPS)  # 获取视频直录的播放帧率
+            self.video_segment_minutes = self.config.getint("DEFAULT", "video_segment_minutes", fallback=self.DEFAULT_VIDEO_SEGMENT_MINUTES)  # 获取视频片段时长
+            self.ring_buffer_seconds = self.config.getint("DEFAULT", "ring_buffer_seconds", fallback=self.DEFAULT_RING_BUFFER_SECONDS)  # 获取环形缓冲时长
+            self.ring_buffer_memory_mb = self.config.getint("DEFAULT", "ring_buffer_memory_mb", fallback=self.DEFAULT_RING_BUFFER_MEMORY_MB)  # 获取环形缓冲内存上限
+            self.interval_mode = self.config.get("DEFAULT", "interval_mode", fallback=self.DEFAULT_INTERVAL_MODE)  # 获取截图间隔模式
+            self.adaptive_min_interval = self.config.getfloat("DEFAULT", "adaptive_min_interval", fallback=self.DEFAULT_ADAPTIVE_MIN_INTERVAL)  # 获取自适应最小间隔
+            self.adaptive_max_interval = self.config.getfloat("DEFAULT", "adaptive_max_interval", fallback=self.DEFAULT_ADAPTIVE_MAX_INTERVAL)  # 获取自适应最大间隔
+            self.capture_streams = self.config.get("DEFAULT", "capture_streams", fallback=self.DEFAULT_CAPTURE_STREAMS)  # 获取画面流设置
+            self.dual_rate_capture = self.config.getboolean("DEFAULT", "dual_rate_capture", fallback=self.DEFAULT_DUAL_RATE_CAPTURE)  # 获取是否双速率截图
+            self.thumbnail_scale = self.config.getint("DEFAULT", "thumbnail_scale", fallback=self.DEFAULT_THUMBNAIL_SCALE)  # 获取缩略图比例
+            self.full_frame_every = self.config.getint("DEFAULT", "full_frame_every", fallback=self.DEFAULT_FULL_FRAME_EVERY)  # 获取全分辨率截图的间隔次数
+            self.load_shedding = self.config.get("DEFAULT", "load_shedding", fallback=self.DEFAULT_LOAD_SHEDDING)  # 获取负载降级方式
+            self.cpu_shed_percent = self.config.getint("DEFAULT", "cpu_shed_percent", fallback=self.DEFAULT_CPU_SHED_PERCENT)  # 获取降级的 CPU 占用阈值
+            self.capture_process = self.config.getboolean("DEFAULT", "capture_process", fallback=self.DEFAULT_CAPTURE_PROCESS)  # 获取是否在独立进程中截图
+            self.pack_max_mb = self.config.getint("DEFAULT", "pack_max_mb", fallback=self.DEFAULT_PACK_MAX_MB)  # 获取帧包大小上限
+            self.pack_max_minutes = self.config.getint("DEFAULT", "pack_max_minutes", fallback=self.DEFAULT_PACK_MAX_MINUTES)  # 获取帧包时长
+            self.quality_mode = self.config.get("DEFAULT", "quality_mode", fallback=self.DEFAULT_QUALITY_MODE)  # 获取压缩质量模式
+            self.target_frame_kb = self.config.getint("DEFAULT", "target_frame_kb", fallback=self.DEFAULT_TARGET_FRAME_KB)  # 获取每帧目标大小
+            self.daily_budget_mb = self.config.getint("DEFAULT", "daily_budget_mb", fallback=self.DEFAULT_DAILY_BUDGET_MB)  # 获取每日空间预算
+            self.project_quota_gb = self.config.getfloat("DEFAULT", "project_quota_gb", fallback=self.DEFAULT_PROJECT_QUOTA_GB)  # 获取项目空间配额
+            self.global_quota_gb = self.config.getfloat("DEFAULT", "global_quota_gb", fallback=self.DEFAULT_GLOBAL_QUOTA_GB)  # 获取全部项目的空间配额
+            self.quota_action = self.config.get("DEFAULT", "quota_action", fallback=self.DEFAULT_QUOTA_ACTION)  # 获取超出配额时的处理方式
+            self.staging_path = self.config.get("DEFAULT", "staging_path", fallback=self.DEFAULT_STAGING_PATH)  # 获取本地暂存目录
+            self.staging_flush_seconds = self.config.getint("DEFAULT", "staging_flush_seconds", fallback=self.DEFAULT_STAGING_FLUSH_SECONDS)  # 获取暂存搬运间隔
+            self.trigger_watch_path = self.config.get("DEFAULT", "trigger_watch_path", fallback=self.DEFAULT_TRIGGER_WATCH_PATH)  # 获取触发截图的监视目录
+            self.trigger_http_port = self.config.getint("DEFAULT", "trigger_http_port", fallback=self.DEFAULT_TRIGGER_HTTP_PORT)  # 获取触发截图的本机端口
+            self.trigger_window_change = self.config.getboolean("DEFAULT", "trigger_window_change", fallback=self.DEFAULT_TRIGGER_WINDOW_CHANGE)  # 获取是否在前台窗口切换时截图
+            self.trigger_debounce_seconds = self.config.getfloat("DEFAULT", "trigger_debounce_seconds", fallback=self.DEFAULT_TRIGGER_DEBOUNCE_SECONDS)  # 获取触发去抖间隔
+            self.trigger_max_per_minute = self.config.getint("DEFAULT", "trigger_max_per_minute", fallback=self.DEFAULT_TRIGGER_MAX_PER_MINUTE)  # 获取每分钟最多触发次数
+            self.trigger_burst_count = self.config.getint("DEFAULT", "trigger_burst_count", fallback=self.DEFAULT_TRIGGER_BURST_COUNT)  # 获取每次触发连拍张数
+            self.trigger_burst_interval = self.config.getfloat("DEFAULT", "trigger_burst_interval", fallback=self.DEFAULT_TRIGGER_BURST_INTERVAL)  # 获取连拍间隔
+            self.frame_bus_enabled = self.config.getboolean("DEFAULT", "frame_bus_enabled", fallback=self.DEFAULT_FRAME_BUS_ENABLED)  # 获取是否发布到共享内存
+            self.frame_bus_name = self.config.get("DEFAULT", "frame_bus_name", fallback=self.DEFAULT_FRAME_BUS_NAME)  # 获取共享内存名称
+            self.frame_bus_slots = self.config.getint("DEFAULT", "frame_bus_slots", fallback=self.DEFAULT_FRAME_BUS_SLOTS)  # 获取共享内存帧数
+            self.preview_port = self.config.getint("DEFAULT", "preview_port", fallback=self.DEFAULT_PREVIEW_PORT)  # 获取实时预览端口
+            self.preview_allow_remote = self.config.getboolean("DEFAULT", "preview_allow_remote", fallback=self.DEFAULT_PREVIEW_ALLOW_REMOTE)  # 获取是否允许其它电脑访问实时预览
+            self.preview_key = self.config.get("DEFAULT", "preview_key", fallback=self.DEFAULT_PREVIEW_KEY)  # 获取实时预览的访问密钥
+            if self.preview_allow_remote and not self.preview_key:  # 手动修改配置文件开启了远程访问时生成访问密钥
+                self.preview_key = secrets.token_urlsafe(16)
+                self.save_config()
+        else:  # 如果配置文件不存在，则使用默认值
+            self.save_config()  # 调用函数 save_config 保存一个默认配置文件到配置文件目录
+
+    # 定义函数：保存配置到文件
+    def save_config(self):
+        # ConfigParser expects string values for each option
+        self.config["DEFAULT"] = {
+            "interval": str(self.interval),
+            "base_save_path": str(self.base_save_path),
+            "last_porject_name": str(self.project_name),
+            "last_project_path": str(self.project_path),
+            "current_subfolder": str(self.current_subfolder),
+            "format": str(self.format),
+            "jpg_quality": str(self.jpg_quality),
+            "video_quality": str(self.video_quality),
+            "auto_start": str(self.auto_start),
+            "capture_backend": str(self.capture_backend),
+            "missed_tick_policy": str(self.missed_tick_policy),
+            "duplicate_mode": str(self.duplicate_mode),
+            "duplicate_threshold": str(self.duplicate_threshold),
+            "storage_mode": str(self.storage_mode),
+            "record_fps": str(self.record_fps),
+            "video_segment_minutes": str(self.video_segment_minutes),
+            "ring_buffer_seconds": str(self.ring_buffer_seconds),
+            "ring_buffer_memory_mb": str(self.ring_buffer_memory_mb),
+            "interval_mode": str(self.interval_mode),
+            "adaptive_min_interval": str(self.adaptive_min_interval),
+            "adaptive_max_interval": str(self.adaptive_max_interval),
+            "capture_streams": str(self.capture_streams),
+            "dual_rate_capture": str(self.dual_rate_capture),
+            "thumbnail_scale": str(self.thumbnail_scale),
+            "full_frame_every": str(self.full_frame_every),
+            "load_shedding": str(self.load_shedding),
+            "cpu_shed_percent": str(self.cpu_shed_percent),
+            "capture_process": str(self.capture_process),
+            "pack_max_mb": str(self.pack_max_mb),
+            "pack_max_minutes": str(self.pack_max_minutes),
+            "quality_mode": str(self.quality_mode),
+            "target_frame_kb": str(self.target_frame_kb),
+            "daily_budget_mb": str(self.daily_budget_mb),
+            "project_quota_gb": str(self.project_quota_gb),
+            "global_quota_gb": str(self.global_quota_gb),
+            "quota_action": str(self.quota_action),
+            "staging_path": str(self.staging_path),
+            "staging_flush_seconds": str(self.staging_flush_seconds),
+            "trigger_watch_path": str(self.trigger_watch_path),
+            "trigger_http_port": str(self.trigger_http_port),
+            "trigger_window_change": str(self.trigger_window_change),
+            "trigger_debounce_seconds": str(self.trigger_debounce_seconds),
+            "trigger_max_per_minute": str(self.trigger_max_per_minute),
+            "trigger_burst_count": str(self.trigger_burst_count),
+            "trigger_burst_interval": str(self.trigger_burst_interval),
+            "frame_bus_enabled": str(self.frame_bus_enabled),
+            "frame_bus_name": str(self.frame_bus_name),
+            "frame_bus_slots": str(self.frame_bus_slots),
+            "preview_port": str(self.preview_port),
+            "preview_allow_remote": str(self.preview_allow_remote),
+            "preview_key": self.preview_key
+        }
+        with open(self.config_file, "w") as configfile:  # 打开配置文件进行写入
+            self.config.write(configfile)  # 写入配置内容
+
+    # 定义函数：获取用于判断“截图过密”的参考间隔（自适应模式下为最小间隔）
+    def get_reference_interval(self):
+        if self.interval_mode == "仅触发":
+            return self.trigger_burst_interval  # 只在触发时截图，连拍的截图不算过密
+        return self.adaptive_min_interval if self.interval_mode == "自适应" else self.interval
+
+    # 定义函数：项目文件夹即全屏画面流的采集根目录
+    def get_capture_root(self):
+        return self.project_path
+
+    def get_project_path(self):
+        return self.project_path
+
+    # 定义函数：切换子文件夹后保存当前文件夹编号
+    def on_subfolder_changed(self):
+        self.save_config()
+
+    # 定义函数：初始化文件夹计数器
+    def initialize_folder_counter(self):
+        if not os.path.exists(self.base_save_path):  # 如果基础保存路径不存在
+            os.makedirs(self.base_save_path)  # 创建基础保存路径
+        super().initialize_folder_counter()
+
+'''截图计数清单'''
+# 截图计数清单：在项目文件夹中记录每个数字子文件夹的截图数量和目录修改时间，
+# 截图时只在内存中计数，启动或检测到外部删除时才与磁盘核对
+class CaptureManifest:
+    FILE_NAME = ".framekeeper_manifest.json"  # 清单文件名（保存在项目文件夹中）
+    SAVE_EVERY = 50  # 每新增多少张截图持久化一次清单
+
+    # 初始化清单
+    def __init__(self, project_path):
+        self.project_path = project_path  # 项目路径
+        self.manifest_path = os.path.join(project_path, self.FILE_NAME)  # 清单文件路径
+        self.subfolders = {}  # {子文件夹名: {"count": 截图数量, "mtime": 目录修改时间}}
+        self.verified = set()  # 本次运行中已与磁盘核对过（或由本程序维护）的子文件夹
+        self.unsaved_count = 0  # 上次持久化后新增的截图数量
+        self.lock = threading.Lock()  # 截图线程和托盘线程可能同时访问清单
+        self.load()
+
+    # 定义函数：从磁盘读取清单
+    def load(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.subfolders = {str(name): {"count": int(entry.get("count", 0)), "mtime": entry.get("mtime")}
+                               for name, entry in data.get("subfolders", {}).items()}
+        except (OSError, ValueError, AttributeError):
+            self.subfolders = {}  # 清单不存在或已损坏时从空清单开始，之后按需与磁盘核对
+
+    # 定义函数：将清单写入磁盘（先写临时文件再替换，避免写入中断导致清单损坏）
+    def save(self):
+        with self.lock:
+            for name in self.verified & self.subfolders.keys():
+                self.subfolders[name]["mtime"] = self.get_folder_mtime(name)  # 记录当前目录修改时间，作为下次启动的核对依据
+            data = {"version": 1, "subfolders": self.subfolders}
+            temp_path = self.manifest_path + ".tmp"
+            try:
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(temp_path, self.manifest_path)
+                self.unsaved_count = 0
+            except OSError:
+                pass  # 清单只是缓存，写入失败时下次启动会重新统计
+
+    # 定义函数：获取子文件夹的修改时间
+    def get_folder_mtime(self, subfolder):
+        try:
+            return os.stat(os.path.join(self.project_path, subfolder)).st_mtime_ns
+        except OSError:
+            return None
+
+    # 定义函数：统计子文件夹中的截图数量（只统计以 "capture_" 开头的截图文件）
+    def count_on_disk(self, subfolder):
+        folder_path = os.path.join(self.project_path, subfolder)
+        try:
+            with os.scandir(folder_path) as entries:
+                return sum(1 for entry in entries if entry.name.startswith("capture_") and entry.is_file())
+        except OSError:
+            return 0
+
+    # 定义函数：与磁盘核对子文件夹的截图数量，目录修改时间未变化时直接信任清单
+    def sync_subfolder(self, subfolder):
+        entry = self.subfolders.get(subfolder)
+        mtime = self.get_folder_mtime(subfolder)
+        if entry is None or entry.get("mtime") is None or entry.get("mtime") != mtime:
+            entry = {"count": self.count_on_disk(subfolder), "mtime": mtime}  # 目录在外部被修改过，重新统计
+            with self.lock:
+                self.subfolders[subfolder] = entry
+        self.verified.add(subfolder)
+        return entry["count"]
+
+    # 定义函数：截图计数加一，返回该子文件夹的新计数
+    def increment(self, subfolder):
+        with self.lock:
+            entry = self.subfolders.setdefault(subfolder, {"count": 0, "mtime": None})
+            entry["count"] += 1
+            self.verified.add(subfolder)
+            self.unsaved_count += 1
+            count = entry["count"]
+            need_save = self.unsaved_count >= self.SAVE_EVERY
+        if need_save:
+            self.save()
+        return count
+
+    # 定义函数：将子文件夹计数清零（新建子文件夹时调用）
+    def reset(self, subfolder):
+        with self.lock:
+            self.subfolders[subfolder] = {"count": 0, "mtime": None}
+            self.verified.add(subfolder)
+
+    # 定义函数：只保留磁盘上仍然存在的子文件夹
+    def retain(self, subfolders):
+        with self.lock:
+            self.subfolders = {name: entry for name, entry in self.subfolders.items() if name in subfolders}
+            self.verified &= self.subfolders.keys()
+
+'''截图采集后端'''
+# 采集后端基类：grab() 返回一张 PIL 图像，并记录最近每次抓屏的耗时
+class CaptureBackend:
+    name = ""  # 后端名称（显示在设置窗口中，并保存到配置文件）
+    description = ""  # 后端说明
+
+    # 初始化采集后端
+    def __init__(self):
+        self.latencies = deque(maxlen=120)  # 最近 120 次抓屏耗时（秒）
+        self.grab_count = 0  # 累计抓屏次数
+        self.frame_pool = None  # 截图图像池（支持的后端把截图写入池中复用的图像，而不是每次新建图像）
+
+    # 定义函数：判断后端在当前系统上是否可用
+    @classmethod
+    def is_available(cls):
+        return True
+
+    # 定义函数：抓取一帧屏幕并记录耗时（region 为 (左, 上, 宽, 高) 的虚拟桌面坐标，None 表示整个主显示器）
+    def grab(self, region=None):
+        start = time.perf_counter()
+        image = self.grab_frame(region)
+        self.latencies.append(time.perf_counter() - start)
+        self.grab_count += 1
+        return image
+
+    # 定义函数：实际的抓屏实现（由子类实现）
+    def grab_frame(self, region=None):
+        raise NotImplementedError
+
+    # 定义函数：列出所有显示器的区域 [(左, 上, 宽, 高), ...]，第一个为主显示器；无法获取时返回空列表
+    def list_monitors(self):
+        return []
+
+    # 定义函数：释放后端占用的资源
+    def close(self):
+        pass
+
+    # 定义函数：获取抓屏耗时统计（平均耗时、P95 耗时、可达到的帧率）
+    def get_stats(self):
+        if not self.latencies:
+            return {"count": self.grab_count, "avg_ms": 0.0, "p95_ms": 0.0, "fps": 0.0}
+        samples = sorted(self.latencies)
+        avg = sum(samples) / len(samples)
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        return {"count": self.grab_count, "avg_ms": avg * 1000, "p95_ms": p95 * 1000, "fps": 1 / avg if avg > 0 else 0.0}
+
+# PIL ImageGrab 后端：原有的截图方式（Windows、macOS，或带 XCB 支持的 Linux）。
+# 注意：Windows 下按区域截图（all_screens=True）时，PIL 会先截取整个虚拟桌面再裁剪出区域，
+# 截取小区域或单个副显示器的耗时与截取所有显示器相同；只截取部分画面时推荐使用 mss 后端
+class ImageGrabBackend(CaptureBackend):
+    name = "ImageGrab"
+    description = "PIL ImageGrab（兼容性最好）"
+
+    @classmethod
+    def is_available(cls):
+        return sys.platform in ("win32", "darwin") or bool(os.environ.get("DISPLAY"))
+
+    def grab_frame(self, region=None):
+        if region is None:
+            return ImageGrab.grab()
+        left, top, width, height = region
+        return ImageGrab.grab(bbox=(left, top, left + width, top + height), all_screens=True)  # all_screens：允许截取副显示器上的区域（Windows 下先截取整个虚拟桌面再裁剪）
+
+    def list_monitors(self):
+        return get_windows_monitors() if os.name == "nt" else []
+
+# mss 后端：直接读取显示缓冲区（Windows 下为 BitBlt，Linux 下为 XShm 共享内存），高分辨率下明显快于 ImageGrab
+class MssBackend(CaptureBackend):
+    name = "mss"
+    description = "mss 高速截屏（Windows / Linux XShm）"
+
+    def __init__(self):
+        super().__init__()
+        self.local = threading.local()  # mss 的句柄不能跨线程使用，每个线程单独创建
+        self.grabbers = []  # 所有线程创建的句柄，关闭后端时全部关闭
+        self.grabbers_lock = threading.Lock()
+
+    @classmethod
+    def is_available(cls):
+        return mss is not None and (sys.platform in ("win32", "darwin") or bool(os.environ.get("DISPLAY")))
+
+    def get_grabber(self):
+        grabber = getattr(self.local, "grabber", None)
+        if grabber is None:
+            grabber = mss.mss()
+            self.local.grabber = grabber
+            with self.grabbers_lock:
+                self.grabbers.append(grabber)
+        return grabber
+
+    def grab_frame(self, region=None):
+        grabber = self.get_grabber()
+        if region is None:
+            area = grabber.monitors[1]  # 与 ImageGrab 默认行为一致，截取主显示器
+        else:
+            left, top, width, height = region
+            area = {"left": left, "top": top, "width": width, "height": height}  # 只读取该区域的像素
+        shot = grabber.grab(area)
+        if self.frame_pool is not None:  # 直接解码到池中复用的图像
+            image = self.frame_pool.acquire(shot.size)
+            image.frombytes(shot.raw, "raw", "BGRX")
+            return image
+        return Image.frombytes("RGB", shot.size, shot.raw, "raw", "BGRX")  # shot.raw 为原始缓冲区，shot.bgra 会再复制一份
+
+    def list_monitors(self):
+        return [(m["left"], m["top"], m["width"], m["height"]) for m in self.get_grabber().monitors[1:]]  # monitors[0] 为整个虚拟桌面
+
+    def close(self):
+        with self.grabbers_lock:
+            grabbers, self.grabbers = self.grabbers, []
+        for grabber in grabbers:
+            try:
+                grabber.close()
+            except Exception:
+                pass  # 创建句柄的线程已经结束时，句柄可能已经失效
+        self.local = threading.local()  # 之后再截图时重新创建句柄
+
+# 合成画面后端：不依赖显示器，按帧序号生成确定性的测试画面，用于无头环境和测试
+class SyntheticBackend(CaptureBackend):
+    name = "合成画面"
+    description = "合成测试画面（无需显示器）"
+    DEFAULT_SIZE = (1920, 1080)
+
+    def __init__(self, size=None):
+        super().__init__()
+        self.size = size or self.DEFAULT_SIZE  # 画面尺寸
+        self.frame_index = 0  # 当前帧序号，画面内容只由帧序号决定
+
+    def grab_frame(self, region=None):
+        width, height = self.size
+        index = self.frame_index
+        self.frame_index += 1
+        if self.frame_pool is not None:  # 在池中复用的图像上重新绘制
+            image = self.frame_pool.acquire(self.size)
+            image.paste((32, 32, 32), (0, 0, width, height))  # 深灰背景
+        else:
+            image = Image.new("RGB", self.size, (32, 32, 32))  # 深灰背景
+        draw = ImageDraw.Draw(image)
+        block = max(8, width // 16)  # 移动方块的边长
+        step = block // 4  # 方块每帧向右移动 1/4 边长
+        columns = max(1, (width - block) // step)  # 每行可移动的步数
+        x = (index % columns) * step
+        y = (index // columns * block) % max(1, height - block)  # 走到行尾后换到下一行
+        draw.rectangle([x, y, x + block, y + block], fill=(230, 60, 60))
+        draw.text((10, 10), f"FrameKeeper #{index}", fill=(255, 255, 255))  # 绘制帧序号
+        if region is not None:
+            left, top, region_width, region_height = region
+            full_image = image
+            image = image.crop((left, top, left + region_width, top + region_height))  # 超出画面的部分为黑色
+            if self.frame_pool is not None:
+                self.frame_pool.release(full_image)
+        return image
+
+    def list_monitors(self):
+        return [(0, 0, self.size[0], self.size[1])]
+
+# 截图图像池：预先分配的截图图像在截图、编码之间循环使用，避免高分辨率高频截图时每帧新建几十 MB 的图像。
+# 同一张截图可能被多个帧共用（例如双速率截图），用引用计数判断何时可以复用；池中没有空闲图像时才新建
+class FrameImagePool:
+    # 初始化图像池
+    def __init__(self, capacity):
+        self.capacity = capacity  # 最多保留的空闲图像数量
+        self.free = []  # 空闲图像
+        self.in_use = {}  # 使用中的图像：id(图像) -> [图像, 引用计数]
+        self.allocations = 0  # 累计新建的图像数量
+        self.lock = threading.Lock()  # 截图线程取出，编码线程归还
+
+    # 定义函数：取出一张指定尺寸的图像（内容未定义，由调用者整体覆盖）
+    def acquire(self, size, mode="RGB"):
+        with self.lock:
+            image = None
+            while self.free and image is None:
+                candidate = self.free.pop()
+                if candidate.size == size and candidate.mode == mode:
+                    image = candidate  # 尺寸不同的空闲图像直接丢弃（分辨率已变化）
+            if image is None:
+                image = Image.new(mode, size)
+                self.allocations += 1
+            self.in_use[id(image)] = [image, 1]
+            return image
+
+    # 定义函数：增加一次引用（不是从池中取出的图像忽略）
+    def retain(self, image):
+        with self.lock:
+            entry = self.in_use.get(id(image))
+            if entry is not None:
+                entry[1] += 1
+
+    # 定义函数：归还一次引用，引用全部归还后图像回到池中
+    def release(self, image):
+        with self.lock:
+            entry = self.in_use.get(id(image))
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self.in_use[id(image)]
+                if len(self.free) < self.capacity:
+                    self.free.append(image)
+
+# 定义函数：通过 EnumDisplayMonitors 列出 Windows 下所有显示器的区域（虚拟桌面坐标）
+def get_windows_monitors():
+    import ctypes.wintypes
+    monitors = []
+
+    def callback(monitor_handle, device_context, rect_pointer, data):
+        rect = rect_pointer.contents
+        monitors.append((rect.left, rect.top, rect.right - rect.left, rect.bottom - rect.top))
+        return 1  # 返回非零值继续枚举
+    enum_proc = ctypes.WINFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p, ctypes.POINTER(ctypes.wintypes.RECT), ctypes.c_void_p)
+    ctypes.windll.user32.EnumDisplayMonitors(None, None, enum_proc(callback), 0)
+    monitors.sort(key=lambda m: (m[0], m[1]) != (0, 0))  # 主显示器的左上角为 (0, 0)，排在第一位
+    return monitors
+
+CAPTURE_BACKENDS = {backend.name: backend for backend in (ImageGrabBackend, MssBackend, SyntheticBackend)}  # 所有采集后端（名称 -> 类）
+capture_backend = None  # 当前使用的采集后端实例
+
+# 定义函数：获取当前系统上可用的采集后端名称
+def get_available_capture_backends():
+    return [name for name, backend in CAPTURE_BACKENDS.items() if backend.is_available()]
+
+# 定义函数：创建采集后端实例（配置的后端不可用时依次回退到其它可用后端）
+def create_capture_backend(name):
+    backend_class = CAPTURE_BACKENDS.get(name)
+    if backend_class is None or not backend_class.is_available():
+        available = get_available_capture_backends()
+        backend_class = CAPTURE_BACKENDS[available[0]] if available else SyntheticBackend
+    return backend_class()
+
+# 定义函数：获取当前配置对应的采集后端（配置变化时重新创建）
+def get_capture_backend():
+    global capture_backend
+    if capture_backend is None or capture_backend.name != config.capture_backend:
+        if capture_backend is not None:
+            capture_backend.close()
+        capture_backend = create_capture_backend(config.capture_backend)
+    return capture_backend
+
+# 定义函数：测试所有可用采集后端的抓屏耗时和帧率
+def benchmark_capture_backends(frames=20):
+    results = []
+    for name in get_available_capture_backends():
+        backend = CAPTURE_BACKENDS[name]()
+        try:
+            image = backend.grab()  # 第一次抓屏包含初始化开销，不计入统计
+            backend.latencies.clear()
+            for _ in range(frames):
+                image = backend.grab()
+            stats = backend.get_stats()
+            stats["name"] = name
+            stats["size"] = image.size
+            results.append(stats)
+        except Exception as e:
+            results.append({"name": name, "error": str(e)})
+        finally:
+            backend.close()
+    return results
+
+# 定义函数：在后台测试采集后端并显示结果（右键菜单调用）
+def show_capture_backend_benchmark(icon=None):
+    def benchmark_task():
+        lines = []
+        for result in benchmark_capture_backends():
+            if "error" in result:
+                lines.append(f"{result['name']}: 测试失败 ({result['error']})")
+            else:
+                current_mark = " [当前]" if result["name"] == config.capture_backend else ""
+                lines.append(f"{result['name']}{current_mark}: {result['size'][0]}x{result['size'][1]}，"
+                             f"平均 {result['avg_ms']:.1f} ms，P95 {result['p95_ms']:.1f} ms，约 {result['fps']:.1f} 帧/秒")
+        if capture_backend is not None and capture_backend.latencies:
+            stats = capture_backend.get_stats()
+            lines.append(f"\n本次运行中 {capture_backend.name} 已截图 {stats['count']} 次，平均 {stats['avg_ms']:.1f} ms")
+        run_in_main_thread(messagebox.showinfo, "采集后端测速", "\n".join(lines) if lines else "没有可用的采集后端。")
+    threading.Thread(target=benchmark_task, daemon=True).start()
+
+'''画面流'''
+# 画面流：每个画面流截取一个显示器或一个屏幕区域，在项目中有独立的文件夹和截图计数。
+# 全屏画面流的截图直接保存在项目文件夹的数字子文件夹中（与旧版相同），其它画面流保存在 项目/画面流名称/数字子文件夹 中
+FULL_SCREEN_STREAM = "全屏"  # 默认画面流：整个主显示器
+THUMBNAIL_STREAM = "缩略图"  # 双速率截图时缩略图画面流的文件夹名（其它画面流的缩略图加上画面流名称作为前缀）
+
+# 画面流文件夹：项目文件夹下以画面流名称命名的采集根目录
+class StreamCaptureFolders(NumberedCaptureFolders):
+    # 初始化画面流文件夹
+    def __init__(self, folder_name):
+        self.folder_name = folder_name  # 项目中的文件夹名
+        self.current_subfolder = "1"  # 当前子文件夹名称
+        self.current_file_count = 0  # 当前子文件夹中的文件计数
+        self.manifest = None  # 该画面流的截图计数清单（首次写入时载入）
+
+    # 定义函数：画面流的采集根目录随当前项目变化
+    def get_capture_root(self):
+        return os.path.join(config.project_path, self.folder_name)
+
+    def get_project_path(self):
+        return config.project_path
+
+    # 定义函数：获取截图的保存位置（首次写入或切换项目后重新载入目录结构和计数）
+    def get_save_path_for(self, timestamp):
+        if self.manifest is None or self.manifest.project_path != self.get_capture_root():
+            self.initialize_folder_counter()
+        return super().get_save_path_for(timestamp)
+
+# 画面流
+class CaptureStream:
+    # 初始化画面流
+    def __init__(self, name, region=None, monitor=None):
+        self.name = name  # 画面流名称（同时作为项目中的文件夹名）
+        self.region = region  # 截取区域 (左, 上, 宽, 高)，None 表示整个主显示器
+        self.monitor = monitor  # 显示器编号（从 1 开始），开始截图时换算为截取区域
+        self.folders = config if name == FULL_SCREEN_STREAM else StreamCaptureFolders(name)  # 截图保存位置和计数
+        self.duplicate_detector = DuplicateFrameDetector()  # 每个画面流单独判断重复帧
+        self.quality_controller = None  # 压缩质量自动调节器（固定质量时为 None）
+        self.source = None  # 缩略图画面流对应的全分辨率画面流（两者共用同一次截图和时间戳）
+        self.scale = 1.0  # 保存前的缩放比例
+        self.every = 1  # 每几次截图保存一次
+
+# 定义函数：解析画面流设置，多个画面流用分号分隔，例如 “全屏;显示器2;区域:0,0,800,600”
+def parse_capture_streams(text):
+    streams = []
+    for part in text.replace("；", ";").split(";"):
+        part = part.strip()
+        if not part:
+            continue
+        if part == FULL_SCREEN_STREAM:
+            stream = CaptureStream(FULL_SCREEN_STREAM)
+        elif part.startswith("显示器") and part[3:].isdigit() and int(part[3:]) >= 1:
+            stream = CaptureStream(part, monitor=int(part[3:]))
+        elif part.startswith(("区域:", "区域：")):
+            try:
+                left, top, width, height = (int(value) for value in part[3:].replace("，", ",").split(","))
+            except ValueError:
+                raise ValueError(f"区域格式应为 区域:左,上,宽,高 ，而不是 “{part}”")
+            if width <= 0 or height <= 0:
+                raise ValueError(f"区域的宽和高必须大于 0: {part}")
+            stream = CaptureStream(f"区域_{left}_{top}_{width}x{height}", region=(left, top, width, height))
+        else:
+            raise ValueError(f"无法识别的画面流: {part}（可用：全屏、显示器N、区域:左,上,宽,高）")
+        if any(existing.name == stream.name for existing in streams):
+            raise ValueError(f"画面流重复: {part}")
+        streams.append(stream)
+    if not streams:
+        raise ValueError("至少需要一个画面流")
+    return streams
+
+# 定义函数：将“显示器N”换算为截取区域，返回找不到对应显示器的画面流名称
+def resolve_capture_streams(streams, backend):
+    monitors = backend.list_monitors()
+    missing = []
+    for stream in streams:
+        if stream.monitor is None:
+            continue
+        if stream.monitor <= len(monitors):
+            stream.region = monitors[stream.monitor - 1]
+        elif stream.monitor == 1:
+            stream.region = None  # 后端无法列出显示器时，显示器1 按主显示器截取
+        else:
+            missing.append(stream.name)
+    return missing
+
+# 定义函数：双速率截图，为每个画面流添加一个每次都保存的缩略图画面流，原画面流改为每隔几次才保存一次全分辨率截图。
+# 缩略图与全分辨率截图来自同一次截图、文件名中的时间戳相同，因此两者共用一条时间轴，导出时可任选其一
+def add_thumbnail_streams(streams, scale, full_frame_every):
+    result = []
+    for stream in streams:
+        thumbnail = CaptureStream(THUMBNAIL_STREAM if stream.name == FULL_SCREEN_STREAM else f"{stream.name}_{THUMBNAIL_STREAM}", stream.region)
+        thumbnail.source = stream
+        thumbnail.scale = scale
+        stream.every = max(1, full_frame_every)
+        result += [stream, thumbnail]
+    return result
+
+# 定义函数：按比例缩放画面尺寸，宽和高都取偶数（视频编码使用的 yuv420p 要求宽高为偶数）
+def get_scaled_size(size, scale):
+    return tuple(max(2, round(value * scale / 2) * 2) for value in size)
+
+# 定义函数：判断项目中的文件夹是否为其它画面流的采集根目录
+def is_capture_stream_folder(path):
+    if os.path.basename(path).isdigit():
+        return False
+    return os.path.isfile(os.path.join(path, CaptureManifest.FILE_NAME)) or os.path.isdir(os.path.join(path, PackFrameStore.FOLDER_NAME))  # 帧包存储不使用截图计数清单
+
+capture_streams = []  # 当前截图循环的画面流
+capture_tick = 0  # 当前截图循环已经过的截图时间点数，用于每隔几次保存全分辨率截图
+
+'''截图调度'''
+# 截图调度器：基于单调时钟维护固定的截图时间点（第 N 次截图计划在 起点 + N × 间隔），
+# 截图本身的耗时不会累积到周期中；同时记录每次截图相对计划时间点的偏差
+class CaptureScheduler:
+    MISSED_TICK_POLICIES = ("跳过", "补拍")  # 错过时间点时：跳过错过的时间点 / 立即连续补拍
+    MAX_CATCH_UP = 5  # “补拍”策略下最多连续补拍的次数，超过的部分仍然跳过
+    TRIGGER_POLL = 0.05  # 启用触发器时，等待期间每隔多久检查一次触发截图请求（秒）
+    needs_fingerprint = False  # 是否需要每帧的画面指纹
+
+    # 初始化调度器
+    def __init__(self, interval, missed_tick_policy="跳过", stop_event=None):
+        self.interval = interval  # 截图间隔（秒），为 None 时只在触发时截图
+        self.missed_tick_policy = missed_tick_policy  # 错过时间点的处理策略
+        self.stop_event = stop_event or threading.Event()  # 停止信号，停止时立即结束等待
+        self.next_deadline = None  # 下一个截图时间点（time.monotonic 时间）
+        self.last_deadline = None  # 本次截图的计划时间点
+        self.jitters = deque(maxlen=1000)  # 最近每次截图的实际开始时间相对计划时间点的偏差（秒）
+        self.tick_count = 0  # 已执行的截图次数
+        self.missed_ticks = 0  # 被跳过的时间点数量
+        self.poll_triggers = False  # 是否启用了触发器（启用后等待期间定期检查触发截图请求）
+        self.trigger_deadlines = []  # 触发截图的计划时间（连拍时有多个），按时间排序
+        self.trigger_lock = threading.Lock()  # 触发器线程和截图线程同时访问
+        self.triggered_ticks = 0  # 已执行的触发截图次数
+
+    # 定义函数：请求触发截图，共 count 张、每张间隔 spacing 秒（由触发器线程调用）
+    def request_capture(self, count=1, spacing=0.0):
+        now = time.monotonic()
+        with self.trigger_lock:
+            self.trigger_deadlines.extend(now + i * spacing for i in range(count))
+            self.trigger_deadlines.sort()
+
+    # 定义函数：取出一个已经到时间的触发截图请求，没有时返回 False
+    def take_due_trigger(self, now):
+        with self.trigger_lock:
+            if self.trigger_deadlines and self.trigger_deadlines[0] <= now:
+                self.trigger_deadlines.pop(0)
+                return True
+        return False
+
+    # 定义函数：等待下一个截图时间点，返回 False 表示已收到停止信号
+    def wait_next(self):
+        now = time.monotonic()
+        if self.next_deadline is None:
+            self.next_deadline = now if self.interval is not None else float("inf")  # 启动后立即截取第一张；只在触发时截图则不安排时间点
+        while True:
+            if self.take_due_trigger(now):  # 触发截图不占用固定的时间点，也不计入偏差统计
+                self.triggered_ticks += 1
+                return not self.stop_event.is_set()
+            delay = self.next_deadline - now
+            if delay <= 0:
+                break
+            if self.poll_triggers:
+                delay = min(delay, self.TRIGGER_POLL)
+            if self.stop_event.wait(None if delay == float("inf") else delay):  # 等待到时间点，期间收到停止信号则立即返回
+                return False
+            now = time.monotonic()
+        if self.stop_event.is_set():
+            return False
+
+        actual = time.monotonic()
+        self.jitters.append(actual - self.next_deadline)  # 记录本次截图的偏差
+        self.tick_count += 1
+        self.last_deadline = self.next_deadline
+        self.next_deadline += self.interval  # 下一个时间点只由上一个时间点决定，不受截图耗时影响
+
+        '''处理错过的时间点'''
+        if self.next_deadline <= actual:
+            missed = int((actual - self.next_deadline) // self.interval) + 1  # 已经错过的时间点数量
+            if self.missed_tick_policy == "补拍":
+                skipped = max(0, missed - self.MAX_CATCH_UP)  # 积压过多时只补拍最近的几次
+            else:
+                skipped = missed  # 跳过所有错过的时间点，下一次截图对齐到下一个未来的时间点
+            self.missed_ticks += skipped
+            self.next_deadline += skipped * self.interval
+        return True
+
+    # 定义函数：截图完成后报告本帧的画面指纹（固定间隔调度器不需要）
+    def report_frame(self, fingerprint):
+        pass
+
+    # 定义函数：获取调度统计（截图次数、跳过次数、偏差的平均值/P95/最大值）
+    def get_stats(self):
+        stats = {"ticks": self.tick_count, "missed": self.missed_ticks, "avg_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        if self.jitters:
+            samples = sorted(self.jitters)
+            stats["avg_ms"] = sum(samples) / len(samples) * 1000
+            stats["p95_ms"] = samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000
+            stats["max_ms"] = samples[-1] * 1000
+        return stats
+
+# 自适应调度器：比较相邻两帧的画面指纹，画面变化快时缩短截图间隔，画面静止时逐步放宽，
+# 间隔始终保持在 [最小间隔, 最大间隔] 范围内；每张截图的真实时刻仍记录在文件名中
+class AdaptiveCaptureScheduler(CaptureScheduler):
+    CHANGE_LEVEL = 8  # 指纹像素灰度差超过该值才算发生变化
+    ACTIVE_RATIO = 0.02  # 超过 2% 的指纹像素发生变化视为“活跃”
+    SPEED_UP = 0.5  # 活跃时间隔减半
+    BACK_OFF = 1.5  # 画面静止时间隔放宽为 1.5 倍
+    needs_fingerprint = True
+
+    # 初始化调度器
+    def __init__(self, min_interval, max_interval, missed_tick_policy="跳过", stop_event=None):
+        super().__init__(min_interval, missed_tick_policy, stop_event)  # 从最小间隔开始
+        self.min_interval = min_interval  # 最小截图间隔
+        self.max_interval = max(min_interval, max_interval)  # 最大截图间隔
+        self.previous_fingerprint = None  # 上一帧的指纹
+
+    # 定义函数：根据本帧与上一帧的变化调整截图间隔
+    def report_frame(self, fingerprint):
+        ratio = fingerprint_change_ratio(self.previous_fingerprint, fingerprint, self.CHANGE_LEVEL)
+        self.previous_fingerprint = fingerprint
+        if ratio >= self.ACTIVE_RATIO:
+            interval = max(self.min_interval, self.interval * self.SPEED_UP)
+        elif ratio == 0:
+            interval = min(self.max_interval, self.interval * self.BACK_OFF)
+        else:
+            interval = self.interval  # 少量变化（如光标闪烁）时保持当前间隔
+        if interval != self.interval and self.last_deadline is not None:
+            self.interval = interval
+            self.next_deadline = self.last_deadline + interval  # 以本次截图的计划时间点为基准重新安排下一次截图
+
+INTERVAL_MODES = ("固定", "自适应", "仅触发")  # 截图间隔模式
+capture_scheduler = None  # 当前截图循环使用的调度器
+capture_stop_event = None  # 当前截图循环的停止信号
+capture_thread = None  # 当前截图线程
+
+# 定义函数：显示截图调度统计（右键菜单调用）
+def show_capture_schedule_stats(icon=None):
+    if capture_process is not None:  # 在独立进程中截图时由截图进程提供统计
+        status = capture_process.get_status()
+        text = status["schedule"] if status is not None else "截图进程没有响应。"
+    else:
+        text = format_capture_schedule_stats()
+    messagebox.showinfo("截图节拍统计", text or "截图尚未开始。")
+
+# 定义函数：格式化截图调度统计（截图尚未开始时返回 None）
+def format_capture_schedule_stats():
+    if capture_scheduler is None:
+        return None
+    stats = capture_scheduler.get_stats()
+    if isinstance(capture_scheduler, AdaptiveCaptureScheduler):
+        interval_text = f"自适应，当前 {capture_scheduler.interval:.2f} 秒（{capture_scheduler.min_interval} - {capture_scheduler.max_interval} 秒）"
+    elif capture_scheduler.interval is None:
+        interval_text = "仅触发"
+    else:
+        interval_text = f"{capture_scheduler.interval} 秒"
+    return (f"截图间隔: {interval_text}（错过时间点时{capture_scheduler.missed_tick_policy}）\n"
+            f"已截图: {stats['ticks']} 次，跳过: {stats['missed']} 次"
+            + (f"，触发截图: {capture_scheduler.triggered_ticks} 次" if capture_scheduler.triggered_ticks else "") + "\n"
+            f"截图时间偏差: 平均 {stats['avg_ms']:.1f} ms，P95 {stats['p95_ms']:.1f} ms，最大 {stats['max_ms']:.1f} ms\n"
+            + (f"{capture_trigger_manager.format_stats()}\n" if capture_trigger_manager is not None else "")
+            + format_pipeline_stats())
+
+# 定义函数：格式化截图流水线统计
+def format_pipeline_stats():
+    if capture_pipeline is None:
+        return ""
+    stats = capture_pipeline.get_stats()
+    text = (f"流水线: 已提交 {stats['submitted']} 帧，已写入 {stats['written']} 帧，"
+            f"排队中 {stats['pending']} 帧，丢弃 {stats['dropped']} 帧，失败 {stats['failed']} 帧")
+    duplicate_count = sum(stream.duplicate_detector.duplicate_count for stream in capture_streams)
+    if duplicate_count:
+        text += f"\n重复帧: 检测到 {duplicate_count} 帧，记录重复标记 {stats['repeats']} 条"
+    if len(capture_streams) > 1:
+        text += f"\n画面流: {'、'.join(stream.name for stream in capture_streams)}"
+    if preview_server is not None:
+        text += f"\n实时预览: {preview_server.get_url()}，正在观看 {preview_server.clients} 个"
+    elif preview_error is not None:
+        text += f"\n实时预览启动失败: {preview_error}"
+    if frame_bus is not None:
+        text += f"\n共享内存（{frame_bus.name}）: 已发布 {frame_bus.sequence} 帧"
+        if frame_bus.oversized_frames:
+            text += f"，{frame_bus.oversized_frames} 帧超出槽位容量未发布"
+        if frame_bus.last_error:
+            text += f"，创建失败: {frame_bus.last_error}"
+    if load_shedder is not None:
+        text += (f"\n负载降级（{load_shedder.policy}）: 当前级别 {load_shedder.level}，降级保存 {load_shedder.degraded_frames} 帧，"
+                 f"跳过 {load_shedder.skipped_ticks} 次" + (f"，最近原因: {load_shedder.pressure_reason}" if load_shedder.pressure_reason else ""))
+    for stream in capture_streams:
+        controller = stream.quality_controller
+        if controller is not None and controller.average_size is not None:
+            text += (f"\n自动压缩质量（{stream.name}）: 当前 {controller.quality}，平均 {controller.average_size / 1024:.0f} KB/帧，"
+                     f"目标 {controller.get_target_bytes() / 1024:.0f} KB/帧")
+    return text
+
+'''截图耗时跟踪'''
+# 截图耗时跟踪：记录每帧在各阶段（抓屏、编码、写入、记账）的耗时，汇总为滚动百分位数和累计直方图，
+# 用于判断错过的截图时间点来自抓屏、编码还是磁盘，也便于比较不同机器之间的差异
+class StageLatencyTracer:
+    STAGES = ("抓屏", "编码", "写入", "记账", "总计")  # 记账：确定保存位置、更新截图计数清单等；总计：从抓屏开始到写入完成
+    BUCKET_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)  # 直方图各区间的上限（毫秒），最后一个区间为超过 2 秒
+    WINDOW = 1000  # 计算百分位数使用最近多少帧
+
+    # 初始化耗时跟踪
+    def __init__(self):
+        self.lock = threading.Lock()  # 截图线程、编码线程和写入线程同时记录
+        self.reset()
+
+    # 定义函数：清空统计（每次开始截图时调用）
+    def reset(self):
+        with self.lock:
+            self.samples = {stage: deque(maxlen=self.WINDOW) for stage in self.STAGES}  # 最近的耗时（秒）
+            self.histograms = {stage: [0] * (len(self.BUCKET_BOUNDS_MS) + 1) for stage in self.STAGES}  # 累计直方图
+            self.started = datetime.now()  # 统计开始时间
+
+    # 定义函数：记录一帧的各阶段耗时（写入完成后由写入线程调用），timings 为 {阶段: 秒}
+    def record(self, timings):
+        with self.lock:
+            for stage, seconds in timings.items():
+                if stage not in self.samples:
+                    continue
+                self.samples[stage].append(seconds)
+                bucket = 0
+                while bucket < len(self.BUCKET_BOUNDS_MS) and seconds * 1000 > self.BUCKET_BOUNDS_MS[bucket]:
+                    bucket += 1
+                self.histograms[stage][bucket] += 1
+
+    # 定义函数：获取各阶段的统计（次数、平均、P50、P95、P99、最大，单位毫秒）
+    def get_summary(self):
+        with self.lock:
+            summary = {}
+            for stage in self.STAGES:
+                samples = sorted(self.samples[stage])
+                if not samples:
+                    continue
+                pick = lambda ratio: samples[min(len(samples) - 1, int(len(samples) * ratio))] * 1000
+                summary[stage] = {
+                    "count": sum(self.histograms[stage]),
+                    "avg_ms": sum(samples) / len(samples) * 1000,
+                    "p50_ms": pick(0.5),
+                    "p95_ms": pick(0.95),
+                    "p99_ms": pick(0.99),
+                    "max_ms": samples[-1] * 1000,
+                    "histogram": list(self.histograms[stage]),
+                }
+            return summary
+
+    # 定义函数：获取直方图区间的名称
+    def get_bucket_labels(self):
+        labels = [f"≤{bound} ms" for bound in self.BUCKET_BOUNDS_MS]
+        return labels + [f">{self.BUCKET_BOUNDS_MS[-1]} ms"]
+
+    # 定义函数：格式化为文本报告（百分位数表和每个阶段的直方图）
+    def format_report(self):
+        summary = self.get_summary()
+        if not summary:
+            return "还没有已写入的截图。"
+        lines = [f"统计开始于 {self.started:%Y-%m-%d %H:%M:%S}，百分位数取最近 {self.WINDOW} 帧（毫秒）",
+                 f"{'阶段':<4}{'次数':>8}{'平均':>8}{'P50':>8}{'P95':>8}{'P99':>8}{'最大':>8}"]
+        for stage, stats in summary.items():
+            lines.append(f"{stage:<4}{stats['count']:>8}{stats['avg_ms']:>8.1f}{stats['p50_ms']:>8.1f}{stats['p95_ms']:>8.1f}"
+                         f"{stats['p99_ms']:>8.1f}{stats['max_ms']:>8.1f}")
+        labels = self.get_bucket_labels()
+        for stage, stats in summary.items():
+            total = max(1, stats["count"])
+            lines.append(f"\n{stage}耗时分布:")
+            for label, count in zip(labels, stats["histogram"]):
+                if count:
+                    lines.append(f"  {label:>10} {'█' * max(1, round(count / total * 30))} {count}")
+        return "\n".join(lines)
+
+    # 定义函数：把统计和最近每帧的耗时保存为 JSON 文件
+    def dump(self, path):
+        summary = self.get_summary()
+        with self.lock:
+            recent = {stage: [round(seconds * 1000, 3) for seconds in samples] for stage, samples in self.samples.items()}
+        data = {
+            "started": self.started.isoformat(timespec="seconds"),
+            "dumped": datetime.now().isoformat(timespec="seconds"),
+            "backend": config.capture_backend,
+            "format": config.format,
+            "storage_mode": config.storage_mode,
+            "interval": config.interval,
+            "bucket_labels": self.get_bucket_labels(),
+            "summary": summary,
+            "recent_ms": recent,
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+latency_tracer = StageLatencyTracer()  # 截图各阶段耗时统计
+
+# 定义函数：显示截图各阶段耗时，并可保存到文件（右键菜单调用）
+def show_capture_latency_report(icon=None):
+    if capture_process is not None:  # 在独立进程中截图时由截图进程提供统计和保存文件
+        status = capture_process.get_status()
+        if status is None:
+            messagebox.showinfo("截图耗时分析", "截图进程没有响应。")
+            return
+        report, has_data, dump = status["latency"], status["has_latency"], capture_process.dump_latency
+    else:
+        report, has_data, dump = latency_tracer.format_report(), bool(latency_tracer.get_summary()), latency_tracer.dump
+    if not has_data:
+        messagebox.showinfo("截图耗时分析", report)
+        return
+    if not messagebox.askyesno("截图耗时分析", f"{report}\n\n是否保存到文件？"):
+        return
+    path = filedialog.asksaveasfilename(title="保存截图耗时统计", defaultextension=".json",
+                                        initialfile=f"framekeeper_latency_{datetime.now():%Y%m%d_%H%M%S}.json",
+                                        filetypes=[("JSON 文件", "*.json")])
+    if not path:
+        return
+    try:
+        dump(path)
+    except (OSError, EOFError, TimeoutError) as e:
+        messagebox.showerror("错误", f"保存失败: {e}")
+        return
+    messagebox.showinfo("截图耗时分析", f"已保存到 {path}")
+
+'''画面变化检测'''
+FINGERPRINT_WIDTH = 64  # 画面指纹宽度（像素）
+
+# 定义函数：计算截图的缩略灰度指纹（约 64 像素宽）
+def compute_frame_fingerprint(image):
+    factor = max(1, image.width // FINGERPRINT_WIDTH)
+    small = image.reduce(factor) if factor > 1 else image  # 按块求平均缩小，只需遍历一次原图
+    return np.asarray(small.convert("L"), dtype=np.int16)
+
+# 定义函数：两个指纹的最大灰度差（0 - 255），没有参考指纹或分辨率变化时视为完全变化
+def fingerprint_max_difference(reference, current):
+    if reference is None or reference.shape != current.shape:
+        return 255
+    return int(np.abs(current - reference).max())
+
+# 定义函数：两个指纹中发生变化（灰度差超过 level）的像素比例（0 - 1）
+def fingerprint_change_ratio(reference, current, level):
+    if reference is None or reference.shape != current.shape:
+        return 1.0
+    return float(np.count_nonzero(np.abs(current - reference) > level)) / current.size
+
+# 重复帧检测器：将截图的指纹与上一张保留的截图比较，所有指纹像素的灰度差都不超过阈值时视为与上一张相同
+class DuplicateFrameDetector:
+    MODES = ("关闭", "跳过", "重复标记")  # 关闭检测 / 直接跳过重复帧 / 只记录一条“重复”标记
+
+    # 初始化检测器
+    def __init__(self):
+        self.reference = None  # 上一张保留下来的截图的指纹
+        self.duplicate_count = 0  # 已检测到的重复帧数量
+
+    # 定义函数：判断截图（指纹）是否与上一张保留的截图重复
+    def is_duplicate(self, fingerprint, threshold):
+        if self.reference is not None and fingerprint_max_difference(self.reference, fingerprint) <= threshold:  # 第一帧总是保留
+            self.duplicate_count += 1
+            return True
+        self.reference = fingerprint  # 只有保留下来的截图才作为新的参考帧，避免缓慢变化被逐帧“吞掉”
+        return False
+
+'''截图文件命名'''
+CAPTURE_FILENAME_PATTERN = re.compile(r'^capture_(\d{8}_\d{6})(?:_(\d{3}))?(?:_\d+)?\.(jpg|png|webp|qoi|tiles)$')  # 截图文件名：capture_日期_时间[_毫秒][_序号].格式（兼容旧版只精确到秒的文件名）
+
+# 定义函数：将截图时刻格式化为文件名中的时间戳（精确到毫秒）
+def format_capture_timestamp(timestamp):
+    milliseconds = int(timestamp * 1000) % 1000
+    return f"{time.strftime('%Y%m%d_%H%M%S', time.localtime(timestamp))}_{milliseconds:03d}"
+
+# 定义函数：从截图文件名解析截图时刻，不是截图文件时返回 None
+def parse_capture_filename(filename):
+    match = CAPTURE_FILENAME_PATTERN.match(filename)
+    if not match:
+        return None
+    try:
+        capture_time = datetime.strptime(match.group(1), "%Y%m%d_%H%M%S")
+    except ValueError:
+        return None
+    if match.group(2):
+        capture_time = capture_time.replace(microsecond=int(match.group(2)) * 1000)
+    return capture_time
+
+'''截图存储'''
+# 文件夹存储：将编码后的帧按截图时刻命名，写入采集根目录（默认为项目文件夹）当前的数字子文件夹
+class FolderFrameStore:
+    # 初始化存储
+    def __init__(self, folders=None):
+        self.folders = folders or config  # 保存位置和截图计数（画面流文件夹或项目本身）
+        self.last_filename = None  # 最近写入的截图文件名（重复标记指向它）
+        self.last_stamp = None  # 最近使用的时间戳
+        self.stamp_repeat = 0  # 同一毫秒内的第几张截图，用于避免文件名冲突
+
+    # 定义函数：获取当前保存路径
+    def get_save_path(self, frame):
+        return self.folders.get_save_path_for(frame.timestamp)  # 由项目的目录结构决定
+
+    # 定义函数：截图写入后的记账
+    def on_frame_written(self, filepath, size):
+        self.folders.increment_file_count()  # 调用函数 increment_file_count 增加文件计数
+        record_disk_usage(self.folders.get_project_path(), size)  # 增量更新磁盘占用
+
+    # 定义函数：生成不会冲突的截图文件名（extension 默认为截图格式）
+    def make_filename(self, frame, extension=None):
+        extension = extension or get_image_extension(frame.format)
+        stamp = format_capture_timestamp(frame.timestamp)  # 使用截图时刻的时间戳
+        if stamp == self.last_stamp:  # 同一毫秒内有多张截图时追加序号
+            self.stamp_repeat += 1
+            return f"capture_{stamp}_{self.stamp_repeat}.{extension}"
+        self.last_stamp = stamp
+        self.stamp_repeat = 0
+        return f"capture_{stamp}.{extension}"  # 构建文件名，包含时间戳和格式
+
+    # 定义函数：写入一帧截图
+    def write(self, frame):
+        start = time.perf_counter()
+        save_path = self.get_save_path(frame)  # 获取当前保存路径
+        filename = self.make_filename(frame)
+        filepath = os.path.join(save_path, filename)
+        bookkeeping = time.perf_counter() - start
+        write_capture_file(filepath, frame.data)
+        start = time.perf_counter()
+        self.on_frame_written(filepath, len(frame.data))
+        self.last_filename = filename
+        frame.timings["记账"] = bookkeeping + time.perf_counter() - start  # 确定保存位置和更新计数的耗时，单独统计
+
+    # 定义函数：写入重复标记（在子文件夹的 repeats.log 中追加一行：重复帧文件名 -> 与之相同的截图文件名，不计入文件数量）
+    def write_repeat(self, frame):
+        save_path = self.get_save_path(frame)
+        filename = self.make_filename(frame)
+        append_capture_log(os.path.join(save_path, "repeats.log"), f"{filename}\t{self.last_filename or ''}\n")
+
+    # 定义函数：关闭存储
+    def close(self):
+        pass
+
+# 临时文件夹存储：把截图写入指定文件夹且不更新项目计数，用于截图自测
+class TemporaryFrameStore(FolderFrameStore):
+    def __init__(self, directory):
+        super().__init__()
+        self.directory = directory  # 写入的文件夹
+        self.bytes_written = 0  # 累计写入的字节数
+
+    def get_save_path(self, frame):
+        return self.directory
+
+    def on_frame_written(self, filepath, size):
+        self.bytes_written += size
+
+# 差分图块存储：每隔一段时间写入一张完整的关键帧（普通 JPG/PNG），其余截图只保存与关键帧相比发生变化的图块。
+# 变化的图块拼成一张小图编码后写入 .tiles 文件，文件头记录关键帧文件名和每个图块的位置，
+# 每个差分帧只依赖同一文件夹中的关键帧，导出时可以并行还原
+class TileDeltaStore(FolderFrameStore):
+    TILE_SIZE = 64  # 图块边长（像素），为 JPEG 编码块 16 的倍数，图块之间不会互相影响
+    KEYFRAME_INTERVAL = 300  # 每隔多少张截图强制写入一张关键帧
+    KEYFRAME_CHANGE_RATIO = 0.5  # 与关键帧相比变化的图块超过该比例时，直接写入新的关键帧
+
+    # 初始化存储
+    def __init__(self, folders=None, image_format="JPG"):
+        super().__init__(folders)
+        self.image_format = image_format  # 关键帧和图块的编码格式
+        self.keyframe = None  # 当前关键帧的像素
+        self.keyframe_name = None  # 当前关键帧的文件名
+        self.keyframe_folder = None  # 当前关键帧所在的文件夹（换子文件夹时重新写入关键帧）
+        self.frames_since_keyframe = 0  # 距上一张关键帧的截图数量
+
+    # 定义函数：写入一帧（帧数据为原始 RGB 像素）
+    def write(self, frame):
+        width, height = frame.size
+        pixels = np.frombuffer(frame.data, dtype=np.uint8).reshape(height, width, 3)
+        save_path = self.get_save_path(frame)
+        tiles = None
+        if (self.keyframe is not None and self.keyframe.shape == pixels.shape and save_path == self.keyframe_folder
+                and self.frames_since_keyframe < self.KEYFRAME_INTERVAL):
+            tiles, total_tiles = find_changed_tiles(self.keyframe, pixels, self.TILE_SIZE)
+            if len(tiles) > total_tiles * self.KEYFRAME_CHANGE_RATIO:
+                tiles = None  # 变化太多，差分帧不比关键帧小
+        if tiles is None:  # 写入关键帧
+            filename = self.make_filename(frame, get_image_extension(self.image_format))
+            data = encode_image(Image.fromarray(pixels), self.image_format, frame.jpg_quality)
+            self.keyframe = pixels
+            self.keyframe_name = filename
+            self.keyframe_folder = save_path
+            self.frames_since_keyframe = 0
+        else:  # 写入差分帧
+            filename = self.make_filename(frame, TILE_FILE_EXTENSION[1:])
+            data = encode_tile_delta(pixels, tiles, self.TILE_SIZE, self.keyframe_name, self.image_format, frame.jpg_quality)
+            self.frames_since_keyframe += 1
+        filepath = os.path.join(save_path, filename)
+        write_capture_file(filepath, data)
+        self.on_frame_written(filepath, len(data))
+        self.last_filename = filename
+
+TILE_FILE_EXTENSION = ".tiles"  # 差分帧文件扩展名
+TILE_FILE_MAGIC = b"FKT1"  # 差分帧文件头标识
+
+# 定义函数：找出与参考画面相比发生变化的图块，返回 ([(列, 行), ...], 图块总数)
+def find_changed_tiles(reference, pixels, tile_size):
+    height, width = pixels.shape[:2]
+    rows, columns = -(-height // tile_size), -(-width // tile_size)  # 向上取整，边缘不足一块的部分也算一块
+    changed = np.zeros((rows * tile_size, columns * tile_size), dtype=bool)
+    changed[:height, :width] = np.any(reference != pixels, axis=2)
+    tile_changed = changed.reshape(rows, tile_size, columns, tile_size).any(axis=(1, 3))
+    tile_rows, tile_columns = np.nonzero(tile_changed)
+    return list(zip(tile_columns.tolist(), tile_rows.tolist())), rows * columns
+
+# 定义函数：将变化的图块拼成一张图片并编码为差分帧文件内容
+def encode_tile_delta(pixels, tiles, tile_size, keyframe_name, image_format, jpg_quality):
+    header = {"version": 1, "keyframe": keyframe_name, "size": [pixels.shape[1], pixels.shape[0]], "tile": tile_size, "tiles": tiles}
+    image_bytes = b""
+    if tiles:
+        columns = int(np.ceil(np.sqrt(len(tiles))))  # 拼图尽量接近正方形
+        rows = -(-len(tiles) // columns)
+        mosaic = np.zeros((rows * tile_size, columns * tile_size, 3), dtype=np.uint8)
+        for index, (tile_x, tile_y) in enumerate(tiles):
+            block = pixels[tile_y * tile_size:(tile_y + 1) * tile_size, tile_x * tile_size:(tile_x + 1) * tile_size]
+            row, column = divmod(index, columns)
+            mosaic[row * tile_size:row * tile_size + block.shape[0], column * tile_size:column * tile_size + block.shape[1]] = block
+        image_bytes = encode_image(Image.fromarray(mosaic), image_format, jpg_quality)
+    header_bytes = json.dumps(header).encode("utf-8")
+    return TILE_FILE_MAGIC + len(header_bytes).to_bytes(4, "little") + header_bytes + image_bytes
+
+# 定义函数：读取差分帧文件，返回 (文件头, 拼图编码数据)
+def read_tile_delta(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != TILE_FILE_MAGIC:
+        raise ValueError(f"不是有效的差分帧文件: {path}")
+    header_length = int.from_bytes(data[4:8], "little")
+    return json.loads(data[8:8 + header_length].decode("utf-8")), data[8 + header_length:]
+
+tile_keyframe_cache = threading.local()  # 每个读取线程缓存最近解码的关键帧（连续的差分帧通常共用同一关键帧）
+
+# 定义函数：读取一张截图为 OpenCV 的 BGR 图像，差分帧会用关键帧和变化的图块还原为完整画面
+def decode_capture_frame(path):
+    member = find_pack_member(path)
+    if member is not None:  # 帧包中的一帧
+        return decode_image_bytes(read_pack_member(*member))
+    if not path.lower().endswith(TILE_FILE_EXTENSION):
+        return decode_image_bytes(np.fromfile(path, dtype=np.uint8))
+    header, image_bytes = read_tile_delta(path)
+    keyframe_path = os.path.join(os.path.dirname(path), header["keyframe"])
+    if getattr(tile_keyframe_cache, "path", None) != keyframe_path:
+        tile_keyframe_cache.frame = decode_image_bytes(np.fromfile(keyframe_path, dtype=np.uint8))
+        tile_keyframe_cache.path = keyframe_path
+    if tile_keyframe_cache.frame is None:
+        return None  # 关键帧缺失或损坏
+    frame = tile_keyframe_cache.frame.copy()
+    if header["tiles"]:
+        mosaic = decode_image_bytes(image_bytes)
+        tile_size = header["tile"]
+        columns = mosaic.shape[1] // tile_size
+        for index, (tile_x, tile_y) in enumerate(header["tiles"]):
+            target = frame[tile_y * tile_size:(tile_y + 1) * tile_size, tile_x * tile_size:(tile_x + 1) * tile_size]
+            row, column = divmod(index, columns)
+            target[:] = mosaic[row * tile_size:row * tile_size + target.shape[0], column * tile_size:column * tile_size + target.shape[1]]
+    return frame
+
+# 定义函数：获取截图的分辨率（差分帧从文件头读取，帧包中的帧从索引读取）
+def get_capture_frame_size(path):
+    member = find_pack_member(path)
+    if member is not None:
+        return member[1]["size"]
+    if path.lower().endswith(TILE_FILE_EXTENSION):
+        return tuple(read_tile_delta(path)[0]["size"])
+    with Image.open(path) as img:
+        return img.size
+
+# 帧包存储：把编码后的截图依次追加到一个大的帧包文件（.fkpack）中，同时在索引文件（.fkidx）中
+# 为每帧追加一条定长记录（偏移、长度、截图时刻、分辨率、格式），按大小或时长滚动到新的帧包。
+# 一个帧包代替成千上万个小文件，大大减轻文件系统和网络共享的元数据负担
+class PackFrameStore:
+    FOLDER_NAME = "帧包"  # 帧包保存在采集根目录（默认为项目文件夹）下的该子文件夹中
+
+    # 初始化存储
+    def __init__(self, folders=None, max_bytes=256 * 1024 * 1024, max_seconds=3600):
+        self.folders = folders or config  # 所属画面流的文件夹
+        self.max_bytes = max_bytes  # 单个帧包的大小上限（字节）
+        self.max_seconds = max_seconds  # 单个帧包覆盖的截图时长（秒）
+        self.pack_path = None  # 当前帧包路径
+        self.pack_file = None  # 当前帧包文件
+        self.index_file = None  # 当前索引文件
+        self.pack_bytes = 0  # 当前帧包已写入的字节数
+        self.pack_start = None  # 当前帧包第一帧的截图时刻
+        self.last_record = None  # 最近写入的一帧的 (偏移, 长度, 分辨率, 格式)，重复标记指向它
+
+    # 定义函数：开始一个新的帧包
+    def open_pack(self, frame):
+        folder = os.path.join(self.folders.get_capture_root(), self.FOLDER_NAME)
+        os.makedirs(folder, exist_ok=True)
+        base_path = os.path.join(folder, f"pack_{format_capture_timestamp(frame.timestamp)}")
+        self.pack_path = base_path + PACK_EXTENSION
+        self.pack_file = open(self.pack_path, "ab")
+        self.index_file = open(base_path + PACK_INDEX_EXTENSION, "ab")
+        self.pack_bytes = self.pack_file.tell()
+        self.pack_start = frame.timestamp
+        self.last_record = None
+        open_pack_paths.add(self.pack_path)
+
+    # 定义函数：结束当前帧包
+    def close_pack(self):
+        if self.pack_file is None:
+            return
+        self.pack_file.close()
+        self.index_file.close()
+        open_pack_paths.discard(self.pack_path)
+        self.pack_file = self.index_file = None
+
+    # 定义函数：追加一条索引记录
+    def append_record(self, offset, length, timestamp, size, image_format):
+        self.index_file.write(PACK_RECORD.pack(offset, length, timestamp, size[0], size[1], get_image_extension(image_format).encode("ascii")))
+        self.index_file.flush()
+        self.last_record = (offset, length, size, image_format)
+
+    # 定义函数：写入一帧
+    def write(self, frame):
+        if self.pack_file is not None and (self.pack_bytes >= self.max_bytes or frame.timestamp - self.pack_start >= self.max_seconds):
+            self.close_pack()  # 帧包大小或时长已满时换一个新帧包
+        if self.pack_file is None:
+            self.open_pack(frame)
+        offset = self.pack_bytes
+        self.pack_file.write(frame.data)
+        self.pack_file.flush()  # 先写入帧数据再写入索引，程序中断时索引不会指向不完整的数据
+        self.pack_bytes += len(frame.data)
+        self.append_record(offset, len(frame.data), frame.timestamp, frame.size, frame.format)
+        record_disk_usage(self.folders.get_project_path(), len(frame.data) + PACK_RECORD.size)
+
+    # 定义函数：重复标记：追加一条指向上一帧数据的索引记录（不重复保存图片）
+    def write_repeat(self, frame):
+        if self.pack_file is not None and self.last_record is not None:
+            offset, length, size, image_format = self.last_record
+            self.append_record(offset, length, frame.timestamp, size, image_format)
+            record_disk_usage(self.folders.get_project_path(), PACK_RECORD.size)
+
+    # 定义函数：关闭存储
+    def close(self):
+        self.close_pack()
+
+PACK_EXTENSION = ".fkpack"  # 帧包文件扩展名
+PACK_INDEX_EXTENSION = ".fkidx"  # 帧包索引文件扩展名
+PACK_RECORD = struct.Struct("<QIdHH4s")  # 索引记录：偏移、长度、截图时刻、宽、高、格式（共 28 字节）
+open_pack_paths = set()  # 正在写入的帧包和视频片段（清理冗余截图和超出配额时跳过）
+pack_index_cache = {}  # {帧包路径: (索引文件大小, 帧列表, {帧名称: 帧})}
+pack_index_lock = threading.Lock()
+
+# 定义函数：读取帧包索引，返回帧列表 [{"name", "offset", "length", "timestamp", "size"}, ...]，
+# 帧名称与图片存储方式的文件名规则相同，因此帧包中的帧可以用 “帧包路径/帧名称” 的形式当作普通截图路径使用
+def read_pack_index(pack_path):
+    return load_pack_index(pack_path)[0]
+
+# 定义函数：读取帧包索引（索引文件未变化时使用缓存），返回 (帧列表, {帧名称: 帧})
+def load_pack_index(pack_path):
+    index_path = pack_path[:-len(PACK_EXTENSION)] + PACK_INDEX_EXTENSION
+    index_size = os.path.getsize(index_path)
+    with pack_index_lock:
+        cached = pack_index_cache.get(pack_path)
+        if cached is not None and cached[0] == index_size:
+            return cached[1], cached[2]
+    with open(index_path, "rb") as f:
+        data = f.read(index_size - index_size % PACK_RECORD.size)  # 忽略末尾未写完整的记录
+    entries = []
+    last_stamp, stamp_repeat = None, 0
+    for offset, length, timestamp, width, height, image_format in PACK_RECORD.iter_unpack(data):
+        stamp = format_capture_timestamp(timestamp)
+        stamp_repeat = stamp_repeat + 1 if stamp == last_stamp else 0  # 与 FolderFrameStore 相同的防重名规则
+        last_stamp = stamp
+        suffix = f"_{stamp_repeat}" if stamp_repeat else ""
+        extension = image_format.rstrip(b"\0").decode("ascii")
+        entries.append({"name": f"capture_{stamp}{suffix}.{extension}", "offset": offset, "length": length,
+                        "timestamp": timestamp, "size": (width, height)})
+    by_name = {entry["name"]: entry for entry in entries}
+    with pack_index_lock:
+        pack_index_cache[pack_path] = (index_size, entries, by_name)
+    return entries, by_name
+
+# 定义函数：列出帧包中所有帧的路径（帧包路径/帧名称）
+def list_pack_members(pack_path):
+    return [os.path.join(pack_path, entry["name"]) for entry in read_pack_index(pack_path)]
+
+# 定义函数：如果路径指向帧包中的一帧，返回 (帧包路径, 帧索引记录)，否则返回 None
+def find_pack_member(path):
+    pack_path, name = os.path.split(path)
+    if not pack_path.endswith(PACK_EXTENSION):
+        return None
+    return pack_path, load_pack_index(pack_path)[1][name]
+
+# 定义函数：读取帧包中一帧的编码数据
+def read_pack_member(pack_path, entry):
+    with open(pack_path, "rb") as f:
+        f.seek(entry["offset"])
+        return f.read(entry["length"])
+
+# 定义函数：重写帧包，去掉 removed_names 中的帧（清理冗余截图时调用）
+def rewrite_pack(pack_path, removed_names):
+    index_path = pack_path[:-len(PACK_EXTENSION)] + PACK_INDEX_EXTENSION
+    old_size = os.path.getsize(pack_path) + os.path.getsize(index_path)
+    new_offsets = {}  # 旧偏移 -> 新偏移（重复标记共用同一份数据）
+    with open(pack_path, "rb") as source, open(pack_path + ".tmp", "wb") as pack_file, open(index_path + ".tmp", "wb") as index_file:
+        for entry in read_pack_index(pack_path):
+            if entry["name"] in removed_names:
+                continue
+            if entry["offset"] not in new_offsets:
+                source.seek(entry["offset"])
+                new_offsets[entry["offset"]] = pack_file.tell()
+                pack_file.write(source.read(entry["length"]))
+            extension = entry["name"].rsplit(".", 1)[1]
+            index_file.write(PACK_RECORD.pack(new_offsets[entry["offset"]], entry["length"], entry["timestamp"],
+                                              entry["size"][0], entry["size"][1], extension.encode("ascii")))
+    os.replace(pack_path + ".tmp", pack_path)
+    os.replace(index_path + ".tmp", index_path)
+    with pack_index_lock:
+        pack_index_cache.pop(pack_path, None)
+    return old_size - os.path.getsize(pack_path) - os.path.getsize(index_path)  # 释放的字节数
+
+# 视频直录存储：把截图的原始像素直接送入常驻的 FFmpeg 编码进程，按时间滚动生成视频片段，
+# 不再保存单张图片，也不需要事后导出
+class VideoSegmentStore:
+    FOLDER_NAME = "视频片段"  # 视频片段保存在采集根目录（默认为项目文件夹）下的该子文件夹中
+
+    # 初始化存储
+    def __init__(self, fps, segment_seconds, folders=None):
+        self.folders = folders or config  # 所属画面流的文件夹
+        self.fps = fps  # 视频播放帧率（每张截图占一帧）
+        self.segment_seconds = segment_seconds  # 每个片段覆盖的截图时长（秒）
+        self.process = None  # 当前片段的 FFmpeg 进程
+        self.segment_size = None  # 当前片段的分辨率
+        self.segment_start = None  # 当前片段第一帧的截图时刻
+        self.segment_path = None  # 当前片段的文件路径
+        self.last_data = None  # 最近写入的一帧（重复标记时再次写入，保持时间轴准确）
+        self.segment_count = 0  # 已创建的片段数量
+        self.closing_threads = []  # 正在后台结束的 FFmpeg 进程
+
+    # 定义函数：开始一个新的视频片段
+    def open_segment(self, frame):
+        folder = os.path.join(self.folders.get_capture_root(), self.FOLDER_NAME)
+        os.makedirs(folder, exist_ok=True)
+        width, height = frame.size
+        output_path = os.path.join(folder, f"record_{format_capture_timestamp(frame.timestamp)}_{width}x{height}.mp4")
+        bitrate = calculate_bitrate(width, height, self.fps, config.video_quality)  # 与导出视频使用相同的码率策略
+        # frag_keyframe + empty_moov：分段写入 MP4，程序意外退出时已写入的部分仍可播放
+        self.process = create_ffmpeg_writer(output_path, width, height, self.fps, bitrate, pix_fmt="rgb24",
+                                            extra_args=["-movflags", "+frag_keyframe+empty_moov"])
+        self.segment_size = frame.size
+        self.segment_start = frame.timestamp
+        self.segment_path = output_path
+        self.segment_count += 1
+        open_pack_paths.add(output_path)  # 正在写入的片段不会因超出配额被删除
+
+    # 定义函数：结束当前片段（在后台等待 FFmpeg 写完文件，不阻塞写入线程）
+    def close_segment(self):
+        process = self.process
+        segment_path = self.segment_path
+        project_path = self.folders.get_project_path()
+        self.process = None
+        self.last_data = None
+        if process is None:
+            return
+
+        def finish():
+            try:
+                process.stdin.close()
+                process.wait()
+                record_disk_usage(project_path, os.path.getsize(segment_path))  # 视频片段写完后才计入磁盘占用
+            except Exception:
+                pass
+            open_pack_paths.discard(segment_path)
+        thread = threading.Thread(target=finish, daemon=True)
+        thread.start()
+        self.closing_threads.append(thread)
+
+    # 定义函数：写入一帧
+    def write(self, frame):
+        if self.process is not None and (frame.size != self.segment_size or frame.timestamp - self.segment_start >= self.segment_seconds):
+            self.close_segment()  # 分辨率变化或片段时长已满时换一个新片段
+        if self.process is None:
+            self.open_segment(frame)
+        self.process.stdin.write(frame.data)
+        self.last_data = frame.data
+
+    # 定义函数：重复标记：再次写入上一帧
+    def write_repeat(self, frame):
+        if self.process is not None and self.last_data is not None:
+            self.process.stdin.write(self.last_data)
+
+    # 定义函数：关闭存储，等待所有片段写完
+    def close(self):
+        self.close_segment()
+        for thread in self.closing_threads:
+            thread.join(timeout=30.0)
+
+# 环形缓冲存储（“飞行记录仪”）：只在内存中保留最近一段时间的已编码截图，
+# 用户从右键菜单保存或触发器触发时，才按项目的子文件夹结构写入磁盘
+class FlightRecorderStore:
+    # 初始化存储
+    def __init__(self, max_seconds, max_bytes):
+        self.max_seconds = max_seconds  # 最多保留最近多少秒的截图
+        self.max_bytes = max_bytes  # 最多占用的内存（字节）
+        self.frames = deque()  # 缓冲区中的帧（按截图时间排列）
+        self.total_bytes = 0  # 缓冲区中帧数据的总大小
+        self.lock = threading.Lock()  # 写入线程和保存线程同时访问缓冲区
+        self.flush_lock = threading.Lock()  # 同一时间只允许一次保存
+        self.flushed_frames = 0  # 累计保存到磁盘的帧数
+
+    # 定义函数：放入一帧并淘汰超出时长或内存上限的旧帧
+    def append(self, frame):
+        frame.detach_data()  # 缓冲区中的帧要保留到淘汰或保存，不占用流水线的编码缓冲区
+        with self.lock:
+            self.frames.append(frame)
+            self.total_bytes += len(frame.data or b"")
+            while self.frames and (self.total_bytes > self.max_bytes or frame.timestamp - self.frames[0].timestamp > self.max_seconds):
+                oldest = self.frames.popleft()
+                self.total_bytes -= len(oldest.data or b"")
+
+    def write(self, frame):
+        self.append(frame)
+
+    def write_repeat(self, frame):
+        self.append(frame)  # 重复标记也按时间顺序保留，保存时写入 repeats.log
+
+    def close(self):
+        pass  # 停止截图后缓冲区仍然保留，直到下次开始截图，期间仍可保存
+
+    # 定义函数：获取缓冲区状态（帧数、内存占用、覆盖的时长）
+    def get_stats(self):
+        with self.lock:
+            span = self.frames[-1].timestamp - self.frames[0].timestamp if len(self.frames) > 1 else 0.0
+            return {"frames": len(self.frames), "bytes": self.total_bytes, "seconds": span}
+
+    # 定义函数：把缓冲区中的帧写入当前项目，返回写入的截图数量
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                frames = list(self.frames)  # 取出当前缓冲区的快照后立即清空，截图可以继续写入缓冲区
+                self.frames.clear()
+                self.total_bytes = 0
+            store = StreamRouterStore(FolderFrameStore)  # 沿用各画面流 / 数字子文件夹的目录结构和计数
+            written = 0
+            for frame in frames:
+                if frame.repeat:
+                    store.write_repeat(frame)
+                else:
+                    store.write(frame)
+                    written += 1
+            for stream_store in store.stores.values():
+                stream_store.folders.flush_manifest()
+            self.flushed_frames += written
+            return written
+
+# 多画面流存储：按帧所属的画面流分发给各自的存储，每个画面流有独立的文件夹、计数和视频片段
+class StreamRouterStore:
+    # 初始化存储
+    def __init__(self, store_factory):
+        self.store_factory = store_factory  # 根据画面流的文件夹创建存储
+        self.stores = {}  # {画面流名称: 存储}
+
+    # 定义函数：获取帧所属画面流的存储（第一次用到时创建）
+    def get_store(self, frame):
+        stream = frame.stream
+        name = stream.name if stream is not None else FULL_SCREEN_STREAM
+        store = self.stores.get(name)
+        if store is None:
+            store = self.store_factory(stream.folders if stream is not None else config)
+            self.stores[name] = store
+        return store
+
+    def write(self, frame):
+        self.get_store(frame).write(frame)
+
+    def write_repeat(self, frame):
+        self.get_store(frame).write_repeat(frame)
+
+    def close(self):
+        for store in self.stores.values():
+            store.close()
+
+flight_recorder = None  # 环形缓冲模式下的缓冲区（停止截图后保留到下次开始截图）
+
+# 定义函数：保存环形缓冲区中的截图（右键菜单或触发器调用），返回保存的截图数量
+def flush_flight_recorder():
+    if capture_process is not None:  # 缓冲区在截图进程中
+        return capture_process.request("flush_recorder")
+    if flight_recorder is None:
+        return 0
+    return flight_recorder.flush()
+
+# 定义函数：在后台保存环形缓冲区并提示结果（右键菜单调用）
+def save_flight_recorder(icon=None):
+    def flush_task():
+        try:
+            written = flush_flight_recorder()
+        except Exception as e:
+            run_in_main_thread(messagebox.showerror, "保存失败", f"保存缓冲区截图时出错: {e}")
+            return
+        run_in_main_thread(messagebox.showinfo, "保存完成", f"已将缓冲区中的 {written} 张截图保存到项目: {config.project_name}")
+    threading.Thread(target=flush_task, daemon=True).start()
+
+# 定义函数：托盘菜单中显示的缓冲区状态
+def get_flight_recorder_status_text(menu_item=None):
+    if capture_process is not None:
+        status = capture_process.get_cached_status()  # 不在托盘菜单线程中等待截图进程
+        if status is None:
+            return "缓冲区: 截图进程没有响应" if capture_process.status_failed else "缓冲区: 读取中…"
+        return status["flight_recorder"]
+    if flight_recorder is None:
+        return "缓冲区: 未启用"
+    stats = flight_recorder.get_stats()
+    return (f"缓冲区: {stats['frames']} 帧 / {stats['seconds']:.0f} 秒 / "
+            f"{stats['bytes'] / (1024 * 1024):.0f} MB（上限 {flight_recorder.max_bytes // (1024 * 1024)} MB）")
+
+STORAGE_MODES = ("图片", "视频直录", "环形缓冲", "差分图块", "帧包")  # 截图存储方式
+
+# 定义函数：根据配置创建截图存储
+def create_frame_store():
+    global flight_recorder
+    if config.storage_mode == "视频直录":
+        return StreamRouterStore(lambda folders: VideoSegmentStore(config.record_fps, config.video_segment_minutes * 60, folders))
+    if config.storage_mode == "环形缓冲":
+        flight_recorder = FlightRecorderStore(config.ring_buffer_seconds, config.ring_buffer_memory_mb * 1024 * 1024)
+        return flight_recorder  # 缓冲区中的帧保存时再按画面流分发
+    if config.storage_mode == "差分图块":
+        return StreamRouterStore(lambda folders: TileDeltaStore(folders, config.format))
+    if config.storage_mode == "帧包":
+        return StreamRouterStore(lambda folders: PackFrameStore(folders, config.pack_max_mb * 1024 * 1024, config.pack_max_minutes * 60))
+    return StreamRouterStore(FolderFrameStore)
+
+# 定义函数：获取截图时使用的编码格式
+def get_capture_format():
+    return "RAW" if config.storage_mode in ("视频直录", "差分图块") else config.format  # 这两种存储方式需要原始像素
+
+'''磁盘配额'''
+QUOTA_ACTIONS = ("删除最旧截图", "暂停截图")  # 超出配额时的处理方式
+
+# 磁盘占用账本：记录程序储存目录下每个项目占用的空间，保存在储存目录中。
+# 只有账本中还没有的项目才遍历一次文件夹，之后写入和删除截图时增量更新，不再重新遍历
+class DiskUsageLedger:
+    FILE_NAME = ".framekeeper_usage.json"  # 账本文件名（保存在程序储存目录中）
+    SAVE_INTERVAL = 30  # 账本最多每隔多少秒写入一次磁盘
+    RATE_WINDOW = 600  # 估算写入速度使用最近多少秒的写入
+
+    # 初始化账本
+    def __init__(self, base_path):
+        self.base_path = base_path  # 程序储存目录
+        self.path = os.path.join(base_path, self.FILE_NAME)  # 账本文件路径
+        self.projects = {}  # {项目名称: 占用字节数}
+        self.written = deque()  # 最近写入的 (time.monotonic(), 字节数)，用于估算写入速度
+        self.last_saved = time.monotonic()  # 上次写入账本的时间
+        self.measuring = set()  # 正在后台统计的项目
+        self.lock = threading.Lock()  # 写入线程、截图线程和托盘线程同时访问
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.projects = {str(name): int(size) for name, size in json.load(f).get("projects", {}).items()}
+        except (OSError, ValueError, AttributeError):
+            self.projects = {}  # 账本不存在或已损坏时，各项目在第一次查询时重新统计
+
+    # 定义函数：获取项目占用的空间（字节）；账本中没有该项目时遍历一次项目文件夹，measure=False 时返回 None
+    def get_project_usage(self, project_name, measure=True):
+        with self.lock:
+            usage = self.projects.get(project_name)
+        if usage is None and measure:
+            usage = measure_folder_size(os.path.join(self.base_path, project_name))
+            with self.lock:
+                usage = self.projects.setdefault(project_name, usage)
+        return usage
+
+    # 定义函数：在后台统计账本中还没有的项目（已经在统计的项目不重复统计）
+    def measure_in_background(self, project_names):
+        with self.lock:
+            names = [name for name in project_names if name not in self.projects and name not in self.measuring]
+            self.measuring.update(names)
+        if names:
+            threading.Thread(target=self.measure_projects, args=(names,), daemon=True).start()
+
+    # 定义函数：依次统计项目占用的空间（后台线程）
+    def measure_projects(self, project_names):
+        try:
+            for name in project_names:
+                self.get_project_usage(name)
+        finally:
+            with self.lock:
+                self.measuring.difference_update(project_names)
+
+    # 定义函数：获取储存目录下所有项目占用的空间（字节）；measure=False 时有项目尚未统计则在后台统计并返回 None
+    def get_total_usage(self, measure=True):
+        names = get_project_names()
+        usages = [self.get_project_usage(name, measure) for name in names]
+        if None in usages:
+            self.measure_in_background(names)
+            return None
+        return sum(usages)
+
+    # 定义函数：增量更新项目占用的空间（写入为正，删除为负）
+    def add(self, project_name, delta):
+        now = time.monotonic()
+        with self.lock:
+            if project_name not in self.projects:
+                return  # 还没有统计过的项目在第一次查询时遍历文件夹，自然包含本次变化
+            self.projects[project_name] = max(0, self.projects[project_name] + delta)
+            if delta > 0:
+                self.written.append((now, delta))
+            while self.written and now - self.written[0][0] > self.RATE_WINDOW:
+                self.written.popleft()
+        if now - self.last_saved >= self.SAVE_INTERVAL:
+            self.save()
+
+    # 定义函数：重新遍历项目文件夹统计占用空间（在程序之外删除或复制了截图时使用）
+    def recount(self, project_name):
+        usage = measure_folder_size(os.path.join(self.base_path, project_name))
+        with self.lock:
+            self.projects[project_name] = usage
+        self.save()
+        return usage
+
+    # 定义函数：估算最近的写入速度（字节/秒）
+    def get_write_rate(self):
+        with self.lock:
+            if len(self.written) < 2:
+                return 0.0
+            span = time.monotonic() - self.written[0][0]
+            return sum(size for _, size in self.written) / span if span > 0 else 0.0
+
+    # 定义函数：将账本写入磁盘（先写临时文件再替换）
+    def save(self):
+        with self.lock:
+            data = {"version": 1, "projects": dict(self.projects)}
+            self.last_saved = time.monotonic()
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass  # 账本只是缓存，写入失败时下次启动重新统计
+
+# 定义函数：遍历文件夹统计占用的空间（字节）
+def measure_folder_size(path):
+    total = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass  # 统计期间被删除的文件
+    return total
+
+disk_usage_ledger = None  # 当前程序储存目录的磁盘占用账本
+
+# 定义函数：获取当前程序储存目录的磁盘占用账本（修改储存目录后换用新目录的账本）
+def get_disk_usage_ledger():
+    global disk_usage_ledger
+    if disk_usage_ledger is None or disk_usage_ledger.base_path != config.base_save_path:
+        if disk_usage_ledger is not None:
+            disk_usage_ledger.save()
+        disk_usage_ledger = DiskUsageLedger(config.base_save_path)
+    return disk_usage_ledger
+
+# 定义函数：记录项目中写入（正数）或删除（负数）的字节数，不在程序储存目录中的文件夹（如自测的临时文件夹）忽略
+def record_disk_usage(project_path, delta):
+    if capture_process is not None:  # 在独立进程中截图时账本由截图进程维护，托盘进程中的删除也交给它记录
+        try:
+            capture_process.request("add_disk_usage", project_path, delta)
+        except (OSError, EOFError):
+            pass  # 截图进程没有响应时账本会与磁盘不一致，可以在“查看磁盘占用”中重新统计
+        return
+    ledger = get_disk_usage_ledger()
+    project_path = os.path.normpath(project_path)
+    if os.path.dirname(project_path) == os.path.normpath(ledger.base_path):
+        ledger.add(os.path.basename(project_path), delta)
+
+# 定义函数：当前项目超出项目配额 ratio 倍的字节数（未超出或未设置时为 0）。
+# 截图线程调用，不遍历文件夹：项目尚未统计时在后台统计，统计完成前不检查
+def get_project_quota_excess(ratio=1.0):
+    if config.project_quota_gb <= 0:
+        return 0
+    ledger = get_disk_usage_ledger()
+    usage = ledger.get_project_usage(config.project_name, measure=False)
+    if usage is None:
+        ledger.measure_in_background([config.project_name])
+        return 0
+    return max(0, usage - config.project_quota_gb * ratio * 1024 ** 3)
+
+# 定义函数：储存目录中所有项目超出总配额 ratio 倍的字节数（未超出、未设置或尚未统计完时为 0）
+def get_global_quota_excess(ratio=1.0):
+    if config.global_quota_gb <= 0:
+        return 0
+    usage = get_disk_usage_ledger().get_total_usage(measure=False)
+    return max(0, usage - config.global_quota_gb * ratio * 1024 ** 3) if usage is not None else 0
+
+# 定义函数：当前项目和储存目录超出配额 ratio 倍的字节数（都未超出时为 0）
+def get_quota_excess(ratio=1.0):
+    return max(get_project_quota_excess(ratio), get_global_quota_excess(ratio))
+
+STORED_FILE_STAMP_PATTERN = re.compile(r'^(?:pack|record)_(\d{8}_\d{6}_\d{3})')  # 帧包和视频片段文件名中的时间戳
+
+# 定义函数：列出采集根目录中最旧的一批可删除的截图，返回 [(截图时刻, [文件路径, ...]), ...]。
+# 只查看最旧的一个（有截图的）子文件夹，以及帧包和视频片段文件夹；差分帧与它依赖的关键帧作为一组一起删除。
+# 最旧的文件夹就是正在写入的文件夹（active_folder）时，保留其中最新的一组（差分图块存储仍在引用这张关键帧）
+def list_oldest_capture_units(capture_root, active_folder=None):
+    units = []
+    for special in (PackFrameStore.FOLDER_NAME, VideoSegmentStore.FOLDER_NAME):
+        folder = os.path.join(capture_root, special)
+        if not os.path.isdir(folder):
+            continue
+        for filename in os.listdir(folder):
+            match = STORED_FILE_STAMP_PATTERN.match(filename)
+            path = os.path.join(folder, filename)
+            if not match or filename.endswith(PACK_INDEX_EXTENSION) or path in open_pack_paths:
+                continue  # 正在写入的帧包和视频片段不删除；帧包索引随帧包一起删除
+            paths = [path]
+            if filename.endswith(PACK_EXTENSION):
+                paths.append(path[:-len(PACK_EXTENSION)] + PACK_INDEX_EXTENSION)
+            units.append((datetime.strptime(match.group(1), "%Y%m%d_%H%M%S_%f"), paths))
+
+    # 按数字（或日期、小时）顺序找到最旧的有截图的文件夹
+    def folder_key(name):
+        return (0, int(name), "") if name.isdigit() else (1, 0, name)
+    pending = [capture_root]
+    while pending:
+        folder = pending.pop(0)
+        try:
+            names = sorted(os.listdir(folder), key=folder_key)
+        except OSError:
+            continue
+        captures = sorted((parse_capture_filename(name), name) for name in names if parse_capture_filename(name) is not None)
+        if captures and folder != capture_root:
+            keyframe_unit = None
+            for capture_time, name in captures:
+                if name.endswith(TILE_FILE_EXTENSION) and keyframe_unit is not None:
+                    keyframe_unit[1].append(os.path.join(folder, name))  # 差分帧跟随它之前的关键帧
+                else:
+                    keyframe_unit = (capture_time, [os.path.join(folder, name)])
+                    units.append(keyframe_unit)
+            if active_folder is not None and os.path.normpath(folder) == os.path.normpath(active_folder):
+                units.remove(keyframe_unit)
+            break
+        subfolders = [os.path.join(folder, name) for name in names if os.path.isdir(os.path.join(folder, name))
+                      and name not in (PackFrameStore.FOLDER_NAME, VideoSegmentStore.FOLDER_NAME)
+                      and not (folder == capture_root and is_capture_stream_folder(os.path.join(folder, name)))]
+        pending[:0] = subfolders  # 深度优先：先查看最旧文件夹中的子文件夹
+    return sorted(units, key=lambda unit: unit[0])
+
+# 定义函数：删除项目（包括其它画面流）中最旧的截图，直到释放 target_bytes 字节，返回 (删除的文件数, 释放的字节数)。
+# project_paths 为多个项目时，按截图时刻在所有项目中删除最旧的截图
+def prune_oldest_captures(project_paths, target_bytes):
+    roots = {}  # 采集根目录 -> 所属项目
+    for project_path in project_paths:
+        roots[project_path] = project_path
+        try:
+            names = os.listdir(project_path)
+        except OSError:
+            continue
+        for name in names:
+            if os.path.isdir(os.path.join(project_path, name)) and is_capture_stream_folder(os.path.join(project_path, name)):
+                roots[os.path.join(project_path, name)] = project_path
+    freed_by_project = dict.fromkeys(project_paths, 0)
+    active_folders = {os.path.normpath(stream.folders.get_capture_root()): stream.folders.get_active_folder() for stream in capture_streams}
+    deleted_files = freed = 0
+    while freed < target_bytes:
+        units = []
+        for root, project_path in roots.items():
+            units += [(capture_time, paths, project_path) for capture_time, paths in list_oldest_capture_units(root, active_folders.get(os.path.normpath(root)))]
+        units.sort(key=lambda unit: unit[0])
+        deleted_any = False
+        for _, paths, project_path in units:
+            if freed >= target_bytes:
+                break
+            for path in paths:
+                try:
+                    size = os.path.getsize(path)
+                    os.remove(path)
+                except OSError:
+                    continue  # 正在写入的视频片段等无法删除的文件
+                freed += size
+                freed_by_project[project_path] += size
+                deleted_files += 1
+                deleted_any = True
+        for folder in {os.path.dirname(paths[0]) for _, paths, _ in units}:
+            remove_empty_capture_folder(folder)
+        if not deleted_any:
+            break  # 没有可以删除的截图了
+    for project_path, project_freed in freed_by_project.items():
+        if project_freed:
+            record_disk_usage(project_path, -project_freed)
+    return deleted_files, freed
+
+# 定义函数：文件夹中已没有截图时删除该文件夹（连同重复标记记录）
+def remove_empty_capture_folder(folder):
+    if os.path.basename(folder) in (PackFrameStore.FOLDER_NAME, VideoSegmentStore.FOLDER_NAME):
+        return
+    try:
+        names = os.listdir(folder)
+        if any(parse_capture_filename(name) is not None or os.path.isdir(os.path.join(folder, name)) for name in names):
+            return
+        for name in names:
+            os.remove(os.path.join(folder, name))  # 只剩 repeats.log 等附属文件
+        os.rmdir(folder)
+    except OSError:
+        pass
+
+# 磁盘配额检查：截图循环每个时间点调用一次（实际每隔几秒才检查），超出配额时在后台删除最旧的截图，或暂停截图直到空间恢复
+class DiskQuotaGuard:
+    CHECK_INTERVAL = 5.0  # 检查间隔（秒）
+    PRUNE_TARGET = 0.95  # 删除到配额的 95%，避免每写入几帧就删除一次
+
+    # 初始化配额检查
+    def __init__(self):
+        self.paused = False  # 是否因超出配额暂停截图
+        self.pruning = False  # 是否正在后台删除最旧的截图
+        self.last_check = 0.0  # 上次检查的时间
+        self.pruned_files = 0  # 累计删除的文件数
+        self.pruned_bytes = 0  # 累计释放的字节数
+        self.last_error = None  # 最近一次删除失败的原因
+
+    # 定义函数：检查配额，返回是否应暂停截图
+    def check(self):
+        now = time.monotonic()
+        if self.pruning or now - self.last_check < self.CHECK_INTERVAL:
+            return self.paused
+        self.last_check = now
+        if config.project_quota_gb <= 0 and config.global_quota_gb <= 0:
+            self.paused = False
+            return False
+        try:
+            excess = get_quota_excess()
+        except OSError as e:
+            self.last_error = str(e)
+            return self.paused
+        if excess <= 0:
+            self.paused = False
+        elif config.quota_action == "暂停截图":
+            self.paused = True
+        else:
+            self.pruning = True
+            threading.Thread(target=self.prune, daemon=True).start()
+        return self.paused
+
+    # 定义函数：删除最旧的截图（后台线程）
+    def prune(self):
+        try:
+            files = freed = 0
+            project_excess = get_project_quota_excess(self.PRUNE_TARGET)
+            if project_excess > 0:
+                files, freed = prune_oldest_captures([config.project_path], project_excess)
+            global_excess = get_global_quota_excess(self.PRUNE_TARGET)
+            if global_excess > 0:  # 超出总配额时在所有项目中删除最旧的截图
+                project_paths = [os.path.join(config.base_save_path, name) for name in get_project_names()]
+                global_files, global_freed = prune_oldest_captures(project_paths, global_excess)
+                files, freed = files + global_files, freed + global_freed
+            self.pruned_files += files
+            self.pruned_bytes += freed
+            self.paused = get_quota_excess() > 0  # 只剩正在写入的截图、删无可删时暂停
+        except Exception as e:
+            self.last_error = str(e)
+        finally:
+            self.pruning = False
+
+disk_quota_guard = DiskQuotaGuard()  # 磁盘配额检查
+
+# 定义函数：格式化字节数
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+# 定义函数：按最近的写入速度估算多少秒后用满（项目配额、全部项目的配额和磁盘剩余空间中最先用满的一个），无法估算时返回 None
+def estimate_seconds_until_full():
+    ledger = get_disk_usage_ledger()
+    rate = ledger.get_write_rate()
+    if rate <= 0:
+        return None
+    try:
+        remaining = [shutil.disk_usage(config.base_save_path).free]
+    except OSError:
+        remaining = []
+    if config.project_quota_gb > 0:
+        remaining.append(config.project_quota_gb * 1024 ** 3 - (ledger.get_project_usage(config.project_name, measure=False) or 0))
+    total = ledger.get_total_usage(measure=False) if config.global_quota_gb > 0 else None  # 尚未统计完时不计总配额
+    if total is not None:
+        remaining.append(config.global_quota_gb * 1024 ** 3 - total)
+    return max(0.0, min(remaining)) / rate if remaining else None
+
+# 定义函数：格式化剩余时长
+def format_duration(seconds):
+    if seconds >= 86400:
+        return f"{seconds / 86400:.1f} 天"
+    if seconds >= 3600:
+        return f"{seconds / 3600:.1f} 小时"
+    return f"{seconds / 60:.0f} 分钟"
+
+# 定义函数：托盘菜单中显示的磁盘占用（只使用账本中已有的数据，项目尚未统计时在后台统计）
+def get_disk_usage_status_text(menu_item=None):
+    if capture_process is not None:  # 磁盘占用账本由截图进程维护
+        status = capture_process.get_cached_status()  # 不在托盘菜单线程中等待截图进程
+        if status is None:
+            return "磁盘占用: 截图进程没有响应" if capture_process.status_failed else "磁盘占用: 读取中…"
+        return status["disk_usage"]
+    ledger = get_disk_usage_ledger()
+    usage = ledger.get_project_usage(config.project_name, measure=False)
+    if usage is None:
+        ledger.measure_in_background([config.project_name])
+        return "磁盘占用: 统计中…"
+    text = f"磁盘占用: {format_bytes(usage)}"
+    if config.project_quota_gb > 0:
+        text += f" / {config.project_quota_gb:g} GB"
+    if disk_quota_guard.paused:
+        return text + "（超出配额，已暂停截图）"
+    seconds = estimate_seconds_until_full() if config.is_running else None
+    if seconds is not None:
+        text += f"，约 {format_duration(seconds)}后用满"
+    return text
+
+# 定义函数：显示磁盘占用详情，可重新统计当前项目（右键菜单调用）
+def show_disk_usage(icon=None):
+    try:
+        lines = capture_process.request("disk_usage") if capture_process is not None else get_disk_usage_details()
+    except (OSError, EOFError, TimeoutError) as e:
+        messagebox.showerror("磁盘占用", f"截图进程没有响应: {e}")
+        return
+    if messagebox.askyesno("磁盘占用", "\n".join(lines) + "\n\n占用空间是在写入和删除截图时累计的。如果在程序之外删除或复制过截图，是否重新统计当前项目？"):
+        usage = capture_process.request("recount_disk_usage") if capture_process is not None else get_disk_usage_ledger().recount(config.project_name)
+        messagebox.showinfo("磁盘占用", f"当前项目【{config.project_name}】: {format_bytes(usage)}")
+
+# 定义函数：磁盘占用详情（每项一行）
+def get_disk_usage_details():
+    ledger = get_disk_usage_ledger()
+    usage = ledger.get_project_usage(config.project_name)
+    total = ledger.get_total_usage()
+    lines = [f"当前项目【{config.project_name}】: {format_bytes(usage)}" + (f"（配额 {config.project_quota_gb:g} GB）" if config.project_quota_gb > 0 else ""),
+             f"全部项目: {format_bytes(total)}" + (f"（配额 {config.global_quota_gb:g} GB）" if config.global_quota_gb > 0 else "")]
+    try:
+        lines.append(f"磁盘剩余空间: {format_bytes(shutil.disk_usage(config.base_save_path).free)}")
+    except OSError:
+        pass
+    rate = ledger.get_write_rate()
+    if rate > 0:
+        lines.append(f"最近写入速度: {format_bytes(rate * 3600)}/小时")
+        seconds = estimate_seconds_until_full()
+        if seconds is not None:
+            lines.append(f"预计 {format_duration(seconds)}后用满")
+    if disk_quota_guard.pruned_files:
+        lines.append(f"本次运行因超出配额删除了 {disk_quota_guard.pruned_files} 个最旧的截图文件，释放 {format_bytes(disk_quota_guard.pruned_bytes)}")
+    if disk_quota_guard.paused:
+        lines.append("已超出配额，截图已暂停，空间恢复后自动继续")
+    if staging_flusher is not None:
+        lines.append(f"本地暂存中还有 {staging_flusher.get_pending_count()} 个文件等待搬运" +
+                     (f"（最近一次搬运出错: {staging_flusher.last_error}）" if staging_flusher.last_error else ""))
+    if disk_quota_guard.last_error:
+        lines.append(f"最近一次配额处理出错: {disk_quota_guard.last_error}")
+    return lines
+
+'''本地暂存'''
+# 本地暂存：程序储存目录在网络共享或机械硬盘上时，截图先写入本地的暂存目录（保持相对于储存目录的路径），
+# 再由后台线程每隔一段时间批量搬运到项目文件夹，写入线程不再等待网络或磁盘。
+# 暂存目录中记录了对应的储存目录，程序异常退出后，下次启动时会把尚未搬运的截图继续搬运过去。
+# 帧包和视频直录是对单个文件持续追加，仍直接写入项目文件夹
+class StagingFlusher:
+    MARKER_FILE = ".framekeeper_staging.json"  # 暂存目录中记录对应储存目录的文件
+    TEMP_SUFFIX = ".tmp"  # 正在写入的暂存文件
+    CLAIM_SUFFIX = ".flushing"  # 正在搬运的追加日志
+
+    # 初始化暂存
+    def __init__(self, staging_root, base_path, flush_seconds=10):
+        self.staging_root = os.path.abspath(staging_root)  # 本地暂存目录
+        self.base_path = os.path.abspath(base_path)  # 截图最终保存的储存目录
+        self.flush_seconds = flush_seconds  # 搬运间隔（秒）
+        self.known_folders = set()  # 已创建的暂存子文件夹
+        self.log_lock = threading.Lock()  # 追加日志（repeats.log）时与搬运线程互斥
+        self.flush_lock = threading.Lock()  # 同一时间只进行一次搬运
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.flushed_files = 0  # 累计搬运的文件数
+        self.last_error = None  # 最近一次搬运失败的原因
+        os.makedirs(self.staging_root, exist_ok=True)
+        with open(os.path.join(self.staging_root, self.MARKER_FILE), "w", encoding="utf-8") as f:
+            json.dump({"base_path": self.base_path}, f, ensure_ascii=False)
+
+    # 定义函数：获取截图文件对应的暂存路径，不在储存目录中的文件（如自测的临时文件夹）返回 None
+    def get_staged_path(self, filepath):
+        relative = os.path.relpath(os.path.abspath(filepath), self.base_path)
+        if relative.startswith(os.pardir) or os.path.isabs(relative):
+            return None
+        staged = os.path.join(self.staging_root, relative)
+        folder = os.path.dirname(staged)
+        if folder not in self.known_folders:
+            os.makedirs(folder, exist_ok=True)
+            self.known_folders.add(folder)
+        return staged
+
+    # 定义函数：启动后台搬运线程
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    # 定义函数：后台搬运线程，每隔一段时间搬运一批
+    def run(self):
+        while not self.stop_event.wait(self.flush_seconds):
+            self.flush()
+
+    # 定义函数：停止后台线程并搬运剩余的截图（此时已不再写入新截图，可以删除空的暂存子文件夹）
+    def close(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.flush(remove_folders=True)
+
+    # 定义函数：把暂存目录中已写完的文件全部搬运到储存目录，返回搬运的文件数
+    def flush(self, remove_folders=False):
+        with self.flush_lock:
+            return self.flush_into(self.staging_root, self.base_path, remove_folders)
+
+    # 定义函数：搬运暂存目录中的文件；截图过程中不删除暂存子文件夹，写入线程可能正要写入
+    def flush_into(self, staging_root, base_path, remove_folders):
+        moved = 0
+        for dirpath, dirnames, filenames in os.walk(staging_root, topdown=False):
+            relative = os.path.relpath(dirpath, staging_root)
+            target_folder = os.path.normpath(os.path.join(base_path, relative))
+            for name in filenames:
+                if remove_folders and name.endswith(self.TEMP_SUFFIX):  # 已经不再写入时，剩下的临时文件是异常退出时没写完的截图
+                    try:
+                        os.remove(os.path.join(dirpath, name))
+                    except OSError:
+                        pass
+            filenames = [name for name in filenames if name != self.MARKER_FILE and not name.endswith(self.TEMP_SUFFIX)]  # 跳过写入线程还没有写完的文件
+            try:
+                if filenames:
+                    os.makedirs(target_folder, exist_ok=True)
+            except OSError as e:
+                self.last_error = str(e)
+                continue
+            for filename in filenames:
+                source = os.path.join(dirpath, filename)
+                try:
+                    if filename.endswith(".log") or filename.endswith(self.CLAIM_SUFFIX):
+                        self.flush_log(source, os.path.join(target_folder, filename.split(self.CLAIM_SUFFIX)[0]))
+                    else:
+                        move_file(source, os.path.join(target_folder, filename))
+                    moved += 1
+                except OSError as e:
+                    self.last_error = str(e)  # 储存目录暂时不可用时留在暂存目录中，下次再搬运
+            if remove_folders and dirpath != staging_root:
+                try:
+                    os.rmdir(dirpath)  # 只删除已经搬空的子文件夹
+                except OSError:
+                    pass
+        self.flushed_files += moved
+        return moved
+
+    # 定义函数：把暂存的追加日志追加到储存目录中的同名日志后面
+    def flush_log(self, source, target):
+        if not source.endswith(self.CLAIM_SUFFIX):
+            claimed = source + self.CLAIM_SUFFIX
+            with self.log_lock:  # 改名之后写入线程会新建一个日志，不会写到正在搬运的日志中
+                os.replace(source, claimed)
+            source = claimed
+        with open(source, "rb") as f:
+            data = f.read()
+        with open(target, "ab") as f:
+            f.write(data)
+        os.remove(source)
+
+    # 定义函数：获取尚未搬运的文件数量
+    def get_pending_count(self):
+        return sum(1 for _, _, filenames in os.walk(self.staging_root) for name in filenames if name != self.MARKER_FILE)
+
+# 定义函数：跨磁盘搬运文件（同一磁盘时直接改名；否则先复制为临时文件再改名，中断后不会留下不完整的截图）
+def move_file(source, target):
+    try:
+        os.replace(source, target)
+        return
+    except OSError:
+        pass
+    temp_target = target + StagingFlusher.TEMP_SUFFIX
+    shutil.copyfile(source, temp_target)
+    os.replace(temp_target, target)
+    os.remove(source)
+
+staging_flusher = None  # 正在使用的本地暂存（未启用时为 None）
+staging_lock = threading.RLock()  # 启动时搬运遗留截图与开始暂存互斥，两个搬运不会同时处理同一个暂存目录
+
+# 定义函数：写入截图文件（启用本地暂存时写入暂存目录，先写临时文件再改名，搬运线程不会搬运写了一半的文件）
+def write_capture_file(filepath, data):
+    staged = staging_flusher.get_staged_path(filepath) if staging_flusher is not None else None
+    if staged is None:
+        with open(filepath, "wb") as f:
+            f.write(data)
+        return
+    with open(staged + StagingFlusher.TEMP_SUFFIX, "wb") as f:
+        f.write(data)
+    os.replace(staged + StagingFlusher.TEMP_SUFFIX, staged)
+
+# 定义函数：向日志文件追加一行（启用本地暂存时追加到暂存目录中的同名日志）
+def append_capture_log(filepath, text):
+    flusher = staging_flusher
+    staged = flusher.get_staged_path(filepath) if flusher is not None else None
+    if staged is None:
+        with open(filepath, "a", encoding="utf-8") as f:
+            f.write(text)
+        return
+    with flusher.log_lock:
+        with open(staged, "a", encoding="utf-8") as f:
+            f.write(text)
+
+# 定义函数：开始使用本地暂存（开始截图时调用），同时搬运上次未搬运完的截图
+def start_staging():
+    global staging_flusher
+    if not config.staging_path:
+        return None
+    with staging_lock:  # 启动时的搬运还没有完成时等待它完成
+        recover_staged_captures()
+        flusher = StagingFlusher(config.staging_path, config.base_save_path, config.staging_flush_seconds)
+        flusher.start()
+        staging_flusher = flusher
+    return flusher
+
+# 定义函数：停止使用本地暂存（停止截图时调用），搬运剩余的截图
+def stop_staging():
+    global staging_flusher
+    flusher = staging_flusher
+    staging_flusher = None  # 之后的写入直接写入项目文件夹
+    if flusher is not None:
+        flusher.close()
+
+# 定义函数：立即搬运暂存的截图（导出视频、清理冗余截图前调用，确保读取到最新的截图）
+def flush_staged_captures():
+    if capture_process is not None:  # 暂存目录由截图进程搬运
+        try:
+            return capture_process.request("flush_staging", timeout=CAPTURE_PROCESS_STOP_TIMEOUT)
+        except (OSError, EOFError):
+            return 0  # 截图进程没有响应时读取项目文件夹中已有的截图
+    flusher = staging_flusher
+    return flusher.flush() if flusher is not None else 0
+
+# 定义函数：搬运暂存目录中上次运行（异常退出）时没有搬运完的截图，搬运到暂存目录中记录的储存目录，返回搬运的文件数
+def recover_staged_captures():
+    with staging_lock:
+        if not config.staging_path or not os.path.isdir(config.staging_path) or staging_flusher is not None:
+            return 0
+        try:
+            with open(os.path.join(config.staging_path, StagingFlusher.MARKER_FILE), "r", encoding="utf-8") as f:
+                base_path = json.load(f)["base_path"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return 0  # 不是本程序的暂存目录，或者从来没有使用过
+        recovery = StagingFlusher(config.staging_path, base_path)
+        return recovery.flush(remove_folders=True)
+
+'''截图编码器'''
+# 编码器基类：encode() 把 PIL 图像编码为图片字节。设置中的“图片格式”保存的是编码器名称，
+# 旧版的 “JPG” 和 “PNG” 仍对应原来的 PIL 编码方式
+encode_scratch = threading.local()  # 每个编码线程复用的中间缓冲区
+
+# 定义函数：获取当前线程复用的数组（形状变化时重新分配），用作颜色转换等中间结果
+def get_scratch_array(name, shape):
+    arrays = encode_scratch.__dict__.setdefault("arrays", {})
+    array = arrays.get(name)
+    if array is None or array.shape != shape:
+        array = arrays[name] = np.empty(shape, dtype=np.uint8)
+    return array
+
+# 定义函数：获取当前线程复用的内存字节流（保留上次的容量，避免编码时反复扩容）
+def get_scratch_stream():
+    stream = getattr(encode_scratch, "stream", None)
+    if stream is None:
+        stream = encode_scratch.stream = io.BytesIO()
+    stream.seek(0)
+    return stream
+
+# 定义函数：取出复用字节流中本次写入的内容（getvalue() 会交出内部缓冲区，下次写入时又要重新分配）
+def take_scratch_stream_bytes(stream):
+    size = stream.tell()
+    with stream.getbuffer() as view, view[:size] as data:
+        return data.tobytes()
+
+# 编码缓冲区池：流水线中的编码结果直接写入复用的内存字节流，写入阶段拿到的是字节流上的 memoryview，
+# 写入完成后归还；字节流保留上次的容量，稳定运行时不再为每帧分配新的结果缓冲区
+class EncodeBufferPool:
+    # 初始化编码缓冲区池
+    def __init__(self, capacity):
+        self.capacity = capacity  # 最多保留的空闲字节流数量
+        self.free = []  # 空闲字节流
+        self.in_use = {}  # 使用中的字节流：id(字节流) -> [字节流, memoryview, 引用计数]
+        self.allocations = 0  # 累计新建的字节流数量
+        self.lock = threading.Lock()  # 编码线程取出，写入线程和预览服务归还
+
+    # 定义函数：取出一个空的字节流
+    def acquire(self):
+        with self.lock:
+            if self.free:
+                stream = self.free.pop()
+            else:
+                stream = io.BytesIO()
+                self.allocations += 1
+            self.in_use[id(stream)] = [stream, None, 1]
+        stream.seek(0)
+        return stream
+
+    # 定义函数：获取字节流中本次写入内容的 memoryview（不复制）
+    def take_view(self, stream):
+        size = stream.tell()
+        with stream.getbuffer() as view:
+            data = view[:size]  # 切片持有自己的导出，字节流在 data 释放前不能被改写或扩容
+        with self.lock:
+            self.in_use[id(stream)][1] = data
+        return data
+
+    # 定义函数：增加一次引用（不是从池中取出的字节流忽略）
+    def retain(self, stream):
+        with self.lock:
+            entry = self.in_use.get(id(stream))
+            if entry is not None:
+                entry[2] += 1
+
+    # 定义函数：归还一次引用，引用全部归还后释放 memoryview，字节流回到池中
+    def release(self, stream):
+        with self.lock:
+            entry = self.in_use.get(id(stream))
+            if entry is None:
+                return
+            entry[2] -= 1
+            if entry[2] > 0:
+                return
+            del self.in_use[id(stream)]
+            if entry[1] is not None:
+                entry[1].release()
+            if len(self.free) < self.capacity:
+                self.free.append(stream)
+
+# 定义函数：将 RGB 图像转换为 OpenCV 使用的 BGR 数组（结果写入复用的数组）
+def image_to_bgr(image):
+    rgb = np.asarray(image)
+    return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR, dst=get_scratch_array("bgr", rgb.shape))
+
+class FrameEncoder:
+    name = ""  # 编码器名称（显示在设置窗口中，并保存到配置文件）
+    extension = ""  # 截图文件扩展名
+    lossy = False  # 是否为有损编码（有损编码使用压缩质量设置）
+    writes_stream = False  # 是否直接编码到内存字节流（流水线中编码到复用的编码缓冲区，不再为每帧新建结果）
+
+    # 定义函数：判断编码器在当前环境中是否可用
+    def is_available(self):
+        return True
+
+    # 定义函数：编码一帧，返回编码结果（bytes 或 memoryview）；直接编码到字节流的编码器使用当前线程复用的字节流
+    def encode(self, image, quality):
+        buffer = get_scratch_stream()
+        self.encode_into(image, quality, buffer)
+        return take_scratch_stream_bytes(buffer)
+
+    # 定义函数：把一帧编码写入字节流的当前位置（writes_stream 为 True 的编码器实现）
+    def encode_into(self, image, quality, stream):
+        raise NotImplementedError
+
+# PIL JPEG 编码器：原有的 JPG 编码方式
+class PilJpegEncoder(FrameEncoder):
+    name = "JPG"
+    extension = "jpg"
+    lossy = True
+    writes_stream = True
+
+    def encode_into(self, image, quality, stream):
+        image.save(stream, "JPEG", quality=quality)  # 保存为 JPG 格式，使用指定的压缩质量
+
+# OpenCV JPEG 编码器：OpenCV 自带 libjpeg-turbo，通常比 PIL 更快
+class OpenCvJpegEncoder(FrameEncoder):
+    name = "JPG (OpenCV)"
+    extension = "jpg"
+    lossy = True
+
+    def encode(self, image, quality):
+        return cv2.imencode(".jpg", image_to_bgr(image), [cv2.IMWRITE_JPEG_QUALITY, quality])[1].reshape(-1).data  # 直接使用 OpenCV 输出的数组，不再复制为 bytes
+
+# turbojpeg 编码器：通过 PyTurboJPEG 直接调用 libjpeg-turbo，可直接编码 RGB 像素，省去颜色转换
+class TurboJpegEncoder(FrameEncoder):
+    name = "JPG (turbojpeg)"
+    extension = "jpg"
+    lossy = True
+
+    def __init__(self):
+        self.jpeg = None  # TurboJPEG 实例（第一次使用时加载 libjpeg-turbo 动态库）
+        self.load_error = None  # 动态库加载失败的原因
+
+    def get_jpeg(self):
+        if self.jpeg is None and self.load_error is None:
+            try:
+                self.jpeg = turbojpeg.TurboJPEG()
+            except Exception as e:  # 已安装 PyTurboJPEG 但找不到 libjpeg-turbo 动态库
+                self.load_error = e
+        return self.jpeg
+
+    def is_available(self):
+        return turbojpeg is not None and self.get_jpeg() is not None
+
+    def encode(self, image, quality):
+        return self.get_jpeg().encode(np.asarray(image), quality=quality, pixel_format=turbojpeg.TJPF_RGB)
+
+# PIL PNG 编码器：原有的 PNG 编码方式（不压缩，速度快但文件很大）
+class PilPngEncoder(FrameEncoder):
+    name = "PNG"
+    extension = "png"
+    writes_stream = True
+
+    def encode_into(self, image, quality, stream):
+        image.save(stream, "PNG", compress_level=0)  # 保存为 PNG 格式，压缩级别为 0 （无压缩）
+
+# OpenCV PNG 编码器：最快的压缩级别，屏幕内容通常能压缩到无压缩 PNG 的几分之一
+class OpenCvPngEncoder(FrameEncoder):
+    name = "PNG (快速压缩)"
+    extension = "png"
+
+    def encode(self, image, quality):
+        return cv2.imencode(".png", image_to_bgr(image), [cv2.IMWRITE_PNG_COMPRESSION, 1])[1].reshape(-1).data  # 直接使用 OpenCV 输出的数组，不再复制为 bytes
+
+# WebP 有损编码器：同等画质下通常比 JPG 小
+class WebpLossyEncoder(FrameEncoder):
+    name = "WebP 有损"
+    extension = "webp"
+    lossy = True
+    writes_stream = True
+
+    def is_available(self):
+        return features.check("webp")
+
+    def encode_into(self, image, quality, stream):
+        image.save(stream, "WEBP", quality=quality, method=0)  # method=0：最快的编码速度
+
+# WebP 无损编码器：文字和界面截图的无损压缩率很高
+class WebpLosslessEncoder(FrameEncoder):
+    name = "WebP 无损"
+    extension = "webp"
+    writes_stream = True
+
+    def is_available(self):
+        return features.check("webp")
+
+    def encode_into(self, image, quality, stream):
+        image.save(stream, "WEBP", lossless=True, quality=0, method=0)  # 无损模式下 quality 表示压缩力度，0 最快
+
+# QOI 编码器：极快的无损格式，压缩率介于无压缩 PNG 和压缩 PNG 之间（需要 qoi 库，PIL 的 QOI 编码为纯 Python 实现，太慢）
+class QoiEncoder(FrameEncoder):
+    name = "QOI"
+    extension = "qoi"
+
+    def is_available(self):
+        return qoi is not None
+
+    def encode(self, image, quality):
+        return qoi.encode(np.asarray(image))
+
+IMAGE_ENCODERS = {encoder.name: encoder for encoder in (PilJpegEncoder(), OpenCvJpegEncoder(), TurboJpegEncoder(), PilPngEncoder(),
+                                                        OpenCvPngEncoder(), WebpLossyEncoder(), WebpLosslessEncoder(), QoiEncoder())}  # 所有编码器（名称 -> 实例）
+
+# 定义函数：获取当前环境中可用的编码器名称
+def get_available_image_encoders():
+    return [name for name, encoder in IMAGE_ENCODERS.items() if encoder.is_available()]
+
+# 定义函数：获取编码器（不存在或不可用时回退到 PIL JPEG）
+def get_image_encoder(name):
+    encoder = IMAGE_ENCODERS.get(name)
+    if encoder is None or not encoder.is_available():
+        encoder = IMAGE_ENCODERS["JPG"]
+    return encoder
+
+# 定义函数：获取截图格式（编码器名称）对应的文件扩展名
+def get_image_extension(image_format):
+    if image_format == "RAW":
+        return "raw"
+    return get_image_encoder(image_format).extension
+
+# 定义函数：将编码后的图片数据解码为 OpenCV 的 BGR 图像（OpenCV 不支持的格式如 QOI 交给 PIL 解码），失败时返回 None
+def decode_image_bytes(data):
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    frame = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    if frame is None and qoi is not None and buffer[:4].tobytes() == b"qoif":  # QOI 文件头
+        pixels = qoi.decode(buffer.tobytes())
+        return cv2.cvtColor(pixels, cv2.COLOR_RGBA2BGR if pixels.shape[2] == 4 else cv2.COLOR_RGB2BGR)
+    if frame is None:
+        try:
+            with Image.open(io.BytesIO(buffer)) as image:
+                frame = cv2.cvtColor(np.asarray(image.convert("RGB")), cv2.COLOR_RGB2BGR)
+        except Exception:
+            return None
+    return frame
+
+# 定义函数：用当前屏幕内容测试所有可用编码器的编码耗时和每帧大小
+def benchmark_image_encoders(frames=5):
+    backend = create_capture_backend(config.capture_backend)  # 使用独立的后端实例，不影响正在进行的截图
+    try:
+        image = backend.grab()
+    finally:
+        backend.close()
+    results = []
+    for name in get_available_image_encoders():
+        encoder = IMAGE_ENCODERS[name]
+        try:
+            encoder.encode(image, config.jpg_quality)  # 第一次编码包含初始化开销，不计入统计
+            start = time.perf_counter()
+            for _ in range(frames):
+                data = encoder.encode(image, config.jpg_quality)
+            elapsed = (time.perf_counter() - start) / frames
+            results.append({"name": name, "ms": elapsed * 1000, "bytes": len(data), "fps": 1 / elapsed if elapsed > 0 else 0.0})
+        except Exception as e:
+            results.append({"name": name, "error": str(e)})
+    return image.size, results
+
+# 定义函数：在后台测试编码器并显示结果（右键菜单调用）
+def show_image_encoder_benchmark(icon=None):
+    def benchmark_task():
+        try:
+            size, results = benchmark_image_encoders()
+        except Exception as e:
+            run_in_main_thread(messagebox.showerror, "编码器测速", f"测试失败: {e}")
+            return
+        lines = [f"测试画面: {size[0]}x{size[1]}（当前屏幕），有损编码质量 {config.jpg_quality}"]
+        for result in results:
+            if "error" in result:
+                lines.append(f"{result['name']}: 测试失败 ({result['error']})")
+            else:
+                current_mark = " [当前]" if result["name"] == config.format else ""
+                lines.append(f"{result['name']}{current_mark}: {result['ms']:.1f} ms/帧（约 {result['fps']:.0f} 帧/秒），{result['bytes'] / 1024:.0f} KB/帧")
+        run_in_main_thread(messagebox.showinfo, "编码器测速", "\n".join(lines))
+    threading.Thread(target=benchmark_task, daemon=True).start()
+
+'''压缩质量自动调节'''
+QUALITY_MODES = ("固定", "每帧大小", "每日空间")  # 压缩质量模式
+
+# 压缩质量调节器：根据最近几帧编码后的大小调节有损编码的压缩质量，使每帧大小接近目标。
+# 按每日空间预算调节时，目标大小 = 今天剩余的预算 ÷ 到今天结束前预计还会截取的帧数；
+# 今天已写入的字节数保存在采集根目录中，重新开始截图或重启程序后继续累计
+class JpegQualityController:
+    MIN_QUALITY = 20  # 自动调节的最低质量
+    MAX_QUALITY = 95  # 自动调节的最高质量
+    TOLERANCE = 0.1  # 平均大小与目标相差不超过 10% 时不调整
+    SMOOTHING = 0.3  # 平均大小的指数平滑系数（越大越快响应画面变化）
+    RATE_SAMPLES = 100  # 截图间隔不固定时，用最近多少帧的实际间隔估计剩余帧数
+    STATE_FILE = ".framekeeper_quality.json"  # 今天已写入字节数的保存文件名（保存在采集根目录中）
+    SAVE_INTERVAL = 30  # 今天已写入的字节数最多每隔多少秒保存一次
+
+    # 初始化调节器
+    def __init__(self, initial_quality, target_bytes=None, daily_budget_bytes=None, interval=10.0, state_folder=None):
+        self.quality = max(self.MIN_QUALITY, min(self.MAX_QUALITY, initial_quality))  # 当前使用的压缩质量
+        self.target_bytes = target_bytes  # 每帧目标大小（字节），按每日预算调节时为 None
+        self.daily_budget_bytes = daily_budget_bytes  # 每日空间预算（字节）
+        self.interval = interval  # 截图间隔（秒），用于估计今天剩余的帧数；为 None 时（自适应间隔、仅触发）按实际截图间隔估计
+        self.fallback_interval = 10.0  # 还没有实际截图间隔时使用的间隔（秒）
+        self.report_times = deque(maxlen=self.RATE_SAMPLES)  # 最近几帧的报告时间（time.monotonic()）
+        self.average_size = None  # 最近几帧的平均大小（字节）
+        self.day = None  # 当前统计的日期
+        self.spent_today = 0  # 今天已写入的字节数
+        self.state_path = os.path.join(state_folder, self.STATE_FILE) if state_folder is not None else None  # 为 None 时不保存
+        self.last_saved = time.monotonic()  # 上次保存今天已写入字节数的时间
+        self.lock = threading.Lock()  # 多个编码线程同时报告
+        self.load()
+
+    # 定义函数：读取之前保存的今天已写入字节数（不是今天的记录忽略）
+    def load(self):
+        if self.state_path is None:
+            return
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("day") == datetime.now().date().isoformat():
+                self.day = datetime.now().date()
+                self.spent_today = int(data.get("spent", 0))
+        except (OSError, ValueError, AttributeError):
+            pass  # 记录不存在或已损坏时从 0 开始
+
+    # 定义函数：保存今天已写入的字节数（先写临时文件再替换）
+    def save(self):
+        if self.state_path is None:
+            return
+        with self.lock:
+            data = {"day": self.day.isoformat() if self.day is not None else None, "spent": self.spent_today}
+            self.last_saved = time.monotonic()
+        temp_path = self.state_path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.state_path)
+        except OSError:
+            pass  # 保存失败时下次启动从 0 开始累计
+
+    # 定义函数：获取用于估计剩余帧数的截图间隔（秒）
+    def get_frame_interval(self):
+        if self.interval is not None:
+            return self.interval
+        if len(self.report_times) < 2:
+            return self.fallback_interval
+        return max(0.001, (self.report_times[-1] - self.report_times[0]) / (len(self.report_times) - 1))
+
+    # 定义函数：获取当前的每帧目标大小（字节）
+    def get_target_bytes(self):
+        if self.daily_budget_bytes is None:
+            return self.target_bytes
+        now = datetime.now()
+        seconds_left = (datetime.combine(now.date() + timedelta(days=1), datetime.min.time()) - now).total_seconds()
+        frames_left = max(1.0, seconds_left / self.get_frame_interval())
+        return max(0, self.daily_budget_bytes - self.spent_today) / frames_left
+
+    # 定义函数：报告一帧编码后的大小（编码线程调用），并据此调整之后截图的压缩质量
+    def report(self, quality, size):
+        with self.lock:
+            today = datetime.now().date()
+            if today != self.day:  # 新的一天重新计算预算
+                self.day = today
+                self.spent_today = 0
+            self.spent_today += size
+            self.report_times.append(time.monotonic())
+            self.average_size = size if self.average_size is None else self.average_size * (1 - self.SMOOTHING) + size * self.SMOOTHING
+            ratio = self.average_size / max(1.0, self.get_target_bytes())
+            if abs(ratio - 1) > self.TOLERANCE:
+                step = max(1, min(10, int(abs(np.log2(ratio)) * 8)))  # 与目标相差越多，调整幅度越大
+                quality = self.quality - step if ratio > 1 else self.quality + step
+                self.quality = max(self.MIN_QUALITY, min(self.MAX_QUALITY, quality))
+        if self.daily_budget_bytes is not None and time.monotonic() - self.last_saved >= self.SAVE_INTERVAL:
+            self.save()  # 定期保存今天已写入的字节数
+
+# 定义函数：估算画面流每次截图平均保存的像素数（每隔几次才保存的画面流按次数摊薄），screen_size 为主显示器尺寸
+def get_stream_pixel_rate(stream, screen_size):
+    region = (stream.source or stream).region
+    width, height = region[2:] if region is not None else screen_size
+    return width * height * stream.scale ** 2 / stream.every
+
+# 定义函数：根据配置创建压缩质量调节器（固定质量或无损格式时返回 None），每日预算按各画面流保存的像素数分配
+def create_quality_controller(stream, streams, screen_size):
+    if config.quality_mode == "固定" or not get_image_encoder(config.format).lossy:
+        return None
+    if config.quality_mode == "每日空间":
+        share = get_stream_pixel_rate(stream, screen_size) / sum(get_stream_pixel_rate(other, screen_size) for other in streams)
+        fixed_interval = config.interval_mode not in ("自适应", "仅触发")  # 间隔不固定时按实际截图间隔估计剩余帧数
+        controller = JpegQualityController(config.jpg_quality, daily_budget_bytes=config.daily_budget_mb * 1024 * 1024 * share,
+                                           interval=config.interval * stream.every if fixed_interval else None,
+                                           state_folder=stream.folders.get_capture_root())
+        if not fixed_interval:
+            controller.fallback_interval = config.get_reference_interval() * stream.every
+        return controller
+    return JpegQualityController(config.jpg_quality, target_bytes=config.target_frame_kb * 1024)
+
+'''共享内存画面总线'''
+# 共享内存画面总线：把每帧的原始 RGB 像素依次写入共享内存中的环形槽位，其它本机进程可以直接读取，不需要读盘和解码。
+# 布局：64 字节总头（魔数、版本、槽位数、每个槽位的像素容量、是否已关闭、最新帧序号），之后是各个槽位，
+# 每个槽位为 128 字节槽位头（开始写入的帧序号、截图时间、宽、高、通道数、像素字节数、流水线帧序号、画面流名称，
+# 末尾是写完的帧序号）加上像素数据。第 N 帧（从 1 开始）写入第 (N - 1) % 槽位数 个槽位；
+# 读取时先读写完的帧序号、再读像素、最后核对开始写入的帧序号，两者相同说明读取期间没有被覆盖
+class SharedFrameBus:
+    MAGIC = b"FKBUS\x00\x00\x01"  # 魔数
+    VERSION = 1
+    HEADER = struct.Struct("<8sIIIIQ")  # 魔数, 版本, 槽位数, 每个槽位的像素容量, 是否已关闭, 最新帧序号
+    HEADER_SIZE = 64
+    CLOSED_OFFSET = 20  # 总头中“是否已关闭”的位置
+    LATEST_OFFSET = 24  # 总头中“最新帧序号”的位置
+    SLOT_HEADER = struct.Struct("<QdIIIIQ32s")  # 开始写入的帧序号, 截图时间, 宽, 高, 通道数, 像素字节数, 流水线帧序号, 画面流名称
+    SLOT_HEADER_SIZE = 128
+    SEQUENCE_END_OFFSET = 120  # 槽位头中“写完的帧序号”的位置
+
+    # 初始化画面总线（第一次发布时才创建共享内存）
+    def __init__(self, name, slot_count, min_capacity=0):
+        self.name = name  # 共享内存名称
+        self.slot_count = max(1, slot_count)  # 槽位数
+        self.min_capacity = min_capacity  # 每个槽位至少能容纳的像素字节数
+        self.slot_capacity = 0  # 每个槽位的像素容量
+        self.shm = None  # 共享内存
+        self.sequence = 0  # 最新帧序号
+        self.oversized_frames = 0  # 超出槽位容量而没有发布的帧数
+        self.last_error = None  # 最近一次创建共享内存出错的信息
+        self.lock = threading.Lock()  # 多个编码线程同时发布
+
+    # 定义函数：创建共享内存；同名共享内存已存在（读取端仍在使用或上次异常退出）且足够大时直接复用
+    def create_segment(self, size):
+        try:
+            return shared_memory.SharedMemory(name=self.name, create=True, size=size)
+        except FileExistsError:
+            existing = shared_memory.SharedMemory(name=self.name)
+            if existing.size >= size:
+                return existing
+            existing.close()
+            if os.name == "nt":
+                raise  # Windows 上仍有读取端打开时无法替换
+            existing.unlink()
+            return shared_memory.SharedMemory(name=self.name, create=True, size=size)
+
+    # 定义函数：根据第一帧的大小创建共享内存并写入总头
+    def allocate(self, frame_bytes):
+        self.slot_capacity = max(frame_bytes, self.min_capacity)
+        self.shm = self.create_segment(self.HEADER_SIZE + self.slot_count * (self.SLOT_HEADER_SIZE + self.slot_capacity))
+        for slot in range(self.slot_count):  # 清空槽位头，复用上次的共享内存时避免读到旧帧
+            struct.pack_into("<Q", self.shm.buf, self.get_slot_offset(slot) + self.SEQUENCE_END_OFFSET, 0)
+        self.HEADER.pack_into(self.shm.buf, 0, self.MAGIC, self.VERSION, self.slot_count, self.slot_capacity, 0, 0)
+
+    # 定义函数：获取槽位在共享内存中的偏移
+    def get_slot_offset(self, slot):
+        return self.HEADER_SIZE + slot * (self.SLOT_HEADER_SIZE + self.slot_capacity)
+
+    # 定义函数：发布一帧原始画面（由编码线程调用）
+    def publish(self, frame):
+        image = frame.image
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        pixels = np.asarray(image)
+        stream_name = (frame.stream.name if frame.stream is not None else FULL_SCREEN_STREAM).encode("utf-8")[:32]
+        with self.lock:
+            if self.shm is None:
+                if self.last_error is not None:
+                    return
+                try:
+                    self.allocate(pixels.nbytes)
+                except (OSError, ValueError) as e:
+                    self.last_error = str(e)  # 创建失败后本次截图不再发布
+                    return
+            if pixels.nbytes > self.slot_capacity:  # 画面比创建时更大（例如显示器分辨率改变），重新开始截图后生效
+                self.oversized_frames += 1
+                return
+            self.sequence += 1
+            buf = self.shm.buf
+            offset = self.get_slot_offset((self.sequence - 1) % self.slot_count)
+            struct.pack_into("<Q", buf, offset, self.sequence)  # 先写开始写入的帧序号，读取端据此发现槽位正在被覆盖
+            target = np.ndarray(pixels.shape, dtype=np.uint8, buffer=buf, offset=offset + self.SLOT_HEADER_SIZE)
+            np.copyto(target, pixels)
+            del target  # 关闭共享内存前不能留有指向它的数组
+            height, width = pixels.shape[:2]
+            self.SLOT_HEADER.pack_into(buf, offset, self.sequence, frame.timestamp, width, height, 3, pixels.nbytes, frame.sequence or 0, stream_name)
+            struct.pack_into("<Q", buf, offset + self.SEQUENCE_END_OFFSET, self.sequence)
+            struct.pack_into("<Q", buf, self.LATEST_OFFSET, self.sequence)
+
+    # 定义函数：停止发布，标记为已关闭后释放共享内存
+    def close(self):
+        with self.lock:
+            if self.shm is None:
+                return
+            struct.pack_into("<I", self.shm.buf, self.CLOSED_OFFSET, 1)
+            self.shm.close()
+            if os.name != "nt":
+                self.shm.unlink()  # Windows 上最后一个读取端关闭后自动释放
+            self.shm = None
+
+# 画面总线读取端：供其它本机进程使用，read(copy=False) 返回直接指向共享内存的数组（不复制），
+# 使用完后用 is_valid(meta) 确认期间没有被覆盖；关闭前需要先释放这些数组
+class SharedFrameBusReader:
+    # 初始化读取端，连接到指定名称的画面总线
+    def __init__(self, name=Config.DEFAULT_FRAME_BUS_NAME):
+        self.shm = shared_memory.SharedMemory(name=name)
+        if os.name != "nt":
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self.shm._name, "shared_memory")  # 读取端退出时不能删除共享内存
+        magic, version, self.slot_count, self.slot_capacity, _, _ = SharedFrameBus.HEADER.unpack_from(self.shm.buf, 0)
+        if magic != SharedFrameBus.MAGIC or version != SharedFrameBus.VERSION:
+            self.shm.close()
+            raise ValueError(f"{name} 不是 FrameKeeper 画面总线")
+
+    # 定义函数：最新帧序号（还没有帧时为 0）
+    def get_latest_sequence(self):
+        return struct.unpack_from("<Q", self.shm.buf, SharedFrameBus.LATEST_OFFSET)[0]
+
+    # 定义函数：截图是否已经停止（停止后需要重新连接）
+    def is_closed(self):
+        return struct.unpack_from("<I", self.shm.buf, SharedFrameBus.CLOSED_OFFSET)[0] != 0
+
+    # 定义函数：读取指定序号（默认最新）的帧，返回 (元数据, 像素数组)，该帧已被覆盖或尚未写入时返回 None
+    def read(self, sequence=None, copy=True):
+        sequence = sequence or self.get_latest_sequence()
+        if sequence <= 0:
+            return None
+        offset = SharedFrameBus.HEADER_SIZE + (sequence - 1) % self.slot_count * (SharedFrameBus.SLOT_HEADER_SIZE + self.slot_capacity)
+        if struct.unpack_from("<Q", self.shm.buf, offset + SharedFrameBus.SEQUENCE_END_OFFSET)[0] != sequence:
+            return None
+        _, timestamp, width, height, channels, length, capture_sequence, stream = SharedFrameBus.SLOT_HEADER.unpack_from(self.shm.buf, offset)
+        meta = {"sequence": sequence, "timestamp": timestamp, "width": width, "height": height, "channels": channels,
+                "capture_sequence": capture_sequence, "stream": stream.rstrip(b"\x00").decode("utf-8", "replace"), "offset": offset}
+        pixels = np.ndarray((height, width, channels), dtype=np.uint8, buffer=self.shm.buf, offset=offset + SharedFrameBus.SLOT_HEADER_SIZE)
+        if copy:
+            pixels = pixels.copy()
+            if not self.is_valid(meta):
+                return None
+        return meta, pixels
+
+    # 定义函数：确认读取的帧在读取期间（或使用不复制的数组期间）没有被覆盖
+    def is_valid(self, meta):
+        return struct.unpack_from("<Q", self.shm.buf, meta["offset"])[0] == meta["sequence"]
+
+    # 定义函数：等待序号大于 after_sequence 的新帧，返回最新的一帧，超时或截图停止时返回 None
+    def wait_for_frame(self, after_sequence=0, timeout=None, poll_seconds=0.005, copy=True):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.is_closed():
+            if self.get_latest_sequence() > after_sequence:
+                result = self.read(copy=copy)
+                if result is not None:
+                    return result
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            time.sleep(poll_seconds)
+        return None
+
+    # 定义函数：断开连接
+    def close(self):
+        self.shm.close()
+
+frame_bus = None  # 当前截图循环的共享内存画面总线（未启用时为 None）
+
+# 定义函数：按设置创建画面总线，槽位容量按各画面流中最大的截取区域（整屏按最大的显示器）预留
+def create_frame_bus(streams, backend):
+    if not config.frame_bus_enabled:
+        return None
+    monitors = backend.list_monitors()
+    capacity = 0
+    for stream in streams:
+        regions = [stream.region] if stream.region is not None else monitors
+        for left, top, width, height in regions:
+            capacity = max(capacity, round(width * stream.scale) * round(height * stream.scale) * 3)
+    return SharedFrameBus(config.frame_bus_name, config.frame_bus_slots, capacity)
+
+'''实时预览'''
+# 实时预览：通过 HTTP 提供最新的截图，/stream 为 MJPEG 视频流，/latest.jpg 为最新一帧，/ 为预览页面，
+# 可用 ?stream=画面流名称 选择画面流（默认优先缩略图）。使用 JPG 格式时直接复用编码线程已经编码好的字节，
+# 不再重新编码；其它格式只在有人观看时按较低的频率单独编码一张缩小的 JPG
+class PreviewServer:
+    BOUNDARY = "framekeeper-frame"  # MJPEG 流中分隔各帧的边界
+    FALLBACK_INTERVAL = 1.0  # 非 JPG 格式时单独编码预览的最短间隔（秒）
+    FALLBACK_QUALITY = 70  # 单独编码预览时的压缩质量
+    WATCH_TIMEOUT = 10.0  # 最近一次请求后多久内仍视为有人观看（秒）
+
+    # 初始化实时预览
+    def __init__(self, port, allow_remote=False, key=None):
+        self.port = port  # 监听端口
+        self.allow_remote = allow_remote  # 是否允许其它电脑访问
+        self.key = key if allow_remote else None  # 允许其它电脑访问时，所有请求都必须带上 ?key=访问密钥
+        self.server = None
+        self.latest = {}  # {画面流名称: (预览序号, 截图时间, JPEG 数据, 编码缓冲区, 编码缓冲区池)}
+        self.sequence = 0  # 预览序号，每发布一帧加一
+        self.condition = threading.Condition()  # 有新帧时唤醒 MJPEG 流
+        self.clients = 0  # 正在观看 MJPEG 流的连接数
+        self.last_request = float("-inf")  # 最近一次请求的时间
+        self.last_fallback = float("-inf")  # 最近一次单独编码预览的时间
+        self.stopped = False
+
+    # 定义函数：启动 HTTP 服务
+    def start(self):
+        if self.allow_remote and not self.key:
+            raise ValueError("允许其它电脑访问时必须设置访问密钥")
+        preview = self
+
+        class RequestHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                preview.handle_request(self)
+
+            def log_message(self, format, *args):
+                pass  # 不在控制台输出访问日志
+
+        self.server = http.server.ThreadingHTTPServer(("0.0.0.0" if self.allow_remote else "127.0.0.1", self.port), RequestHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="preview-server", daemon=True).start()
+
+    # 定义函数：停止 HTTP 服务并结束所有 MJPEG 流
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            entries = list(self.latest.values())
+            self.latest.clear()
+            self.condition.notify_all()
+        for entry in entries:
+            self.release_entry(entry)
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    # 定义函数：发布编码完成的一帧（由编码线程调用，需在释放原始图像之前）
+    def publish(self, frame):
+        now = time.monotonic()
+        if self.clients == 0 and now - self.last_request > self.WATCH_TIMEOUT:
+            return  # 没有人观看时不发布
+        buffer = pool = None
+        if frame.format != "RAW" and get_image_encoder(frame.format).extension == "jpg":
+            data = frame.data  # 直接使用编码结果；来自编码缓冲区时增加一次引用，替换或停止时归还
+            if frame.encode_buffer is not None and frame.data_pool is not None:
+                buffer, pool = frame.encode_buffer, frame.data_pool
+                pool.retain(buffer)
+        else:
+            if now - self.last_fallback < self.FALLBACK_INTERVAL:
+                return
+            self.last_fallback = now
+            data = get_image_encoder("JPG").encode(frame.image.reduce(2), self.FALLBACK_QUALITY)
+        name = frame.stream.name if frame.stream is not None else FULL_SCREEN_STREAM
+        with self.condition:
+            previous = self.latest.get(name)
+            if previous is not None and previous[1] > frame.timestamp:
+                replaced = (None, frame.timestamp, data, buffer, pool)  # 多个编码线程乱序完成时不回退到更早的帧，归还这一帧
+            else:
+                self.sequence += 1
+                self.latest[name] = (self.sequence, frame.timestamp, data, buffer, pool)
+                self.condition.notify_all()
+                replaced = previous  # 归还被替换的帧
+        self.release_entry(replaced)
+
+    # 定义函数：为预览帧增加一次引用（调用时需持有 condition），发送完成后调用 release_entry 归还
+    def retain_entry(self, entry):
+        if entry is not None and entry[3] is not None:
+            entry[4].retain(entry[3])
+        return entry
+
+    # 定义函数：归还预览帧的一次引用
+    def release_entry(self, entry):
+        if entry is not None and entry[3] is not None:
+            entry[4].release(entry[3])
+
+    # 定义函数：获取画面流的最新一帧（未指定时优先缩略图，其次全屏），没有时返回 None（调用时需持有 condition）
+    def get_latest(self, stream_name=None):
+        if stream_name is None:
+            for name in (THUMBNAIL_STREAM, FULL_SCREEN_STREAM, *sorted(self.latest)):
+                if name in self.latest:
+                    return self.latest[name]
+            return None
+        return self.latest.get(stream_name)
+
+    # 定义函数：处理一个请求
+    def handle_request(self, request):
+        url = urllib.parse.urlsplit(request.path)
+        query = urllib.parse.parse_qs(url.query)
+        if self.key is not None and not secrets.compare_digest(query.get("key", [""])[0].encode("utf-8"), self.key.encode("utf-8")):
+            request.send_error(403, "Missing or invalid key")
+            return
+        stream_name = query.get("stream", [None])[0]
+        self.last_request = time.monotonic()
+        if url.path == "/":
+            self.send_page(request)
+        elif url.path == "/latest.jpg":
+            with self.condition:
+                entry = self.retain_entry(self.get_latest(stream_name))
+            if entry is None:
+                request.send_error(503, "No frame yet")
+                return
+            try:
+                request.send_response(200)
+                request.send_header("Content-Type", "image/jpeg")
+                request.send_header("Content-Length", str(len(entry[2])))
+                request.send_header("Cache-Control", "no-store")
+                request.send_header("X-Capture-Timestamp", f"{entry[1]:.3f}")
+                request.end_headers()
+                request.wfile.write(entry[2])
+            finally:
+                self.release_entry(entry)
+        elif url.path == "/stream":
+            self.send_stream(request, stream_name)
+        else:
+            request.send_error(404)
+
+    # 定义函数：返回预览页面（每个画面流一个 MJPEG 画面）
+    def send_page(self, request):
+        with self.condition:
+            names = sorted(self.latest)
+        key = f"&key={urllib.parse.quote(self.key)}" if self.key is not None else ""
+        images = "".join(f"<figure><img src='/stream?stream={urllib.parse.quote(name)}{key}'><figcaption>{html.escape(name)}</figcaption></figure>" for name in names)
+        body = ("<!DOCTYPE html><html><head><meta charset='utf-8'><title>FrameKeeper 实时预览</title>"
+                "<style>body{margin:0;background:#111;color:#ccc;font-family:sans-serif}img{max-width:100%}figure{margin:8px}</style></head>"
+                f"<body>{images or '<p>还没有截图，开始截图后刷新页面。</p>'}</body></html>").encode("utf-8")
+        request.send_response(200)
+        request.send_header("Content-Type", "text/html; charset=utf-8")
+        request.send_header("Content-Length", str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    # 定义函数：持续推送 MJPEG 流，直到客户端断开或停止截图
+    def send_stream(self, request, stream_name):
+        request.send_response(200)
+        request.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={self.BOUNDARY}")
+        request.send_header("Cache-Control", "no-store")
+        request.end_headers()
+        last_sequence = 0
+        with self.condition:
+            self.clients += 1
+        try:
+            while True:
+                with self.condition:
+                    entry = self.get_latest(stream_name)
+                    while not self.stopped and (entry is None or entry[0] <= last_sequence):
+                        self.condition.wait(timeout=5.0)
+                        entry = self.get_latest(stream_name)
+                    if self.stopped:
+                        return
+                    self.retain_entry(entry)
+                last_sequence, timestamp, data = entry[:3]
+                try:
+                    request.wfile.write(f"--{self.BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(data)}\r\n"
+                                        f"X-Capture-Timestamp: {timestamp:.3f}\r\n\r\n".encode("ascii"))
+                    request.wfile.write(data)
+                    request.wfile.write(b"\r\n")
+                    request.wfile.flush()
+                finally:
+                    self.release_entry(entry)
+        except OSError:
+            pass  # 客户端已断开
+        finally:
+            with self.condition:
+                self.clients -= 1
+                self.last_request = time.monotonic()
+
+    # 定义函数：预览页面的地址
+    def get_url(self):
+        return f"http://127.0.0.1:{self.port}/" + (f"?key={urllib.parse.quote(self.key)}" if self.key is not None else "")
+
+preview_server = None  # 当前截图循环的实时预览（未启用或启动失败时为 None）
+preview_error = None  # 最近一次启动实时预览失败的原因
+
+# 定义函数：按设置启动实时预览（端口被占用等情况下记录原因并返回 None）
+def start_preview_server():
+    global preview_error
+    preview_error = None
+    if not config.preview_port:
+        return None
+    server = PreviewServer(config.preview_port, config.preview_allow_remote, config.preview_key)
+    try:
+        server.start()
+    except (OSError, ValueError) as e:
+        preview_error = str(e)
+        return None
+    return server
+
+# 定义函数：在浏览器中打开实时预览（右键菜单调用）
+def open_preview(icon=None):
+    webbrowser.open(PreviewServer(config.preview_port, config.preview_allow_remote, config.preview_key).get_url())
+
+'''截图流水线'''
+# 截图帧：在截图线程中创建，依次经过编码阶段和写入阶段
+class CapturedFrame:
+    # 初始化截图帧
+    def __init__(self, image, timestamp, image_format, jpg_quality):
+        self.image = image  # 原始 PIL 图像（编码完成后释放）
+        self.size = image.size if image is not None else None  # 截图分辨率
+        self.timestamp = timestamp  # 截图时间（time.time()），用于生成文件名
+        self.format = image_format  # 截图时的图片格式，避免流水线中途修改设置导致前后不一致
+        self.jpg_quality = jpg_quality  # 截图时的 JPG 压缩质量
+        self.sequence = None  # 流水线中的帧序号，写入阶段按序号顺序写入
+        self.data = None  # 编码后的图片字节
+        self.error = None  # 编码失败时的错误信息
+        self.repeat = False  # 是否只是与上一张相同的“重复”标记（不编码、不保存图片）
+        self.stream = None  # 所属画面流（None 表示全屏画面流）
+        self.image_pool = None  # 图像来自截图图像池时，编码完成后归还
+        self.encode_buffer = None  # data 为编码缓冲区上的 memoryview 时，对应的字节流（写入完成后归还）
+        self.data_pool = None  # encode_buffer 所属的编码缓冲区池
+        self.timings = {}  # 各阶段耗时（秒），写入完成后交给截图耗时跟踪
+        self.started = None  # 开始抓屏的时刻（time.perf_counter()）
+
+    # 定义函数：释放原始图像（来自图像池的图像归还给图像池）
+    def release_image(self):
+        if self.image is not None and self.image_pool is not None:
+            self.image_pool.release(self.image)
+        self.image = None
+
+    # 定义函数：归还编码缓冲区（之后不能再访问 data）
+    def release_data(self):
+        if self.encode_buffer is not None and self.data_pool is not None:
+            self.data_pool.release(self.encode_buffer)
+            self.data = None
+        self.data_pool = None
+
+    # 定义函数：把编码缓冲区中的数据复制为独立的 bytes（需要长时间保留帧数据时调用）
+    def detach_data(self):
+        if self.encode_buffer is not None and self.data_pool is not None:
+            data = bytes(self.data)
+            self.release_data()
+            self.data = data
+
+# 定义函数：将 PIL 图像编码为图片字节（image_format 为编码器名称）
+def encode_image(image, image_format, jpg_quality):
+    if image_format == "RAW":  # 视频直录模式：原始 RGB 像素，直接交给 FFmpeg
+        return image.tobytes()
+    return get_image_encoder(image_format).encode(image, jpg_quality)
+
+# 定义函数：编码一帧；直接编码到字节流的编码器写入编码缓冲区池中的字节流，frame.data 为其上的 memoryview
+def encode_frame(frame, buffer_pool):
+    encoder = get_image_encoder(frame.format) if frame.format != "RAW" else None
+    if encoder is None or not encoder.writes_stream or buffer_pool is None:
+        frame.data = encode_image(frame.image, frame.format, frame.jpg_quality)
+        return
+    stream = buffer_pool.acquire()
+    try:
+        encoder.encode_into(frame.image, frame.jpg_quality, stream)
+    except Exception:
+        buffer_pool.release(stream)
+        raise
+    frame.data = buffer_pool.take_view(stream)
+    frame.encode_buffer = stream
+    frame.data_pool = buffer_pool
+
+# 截图流水线：截图线程 -> 编码线程池 -> 写入线程，三者通过有界队列连接，
+# 编码和磁盘写入的耗时不再拖慢截图节拍；队列已满时丢弃新帧并计数
+class CapturePipeline:
+    SUBMIT_TIMEOUT = 0.05  # 帧队列已满时截图线程最多等待的时间（秒），超时则丢弃该帧
+    CLOSE_TIMEOUT = 30.0  # 关闭时最多等待剩余的帧写完的时间（秒），退出程序时按同样的时间等待截图线程
+
+    # 初始化流水线
+    def __init__(self, store=None, encoder_workers=None, frame_queue_size=4, write_queue_size=16):
+        self.store = store or FolderFrameStore()  # 写入阶段使用的存储
+        num_cores = os.cpu_count() or 2  # 获取 CPU 核心数
+        self.encoder_workers = encoder_workers or max(1, min(4, num_cores // 2))  # 编码线程数：核心数的一半，1 到 4 个
+        self.frame_queue = queue.Queue(maxsize=frame_queue_size)  # 原始帧队列（原始帧占用内存大，队列较短）
+        self.write_queue = queue.Queue(maxsize=write_queue_size)  # 已编码帧队列
+        self.next_sequence = 0  # 下一个提交帧的序号
+        self.submitted_frames = 0  # 已提交的帧数
+        self.dropped_frames = 0  # 因队列已满被丢弃的帧数
+        self.written_frames = 0  # 已写入磁盘的帧数
+        self.failed_frames = 0  # 编码或写入失败的帧数
+        self.repeat_markers = 0  # 已记录的重复标记数
+        self.threads = []  # 编码线程和写入线程
+        self.buffer_pool = EncodeBufferPool(self.encoder_workers + write_queue_size + 2)  # 编码缓冲区：正在编码、排队写入和正在写入的帧各占一个
+
+    # 定义函数：启动编码线程和写入线程
+    def start(self):
+        for _ in range(self.encoder_workers):
+            thread = threading.Thread(target=self.encode_loop, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        self.writer_thread = threading.Thread(target=self.write_loop, daemon=True)
+        self.writer_thread.start()
+
+    # 定义函数：提交一帧（在截图线程中调用），返回 False 表示该帧被丢弃
+    def submit(self, frame):
+        frame.sequence = self.next_sequence
+        try:
+            self.frame_queue.put(frame, timeout=self.SUBMIT_TIMEOUT)  # 有界队列：编码跟不上时形成背压
+        except queue.Full:
+            self.dropped_frames += 1  # 丢弃该帧，序号不递增，写入阶段不会等待它
+            frame.release_image()
+            return False
+        self.next_sequence += 1
+        self.submitted_frames += 1
+        return True
+
+    # 定义函数：编码线程
+    def encode_loop(self):
+        while True:
+            frame = self.frame_queue.get()
+            if frame is None:  # 收到结束信号
+                break
+            try:
+                if not frame.repeat:  # 重复标记不需要编码
+                    if frame_bus is not None:
+                        frame_bus.publish(frame)  # 先把原始像素发布到共享内存
+                    start = time.perf_counter()
+                    encode_frame(frame, self.buffer_pool)
+                    frame.timings["编码"] = time.perf_counter() - start
+                    if frame.stream is not None and frame.stream.quality_controller is not None and frame.format != "RAW":
+                        frame.stream.quality_controller.report(frame.jpg_quality, len(frame.data))  # 根据编码后的大小调节之后的压缩质量
+                    if preview_server is not None:
+                        preview_server.publish(frame)  # 实时预览直接使用编码好的 JPG
+            except Exception as e:
+                frame.error = str(e)  # 编码失败的帧仍然交给写入线程，避免写入线程一直等待该序号
+            frame.release_image()  # 释放原始图像
+            self.write_queue.put(frame)
+        self.write_queue.put(None)  # 通知写入线程该编码线程已结束
+
+    # 定义函数：写入线程（唯一负责文件写入和截图计数的线程）
+    def write_loop(self):
+        finished_encoders = 0  # 已结束的编码线程数量
+        frame_buffer = {}  # 乱序到达的帧缓冲区
+        next_expected = 0  # 下一个应写入的帧序号
+        while finished_encoders < self.encoder_workers:
+            frame = self.write_queue.get()
+            if frame is None:
+                finished_encoders += 1
+                continue
+            frame_buffer[frame.sequence] = frame
+            while next_expected in frame_buffer:  # 按截图顺序写入
+                self.write_frame(frame_buffer.pop(next_expected))
+                next_expected += 1
+        for sequence in sorted(frame_buffer):  # 写入剩余的帧
+            self.write_frame(frame_buffer.pop(sequence))
+
+    # 定义函数：写入一帧后归还它的编码缓冲区
+    def write_frame(self, frame):
+        try:
+            self.store_frame(frame)
+        finally:
+            frame.release_data()
+
+    # 定义函数：将一帧写入当前保存路径
+    def store_frame(self, frame):
+        if frame.error is not None:
+            self.failed_frames += 1
+            return
+        try:
+            if frame.repeat:
+                self.store.write_repeat(frame)  # 重复帧只记录标记
+                self.repeat_markers += 1
+                return
+            start = time.perf_counter()
+            self.store.write(frame)
+            end = time.perf_counter()
+            self.written_frames += 1
+        except Exception:
+            self.failed_frames += 1  # 写入失败（如磁盘已满）不影响后续截图
+            return
+        frame.timings["写入"] = end - start - frame.timings.get("记账", 0.0)  # 存储自己统计了记账耗时时，写入只计文件写入部分
+        if frame.started is not None:
+            frame.timings["总计"] = end - frame.started
+        latency_tracer.record(frame.timings)
+
+    # 定义函数：停止流水线，等待队列中剩余的帧编码并写入完成
+    def close(self, timeout=CLOSE_TIMEOUT):
+        for _ in range(self.encoder_workers):
+            self.frame_queue.put(None)  # 向每个编码线程发送结束信号
+        deadline = time.monotonic() + timeout
+        for thread in self.threads + [self.writer_thread]:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self.store.close()
+
+    # 定义函数：获取流水线统计
+    def get_stats(self):
+        return {
+            "submitted": self.submitted_frames,
+            "dropped": self.dropped_frames,
+            "written": self.written_frames,
+            "failed": self.failed_frames,
+            "repeats": self.repeat_markers,
+            "pending": self.frame_queue.qsize() + self.write_queue.qsize(),
+        }
+
+capture_pipeline = None  # 当前截图循环使用的流水线
+
+'''高频截图自测'''
+HIGH_FREQUENCY_TARGET_FPS = 30  # 高频截图模式的目标吞吐量（张/秒）
+
+# 定义函数：以目标帧率运行完整的截图路径（抓屏 -> 编码 -> 写入临时文件夹），返回实际吞吐量
+def run_capture_throughput_test(duration=3.0, target_fps=HIGH_FREQUENCY_TARGET_FPS):
+    backend = create_capture_backend(config.capture_backend)  # 使用独立的后端实例，不影响正在进行的截图
+    temp_dir = tempfile.mkdtemp(prefix="framekeeper_selftest_")
+    store = TemporaryFrameStore(temp_dir)
+    pipeline = CapturePipeline(store)
+    pipeline.start()
+    scheduler = CaptureScheduler(1.0 / target_fps, "跳过")
+    start = time.monotonic()
+    try:
+        while time.monotonic() - start < duration:
+            scheduler.wait_next()
+            frame = CapturedFrame(backend.grab(), time.time(), config.format, config.jpg_quality)
+            pipeline.submit(frame)
+    finally:
+        pipeline.close()  # 抓屏出错时也要结束编码和写入线程
+        elapsed = time.monotonic() - start  # 包含等待流水线写完剩余帧的时间
+        backend.close()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    stats = pipeline.get_stats()
+    achieved_fps = stats["written"] / elapsed if elapsed > 0 else 0.0
+    return {
+        "backend": backend.name,
+        "target_fps": target_fps,
+        "achieved_fps": achieved_fps,
+        "grab": backend.get_stats(),
+        "schedule": scheduler.get_stats(),
+        "pipeline": stats,
+        "bytes_per_frame": store.bytes_written / stats["written"] if stats["written"] else 0,
+        "passed": achieved_fps >= target_fps * 0.95 and stats["dropped"] == 0 and scheduler.missed_ticks == 0,
+    }
+
+# 定义函数：在后台运行高频截图自测并显示结果（右键菜单调用）
+def show_capture_throughput_test(icon=None):
+    def test_task():
+        try:
+            result = run_capture_throughput_test()
+        except Exception as e:
+            run_in_main_thread(messagebox.showerror, "高频截图自测", f"自测失败: {e}")
+            return
+        verdict = "通过" if result["passed"] else "未达标"
+        run_in_main_thread(messagebox.showinfo, "高频截图自测",
+                           f"目标: {result['target_fps']} 张/秒（{result['backend']}，{config.format}）\n"
+                           f"实际写入: {result['achieved_fps']:.1f} 张/秒 —— {verdict}\n"
+                           f"抓屏: 平均 {result['grab']['avg_ms']:.1f} ms，P95 {result['grab']['p95_ms']:.1f} ms\n"
+                           f"跳过时间点: {result['schedule']['missed']} 个，丢弃帧: {result['pipeline']['dropped']} 帧\n"
+                           f"平均每帧 {result['bytes_per_frame'] / 1024:.0f} KB")
+    threading.Thread(target=test_task, daemon=True).start()
+
+'''内存分配自测'''
+ALLOCATION_TEST_BLOCK_LIMIT = 16  # 第二段中本程序代码新增存活内存块的上限（固定值，不随帧数变化）
+
+# 定义函数：用 tracemalloc 跟踪稳定运行时的截图路径（抓屏 -> 指纹 -> 编码 -> 写入临时文件夹），
+# 预热之后再截取 frames 帧，比较前后仍存活的内存块数量和大小，并统计图像池和编码缓冲区池新建的对象数量，
+# 稳定运行时两者都应为 0，新增的内存块不应随帧数增长
+def run_allocation_test(frames=200):
+    backend = create_capture_backend(config.capture_backend)  # 使用独立的后端实例，不影响正在进行的截图
+    backend.frame_pool = FrameImagePool(2)
+    buffer_pool = EncodeBufferPool(2)
+    temp_dir = tempfile.mkdtemp(prefix="framekeeper_alloctest_")
+    store = TemporaryFrameStore(temp_dir)
+    image_format = "JPG" if get_capture_format() == "RAW" else config.format  # 视频直录和差分图块模式按 JPG 测试
+
+    def capture_once():
+        frame = CapturedFrame(backend.grab(), time.time(), image_format, config.jpg_quality)
+        frame.image_pool = backend.frame_pool
+        compute_frame_fingerprint(frame.image)
+        encode_frame(frame, buffer_pool)
+        frame.release_image()
+        store.write(frame)
+        frame.release_data()
+
+    def take_snapshot():
+        gc.collect()  # 只比较仍然存活的内存块，不计入尚未回收的循环引用
+        return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+    tracemalloc.start()
+    try:
+        for _ in range(backend.latencies.maxlen + 10):  # 预热：填满抓屏耗时记录，让复用的图像和缓冲区分配完毕
+            capture_once()
+        for _ in range(frames):  # 第一段：PIL 等库内部的缓存在这段时间内趋于稳定
+            capture_once()
+        before = take_snapshot()
+        pool_allocations = backend.frame_pool.allocations
+        buffer_allocations = buffer_pool.allocations
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        for _ in range(frames):  # 第二段：稳定运行时不应再有存活内存块随帧数增长
+            capture_once()
+        after = take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+        backend.close()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    differences = after.compare_to(before, "lineno")
+    block_growth = sum(stat.count_diff for stat in differences)
+    byte_growth = sum(stat.size_diff for stat in differences)
+    own_block_growth = sum(stat.count_diff for stat in differences if stat.traceback[0].filename == __file__)  # 本程序代码中分配的部分
+    new_images = backend.frame_pool.allocations - pool_allocations
+    new_buffers = buffer_pool.allocations - buffer_allocations
+    return {
+        "backend": backend.name,
+        "format": image_format,
+        "frames": frames,
+        "block_growth": block_growth,
+        "own_block_growth": own_block_growth,
+        "byte_growth": byte_growth,
+        "peak_bytes": peak,
+        "new_images": new_images,
+        "new_buffers": new_buffers,
+        "top": [str(stat) for stat in differences[:3] if stat.size_diff > 0],
+        "passed": own_block_growth <= ALLOCATION_TEST_BLOCK_LIMIT and new_images == 0 and new_buffers == 0,  # PIL 内部缓存的波动不随帧数增长，只统计、不参与判断
+    }
+
+# 定义函数：在后台运行内存分配自测并显示结果（右键菜单调用）
+def show_allocation_test(icon=None):
+    def test_task():
+        try:
+            result = run_allocation_test()
+        except Exception as e:
+            run_in_main_thread(messagebox.showerror, "内存分配自测", f"自测失败: {e}")
+            return
+        verdict = "平稳" if result["passed"] else "持续增长"
+        text = (f"{result['backend']}，{result['format']}，预热后截图 {result['frames']} 帧\n"
+                f"存活内存块变化: {result['block_growth']:+d} 个（本程序 {result['own_block_growth']:+d} 个），"
+                f"{result['byte_growth'] / 1024:+.1f} KB —— {verdict}\n"
+                f"新建截图图像: {result['new_images']} 张，新建编码缓冲区: {result['new_buffers']} 个\n"
+                f"单帧处理时的内存峰值: {result['peak_bytes'] / 1024 / 1024:.1f} MB")
+        if result["top"]:
+            text += "\n\n增长最多的位置:\n" + "\n".join(result["top"])
+        run_in_main_thread(messagebox.showinfo, "内存分配自测", text)
+    threading.Thread(target=test_task, daemon=True).start()
+
+'''触发截图'''
+# 触发器基类：在后台线程中等待事件，事件发生时调用 manager.fire(触发器名称, 说明)
+class CaptureTrigger:
+    name = ""  # 触发器名称（记录在 triggers.log 中）
+    POLL_SECONDS = 1.0  # 轮询间隔（秒）
+
+    # 定义函数：启动触发器
+    def start(self, manager):
+        self.manager = manager
+        self.stop_event = threading.Event()
+        threading.Thread(target=self.run, name=f"trigger-{self.name}", daemon=True).start()
+
+    # 定义函数：触发器线程（子类实现）
+    def run(self):
+        raise NotImplementedError
+
+    # 定义函数：停止触发器
+    def stop(self):
+        self.stop_event.set()
+
+# 文件变化触发器：轮询监视目录（不含子目录），有文件出现或修改时触发
+class FileChangeTrigger(CaptureTrigger):
+    name = "文件变化"
+
+    def __init__(self, path):
+        self.path = path  # 监视的目录
+
+    # 定义函数：获取目录中每个文件的 (修改时间, 大小)，目录不存在时返回 None
+    def get_snapshot(self):
+        try:
+            with os.scandir(self.path) as entries:
+                return {entry.name: (entry.stat().st_mtime_ns, entry.stat().st_size) for entry in entries if entry.is_file()}
+        except OSError:
+            return None
+
+    def run(self):
+        previous = self.get_snapshot()
+        while not self.stop_event.wait(self.POLL_SECONDS):
+            current = self.get_snapshot()
+            changed = sorted(name for name, state in (current or {}).items() if previous is not None and previous.get(name) != state)
+            previous = current
+            if changed:
+                self.manager.fire(self.name, "、".join(changed[:3]) + (f" 等 {len(changed)} 个文件" if len(changed) > 3 else ""))
+
+# 本机请求触发器：在 127.0.0.1 上监听 HTTP 请求，GET 或 POST /capture 时触发，
+# 可用 ?burst=张数 指定连拍张数、?reason=说明 记录原因；被去抖或限流时返回 429
+class HttpPingTrigger(CaptureTrigger):
+    name = "本机请求"
+
+    def __init__(self, port):
+        self.port = port  # 监听端口
+        self.server = None
+
+    def start(self, manager):
+        self.manager = manager
+        trigger = self
+
+        class RequestHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                trigger.handle_request(self)
+
+            do_POST = do_GET
+
+            def log_message(self, format, *args):
+                pass  # 不在控制台输出访问日志
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", self.port), RequestHandler)  # 只接受本机连接
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name=f"trigger-{self.name}", daemon=True).start()
+
+    # 定义函数：处理一个请求
+    def handle_request(self, request):
+        url = urllib.parse.urlsplit(request.path)
+        if url.path != "/capture":
+            request.send_error(404)
+            return
+        query = urllib.parse.parse_qs(url.query)
+        try:
+            count = int(query.get("burst", ["0"])[0]) or None
+        except ValueError:
+            count = None
+        accepted = self.manager.fire(self.name, query.get("reason", [""])[0], count)
+        body = json.dumps({"accepted": accepted}).encode("utf-8")
+        request.send_response(200 if accepted else 429)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+# 前台窗口触发器：轮询当前前台窗口，切换到其它窗口时触发（仅 Windows）
+class ForegroundWindowTrigger(CaptureTrigger):
+    name = "前台窗口切换"
+    POLL_SECONDS = 0.5
+
+    # 定义函数：当前系统是否支持
+    @staticmethod
+    def is_available():
+        return os.name == "nt"
+
+    # 定义函数：获取前台窗口的 (句柄, 标题)
+    def get_foreground_window(self):
+        user32 = ctypes.windll.user32
+        hwnd = user32.GetForegroundWindow()
+        length = user32.GetWindowTextLengthW(hwnd)
+        buffer = ctypes.create_unicode_buffer(length + 1)
+        user32.GetWindowTextW(hwnd, buffer, length + 1)
+        return hwnd, buffer.value
+
+    def run(self):
+        previous, _ = self.get_foreground_window()
+        while not self.stop_event.wait(self.POLL_SECONDS):
+            hwnd, title = self.get_foreground_window()
+            if hwnd and hwnd != previous:
+                self.manager.fire(self.name, title)
+            previous = hwnd
+
+# 通用触发器：定期调用 func()，返回值为真时触发（返回字符串时作为说明记录）
+class CallableTrigger(CaptureTrigger):
+    def __init__(self, name, func, poll_seconds=1.0):
+        self.name = name  # 触发器名称
+        self.func = func  # 判断是否触发的函数
+        self.POLL_SECONDS = poll_seconds
+        self.last_error = None  # 最近一次调用出错的信息
+
+    def run(self):
+        while not self.stop_event.wait(self.POLL_SECONDS):
+            try:
+                result = self.func()
+            except Exception as e:
+                self.last_error = str(e)
+                continue
+            if result:
+                self.manager.fire(self.name, result if isinstance(result, str) else "")
+
+# 触发截图管理：启动各个触发器，对触发进行去抖（同一个触发器在去抖间隔内只触发一次）和限流（所有触发器每分钟的总次数），
+# 通过的触发请求调度器立即截图或连拍，并记录在采集根目录的 triggers.log 中；环形缓冲模式下连拍结束后同时保存缓冲区
+class CaptureTriggerManager:
+    LOG_FILE = "triggers.log"  # 触发记录文件名
+    MAX_BURST = 100  # 每次触发最多连拍的张数
+
+    # 初始化触发截图管理
+    def __init__(self, scheduler, debounce_seconds, max_per_minute, burst_count, burst_interval):
+        self.scheduler = scheduler  # 截图调度器
+        self.debounce_seconds = debounce_seconds  # 去抖间隔（秒）
+        self.max_per_minute = max_per_minute  # 每分钟最多触发次数
+        self.burst_count = burst_count  # 每次触发连拍张数
+        self.burst_interval = burst_interval  # 连拍间隔（秒）
+        self.triggers = []  # 触发器
+        self.last_fired = {}  # {触发器名称: 上次触发的时间}
+        self.recent_fires = deque()  # 最近一分钟内每次触发的时间
+        self.lock = threading.Lock()  # 多个触发器线程同时触发
+        self.fired_count = 0  # 已触发次数
+        self.suppressed_count = 0  # 被去抖或限流忽略的次数
+        self.errors = []  # 启动失败的触发器及原因
+
+    # 定义函数：启动所有触发器
+    def start(self):
+        for trigger in self.triggers:
+            try:
+                trigger.start(self)
+            except OSError as e:
+                self.errors.append(f"{trigger.name}: {e}")  # 例如端口已被占用
+
+    # 定义函数：停止所有触发器
+    def stop(self):
+        for trigger in self.triggers:
+            try:
+                trigger.stop()
+            except Exception:
+                pass
+
+    # 定义函数：触发截图，返回 False 表示被去抖或限流忽略
+    def fire(self, name, detail="", count=None):
+        now = time.monotonic()
+        with self.lock:
+            while self.recent_fires and now - self.recent_fires[0] >= 60:
+                self.recent_fires.popleft()
+            if now - self.last_fired.get(name, float("-inf")) < self.debounce_seconds or len(self.recent_fires) >= self.max_per_minute:
+                self.suppressed_count += 1
+                return False
+            self.last_fired[name] = now
+            self.recent_fires.append(now)
+            self.fired_count += 1
+        count = max(1, min(self.MAX_BURST, count or self.burst_count))
+        self.scheduler.request_capture(count, self.burst_interval)
+        if flight_recorder is not None:  # 连拍结束后保存缓冲区（包括触发前的截图）
+            threading.Timer((count - 1) * self.burst_interval + 0.5, flush_flight_recorder).start()
+        try:
+            append_capture_log(os.path.join(config.get_capture_root(), self.LOG_FILE),
+                               f"{format_capture_timestamp(time.time())}\t{name}\t{count}\t{detail}\n")
+        except OSError:
+            pass  # 触发记录写入失败不影响截图
+        return True
+
+    # 定义函数：格式化触发统计
+    def format_stats(self):
+        text = f"触发截图（{'、'.join(trigger.name for trigger in self.triggers)}）: 触发 {self.fired_count} 次，忽略 {self.suppressed_count} 次"
+        if self.errors:
+            text += f"，未能启动: {'；'.join(self.errors)}"
+        return text
+
+custom_capture_triggers = []  # 通过代码添加的触发器（如 CallableTrigger），每次开始截图时与设置中的触发器一起启动
+capture_trigger_manager = None  # 当前截图循环的触发截图管理（没有启用触发器时为 None）
+
+# 定义函数：根据设置创建触发截图管理，没有启用任何触发器时返回 None
+def create_capture_trigger_manager(scheduler):
+    manager = CaptureTriggerManager(scheduler, config.trigger_debounce_seconds, config.trigger_max_per_minute,
+                                    config.trigger_burst_count, config.trigger_burst_interval)
+    if config.trigger_watch_path:
+        watch_path = os.path.normcase(os.path.abspath(config.trigger_watch_path))
+        base_path = os.path.normcase(os.path.abspath(config.base_save_path))
+        if os.path.commonpath([watch_path, base_path]) == base_path:  # 截图本身会不断触发
+            manager.errors.append(f"{FileChangeTrigger.name}: 监视目录不能位于程序储存目录中")
+        else:
+            manager.triggers.append(FileChangeTrigger(config.trigger_watch_path))
+    if config.trigger_http_port:
+        manager.triggers.append(HttpPingTrigger(config.trigger_http_port))
+    if config.trigger_window_change and ForegroundWindowTrigger.is_available():
+        manager.triggers.append(ForegroundWindowTrigger())
+    manager.triggers.extend(custom_capture_triggers)
+    return manager if manager.triggers or manager.errors else None
+
+# 定义函数：从代码中触发一次截图（截图未运行时返回 False）
+def trigger_capture(name="手动", detail="", count=None):
+    manager = capture_trigger_manager
+    if manager is None:
+        return False
+    return manager.fire(name, detail, count)
+
+'''负载降级'''
+LOAD_SHEDDING_POLICIES = ("关闭", "降低质量", "缩小画面", "跳过截图", "逐级降级")  # 截图跟不上或 CPU 占用过高时的降级方式
+
+# 负载降级：每个截图时间点判断是否落后于计划（截图开始时间明显晚于计划时间点、跳过了时间点、流水线队列已满或丢帧）
+# 或 CPU 占用过高，压力持续时逐级提高降级级别（1 - 3），恢复平稳一段时间后逐级降回；
+# 被降级的每一帧（包括被跳过的时间点）记录在采集根目录的 shed.log 中
+class LoadShedder:
+    MAX_LEVEL = 3  # 最高降级级别
+    ESCALATE_SECONDS = 1.0  # 两次提高级别之间至少间隔的时间（秒）
+    RECOVER_SECONDS = 5.0  # 持续平稳多久后降低一级（秒）
+    LATE_RATIO = 0.5  # 截图开始时间晚于计划时间点超过半个截图间隔视为落后
+    QUALITY_STEP = 15  # “降低质量”每一级降低的压缩质量
+    SCALES = (1.0, 0.75, 0.5, 0.35)  # “缩小画面”各级别的缩放比例
+    LOG_FILE = "shed.log"  # 降级记录文件名
+    LOG_FLUSH_SECONDS = 5.0  # 降级记录最多缓存多久再写入磁盘（秒）
+
+    # 初始化负载降级
+    def __init__(self, policy, cpu_percent):
+        self.policy = policy  # 降级方式
+        self.cpu_percent = cpu_percent  # CPU 占用阈值（%）
+        self.level = 0  # 当前降级级别，0 表示不降级
+        self.last_change = time.monotonic()  # 上次调整级别的时间
+        self.last_missed = 0  # 上次检查时调度器累计跳过的时间点数
+        self.last_dropped = 0  # 上次检查时流水线累计丢弃的帧数
+        self.tick = 0  # 降级期间的时间点计数，用于“跳过截图”
+        self.degraded_frames = 0  # 累计降级保存的帧数
+        self.skipped_ticks = 0  # 累计因降级跳过的时间点数
+        self.pressure_reason = ""  # 最近一次判定为压力过高的原因
+        self.pending_records = {}  # 尚未写入磁盘的降级记录：{采集根目录: [行, ...]}
+        self.last_log_flush = time.monotonic()
+        psutil.cpu_percent(interval=None)  # 第一次调用只建立基准，之后每次返回距上次调用的平均占用
+
+    # 定义函数：判断当前是否处于压力之下，返回原因（没有压力时返回空字符串）
+    def get_pressure(self, scheduler, pipeline):
+        reasons = []
+        if scheduler.interval is not None and scheduler.jitters and scheduler.jitters[-1] > scheduler.interval * self.LATE_RATIO:
+            reasons.append("截图落后于计划")
+        if scheduler.missed_ticks > self.last_missed:
+            reasons.append("跳过了截图时间点")
+        self.last_missed = scheduler.missed_ticks
+        if pipeline is not None:
+            if pipeline.dropped_frames > self.last_dropped or pipeline.frame_queue.qsize() >= pipeline.frame_queue.maxsize:
+                reasons.append("编码跟不上")
+            self.last_dropped = pipeline.dropped_frames
+        cpu = psutil.cpu_percent(interval=None)
+        if cpu >= self.cpu_percent:
+            reasons.append(f"CPU 占用 {cpu:.0f}%")
+        return "、".join(reasons)
+
+    # 定义函数：每个截图时间点调用一次，更新降级级别
+    def update(self, scheduler, pipeline):
+        now = time.monotonic()
+        reason = self.get_pressure(scheduler, pipeline)
+        if reason:
+            self.pressure_reason = reason
+            if self.level < self.MAX_LEVEL and (self.level == 0 or now - self.last_change >= self.ESCALATE_SECONDS):
+                self.level += 1
+                self.last_change = now
+            elif self.level > 0:
+                self.last_change = max(self.last_change, now - self.ESCALATE_SECONDS)  # 压力仍在时推迟恢复
+        elif self.level > 0 and now - self.last_change >= self.RECOVER_SECONDS:
+            self.level -= 1
+            self.last_change = now
+        if now - self.last_log_flush >= self.LOG_FLUSH_SECONDS:
+            self.flush_records()
+
+    # 定义函数：获取当前级别的降级措施 (压缩质量降低量, 缩放比例, 是否跳过本次截图)
+    def get_actions(self):
+        if self.level == 0 or self.policy == "关闭":
+            return 0, 1.0, False
+        self.tick += 1
+        if self.policy == "降低质量":
+            return self.QUALITY_STEP * self.level, 1.0, False
+        if self.policy == "缩小画面":
+            return 0, self.SCALES[self.level], False
+        if self.policy == "跳过截图":
+            return 0, 1.0, self.tick % (self.level + 1) != 0  # 每 级别+1 个时间点只截取一次
+        quality_drop = self.QUALITY_STEP * 2  # 逐级降级：先降低质量，再缩小一半，最后隔一次跳过一次
+        return quality_drop, 0.5 if self.level >= 2 else 1.0, self.level >= 3 and self.tick % 2 != 0
+
+    # 定义函数：记录一帧的降级措施（跳过的时间点也记录一行）
+    def record(self, stream, timestamp, action):
+        root = stream.folders.get_capture_root()
+        self.pending_records.setdefault(root, []).append(f"{format_capture_timestamp(timestamp)}\t{action}\t{self.pressure_reason}\n")
+        if action == "跳过":
+            self.skipped_ticks += 1
+        else:
+            self.degraded_frames += 1
+
+    # 定义函数：把缓存的降级记录追加到各采集根目录的 shed.log
+    def flush_records(self):
+        records, self.pending_records = self.pending_records, {}
+        self.last_log_flush = time.monotonic()
+        for root, lines in records.items():
+            try:
+                os.makedirs(root, exist_ok=True)
+                append_capture_log(os.path.join(root, self.LOG_FILE), "".join(lines))
+            except OSError:
+                pass  # 降级记录写入失败不影响截图
+
+load_shedder = None  # 当前截图循环的负载降级（未启用时为 None）
+
+'''截图功能'''
+# 定义函数：依次截取每个画面流并交给流水线编码、保存
+def take_screenshot():
+    global capture_tick
+    backend = get_capture_backend()  # 使用配置的采集后端
+    submitted = False
+    grabs = {}  # 本次已截取的画面流：名称 -> [时间戳, 截图, 画面指纹]，缩略图画面流直接缩小对应的截图
+    tick = capture_tick
+    capture_tick += 1
+    quality_drop, shed_scale, skip = load_shedder.get_actions() if load_shedder is not None else (0, 1.0, False)
+    if skip:
+        load_shedder.record(capture_streams[0], time.time(), "跳过")
+        return False
+    if get_capture_format() == "RAW":
+        shed_scale = 1.0  # 视频直录和差分图块要求分辨率不变，只能跳过截图
+    for stream in capture_streams:
+        if tick % stream.every:
+            continue  # 双速率截图时全分辨率画面流每隔几次才保存一次
+        source = stream.source or stream
+        if source.name not in grabs:
+            started = time.perf_counter()
+            grabs[source.name] = [time.time(), backend.grab(source.region), None, started, time.perf_counter() - started]  # 记录截图时刻和抓屏耗时，只截取该画面流的区域
+        timestamp, screenshot, fingerprint, started, grab_seconds = grabs[source.name]
+
+        '''计算画面指纹（重复帧检测和自适应间隔共用）'''
+        if fingerprint is None and (config.duplicate_mode != "关闭" or (len(grabs) == 1 and capture_scheduler.needs_fingerprint)):
+            fingerprint = grabs[source.name][2] = compute_frame_fingerprint(screenshot)
+            if len(grabs) == 1:
+                capture_scheduler.report_frame(fingerprint)  # 自适应调度器根据本次第一张截图的变化调整下一次截图的时间
+
+        scale = stream.scale * shed_scale
+        if scale != 1.0:  # 缩略图画面流，或负载降级时缩小画面
+            screenshot = screenshot.resize(get_scaled_size(screenshot.size, scale), Image.BILINEAR)
+        quality = stream.quality_controller.quality if stream.quality_controller is not None else config.jpg_quality  # 自动调节时使用调节器给出的质量
+        if quality_drop or shed_scale != 1.0:
+            actions = []
+            if quality_drop and get_image_encoder(config.format).lossy and get_capture_format() != "RAW":
+                actions.append(f"质量 {quality}->{max(JpegQualityController.MIN_QUALITY, quality - quality_drop)}")
+                quality = max(JpegQualityController.MIN_QUALITY, quality - quality_drop)
+            if shed_scale != 1.0:
+                actions.append(f"缩小 {shed_scale:.0%} ({screenshot.width}x{screenshot.height})")  # 缩小后的宽高已取偶数
+            if actions:
+                load_shedder.record(stream, timestamp, "，".join(actions))
+        frame = CapturedFrame(screenshot, timestamp, get_capture_format(), quality)  # 记录截图时的格式和质量
+        frame.stream = stream
+        frame.started = started
+        frame.timings["抓屏"] = grab_seconds
+        if backend.frame_pool is not None and scale == 1.0:
+            backend.frame_pool.retain(screenshot)  # 该帧编码完成后才归还截图
+            frame.image_pool = backend.frame_pool
+
+        '''重复帧检测：画面没有变化时跳过，或只记录一条重复标记'''
+        if config.duplicate_mode != "关闭" and stream.duplicate_detector.is_duplicate(fingerprint, config.duplicate_threshold):
+            frame.release_image()  # 不再编码该截图，立即归还给图像池
+            if config.duplicate_mode != "重复标记":
+                continue  # 直接跳过，不编码、不写入
+            frame.repeat = True
+        submitted = capture_pipeline.submit(frame) or submitted  # 编码和写入在流水线的后台线程中进行
+    if backend.frame_pool is not None:
+        for grab in grabs.values():
+            backend.frame_pool.release(grab[1])  # 归还本次截图持有的引用
+    return submitted
+
+# 定义函数：按固定时间点不断捕获屏幕截图
+def screenshot_loop(stop_event, streams=None):
+    global capture_scheduler, capture_pipeline, capture_streams, capture_tick, load_shedder, capture_trigger_manager, frame_bus, preview_server
+    if config.interval_mode == "自适应":  # 创建截图调度器
+        scheduler = AdaptiveCaptureScheduler(config.adaptive_min_interval, config.adaptive_max_interval, config.missed_tick_policy, stop_event)
+    elif config.interval_mode == "仅触发":
+        scheduler = CaptureScheduler(None, config.missed_tick_policy, stop_event)
+    else:
+        scheduler = CaptureScheduler(config.interval, config.missed_tick_policy, stop_event)
+    capture_scheduler = scheduler
+    if streams is None:  # 每次开始截图时重新建立画面流（包括重复帧的参考帧）
+        streams = parse_capture_streams(config.capture_streams)
+        resolve_capture_streams(streams, get_capture_backend())
+    if config.dual_rate_capture:
+        streams = add_thumbnail_streams(streams, config.thumbnail_scale / 100, config.full_frame_every)
+    capture_streams = streams
+    capture_tick = 0
+    latency_tracer.reset()  # 耗时统计只针对本次截图
+    load_shedder = LoadShedder(config.load_shedding, config.cpu_shed_percent) if config.load_shedding != "关闭" else None
+    monitors = get_capture_backend().list_monitors()
+    screen_size = monitors[0][2:] if monitors else SyntheticBackend.DEFAULT_SIZE  # 无法列出显示器时按 1920x1080 估算
+    for stream in streams:
+        stream.quality_controller = create_quality_controller(stream, streams, screen_size)
+    frame_bus = create_frame_bus(streams, get_capture_backend())  # 启用时每帧原始画面同时发布到共享内存
+    preview_server = start_preview_server()  # 启用时通过 HTTP 提供实时预览
+    pipeline = CapturePipeline(create_frame_store())  # 创建截图流水线
+    pipeline.start()
+    start_staging()  # 启用本地暂存时，截图先写入暂存目录
+    backend = get_capture_backend()
+    backend.frame_pool = FrameImagePool(pipeline.frame_queue.maxsize + pipeline.encoder_workers + len(streams))  # 截图在队列和编码线程中时不能复用
+    capture_pipeline = pipeline
+    trigger_manager = create_capture_trigger_manager(scheduler)  # 启用触发器时，触发器随时可以插入截图或连拍
+    if trigger_manager is not None:
+        scheduler.poll_triggers = True
+        trigger_manager.start()
+    capture_trigger_manager = trigger_manager
+    try:
+        while config.is_running:  # 如果截图功能正在运行
+            if scheduler.interval is not None and not isinstance(scheduler, AdaptiveCaptureScheduler):
+                scheduler.interval = config.interval  # 运行中修改的截图间隔从下一个时间点开始生效
+            scheduler.missed_tick_policy = config.missed_tick_policy
+            if not scheduler.wait_next():  # 等待下一个截图时间点
+                break  # 收到停止信号
+            if disk_quota_guard.check():
+                continue  # 超出配额且设置为暂停截图，空间恢复后自动继续
+            if load_shedder is not None:
+                load_shedder.update(scheduler, capture_pipeline)  # 落后于计划或 CPU 占用过高时逐级降级
+            take_screenshot()  # 调用截图函数
+    finally:
+        if trigger_manager is not None:
+            trigger_manager.stop()
+        pipeline.close()  # 等待流水线中剩余的帧写入磁盘
+        if frame_bus is not None:
+            frame_bus.close()  # 通知读取端截图已停止
+        if preview_server is not None:
+            preview_server.stop()
+            preview_server = None
+        backend.frame_pool = None  # 停止截图后释放图像池
+        if load_shedder is not None:
+            load_shedder.flush_records()  # 写入剩余的降级记录
+        stop_staging()  # 把暂存的截图全部搬运到项目文件夹
+        get_disk_usage_ledger().save()  # 持久化磁盘占用账本
+        config.flush_manifest()  # 持久化截图计数清单
+        for stream in streams:
+            stream.folders.flush_manifest()
+            if stream.quality_controller is not None:
+                stream.quality_controller.save()  # 保存今天已写入的字节数
+
+# 定义函数：启动截图功能
+def start_screenshotting(icon):
+    if not config.is_running:  # 如果截图功能未运行
+        if config.storage_mode == "视频直录" and not os.path.exists(get_ffmpeg_path()):  # 视频直录需要 FFmpeg
+            messagebox.showerror("错误", "视频直录需要 FFmpeg。请确保主程序所在目录下的_internal/ffmpeg.exe存在。")
+            return
+        try:
+            streams = parse_capture_streams(config.capture_streams)  # 解析画面流，并将显示器编号换算为截取区域
+            missing = resolve_capture_streams(streams, get_capture_backend())
+        except Exception as e:
+            messagebox.showerror("错误", f"画面流设置有误: {e}")
+            return
+        if missing:
+            streams = [stream for stream in streams if stream.name not in missing]
+            if not streams:
+                messagebox.showerror("错误", f"找不到以下显示器: {'、'.join(missing)}")
+                return
+            messagebox.showwarning("显示器不存在", f"找不到以下显示器，本次不截取这些画面流: {'、'.join(missing)}")
+        if config.capture_process:  # 在独立进程中截图，截图进程按同样的设置重新解析画面流
+            recover_staged_captures()  # 等待本进程启动时的搬运完成，之后暂存目录只由截图进程搬运
+            global capture_process
+            if capture_process is None:
+                capture_process = CaptureProcessClient(config.config_file)
+            try:
+                capture_process.start(config.project_name, config.project_path)
+            except Exception as e:
+                messagebox.showerror("错误", f"无法启动截图进程: {e}")
+                return
+        else:
+            close_capture_process()  # 关闭了“在独立进程中截图”后改回在本进程中截图
+        config.is_running = True  # 设置为运行状态
+        icon.icon = create_icon("on")  # 更新托盘图标为“开启”状态
+        update_menu(icon)  # 更新托盘菜单
+        if capture_process is not None:
+            return
+        global capture_stop_event
+        capture_stop_event = threading.Event()  # 每次启动使用新的停止信号，避免与尚未退出的旧线程互相影响
+        global capture_thread
+        capture_thread = threading.Thread(target=screenshot_loop, args=(capture_stop_event, streams), daemon=True)  # 创建一个后台线程执行截图循环
+        capture_thread.start()  # 启动线程
+
+# 定义函数：停止截图功能
+def stop_screenshotting(icon):
+    if config.is_running:  # 如果截图功能正在运行
+        config.is_running = False  # 设置为未运行状态
+        if capture_stop_event is not None:
+            capture_stop_event.set()  # 立即唤醒正在等待的截图线程
+        if capture_process is not None:
+            capture_process.stop()  # 截图进程写完剩余截图后自行持久化计数清单
+        else:
+            config.flush_manifest()  # 停止时持久化截图计数清单
+        icon.icon = create_icon("off")  # 更新托盘图标为“关闭”状态
+        update_menu(icon)  # 更新托盘菜单
+
+'''独立截图进程'''
+CAPTURE_PROCESS_TIMEOUT = 15.0  # 等待截图进程回复的最长时间（秒）
+CAPTURE_PROCESS_STOP_TIMEOUT = 60.0  # 开始和退出时需要等待上一次截图写完，等待时间更长（秒）
+CAPTURE_PROCESS_STATUS_TIMEOUT = 2.0  # 获取截图进程状态时最多等待的时间（秒），包括等待其它命令完成
+CAPTURE_PROCESS_STATUS_MAX_AGE = 2.0  # 托盘菜单使用的缓存状态超过该时间（秒）后在后台刷新
+
+# 截图进程使用的配置：读取同一个配置文件，但不写回（配置文件由托盘进程保存，避免覆盖用户在截图期间修改的设置）
+class CaptureProcessConfig(Config):
+    def save_config(self):
+        pass
+
+# 截图进程客户端：在托盘进程中启动独立的截图进程，通过管道发送命令 (命令, 参数)，每条命令等待一个回复。
+# 截图循环、编码和写入都在截图进程中运行，导出视频、设置窗口和托盘菜单不再与截图争用同一个 GIL
+class CaptureProcessClient:
+    # 初始化截图进程客户端
+    def __init__(self, config_file):
+        self.config_file = config_file  # 截图进程读取的配置文件
+        self.process = None  # 截图进程
+        self.conn = None  # 与截图进程通信的管道
+        self.request_id = 0  # 最近一条命令的编号，回复带有对应的编号
+        self.lock = threading.Lock()  # 托盘线程和 Tkinter 主线程可能同时发送命令
+        self.status = None  # 最近一次获取到的状态（托盘菜单文本使用，不在菜单线程中等待截图进程）
+        self.status_time = float("-inf")  # 最近一次获取到状态的时间
+        self.status_failed = False  # 最近一次获取状态是否失败
+        self.status_refreshing = False  # 是否正在后台刷新状态
+        self.status_lock = threading.Lock()
+
+    # 定义函数：截图进程尚未启动或已经退出时启动截图进程
+    def ensure_started(self):
+        if self.process is not None and self.process.is_alive():
+            return
+        if self.conn is not None:
+            self.conn.close()
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=capture_process_main, args=(child_conn, self.config_file),
+                                               name="FrameKeeper-capture", daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    # 定义函数：发送一条命令并等待回复，截图进程中出错时在这里重新抛出。
+    # timeout 同时限制等待其它命令完成和等待回复的时间；等待超时时截图进程仍在处理（例如等待上一次截图写完），
+    # 之后迟到的回复按编号识别并丢弃
+    def request(self, command, *args, timeout=CAPTURE_PROCESS_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        if not self.lock.acquire(timeout=timeout):
+            raise TimeoutError(f"截图进程在 {timeout:g} 秒内没有响应")  # 其它命令仍在等待回复
+        try:
+            self.ensure_started()
+            self.request_id += 1
+            try:
+                self.conn.send((self.request_id, command, args))
+                while True:
+                    if not self.conn.poll(max(0.0, deadline - time.monotonic())):
+                        raise TimeoutError(f"截图进程在 {timeout:g} 秒内没有响应")
+                    reply_id, result = self.conn.recv()
+                    if reply_id == self.request_id:
+                        break  # 之前超时的命令的回复直接丢弃
+            except TimeoutError:
+                raise  # 截图进程仍在运行，不结束它（TimeoutError 也是 OSError 的子类）
+            except (OSError, EOFError):
+                self.kill()  # 截图进程已经退出，下次发送命令时重新启动截图进程
+                raise
+        finally:
+            self.lock.release()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    # 定义函数：开始截图
+    def start(self, project_name, project_path):
+        self.request("start", project_name, project_path, timeout=CAPTURE_PROCESS_STOP_TIMEOUT)
+
+    # 定义函数：停止截图（截图进程在后台写完剩余的截图）
+    def stop(self):
+        try:
+            self.request("stop")
+        except (OSError, EOFError, TimeoutError):
+            pass  # 截图进程已经退出，也就不再截图
+
+    # 定义函数：切换截图进程的当前项目
+    def switch_project(self, project_name, project_path):
+        self.request("switch", project_name, project_path)
+
+    # 定义函数：获取截图进程的状态（最多等待 timeout 秒），截图进程没有响应时返回 None
+    def get_status(self, timeout=CAPTURE_PROCESS_STATUS_TIMEOUT):
+        try:
+            status = self.request("status", timeout=timeout)
+        except (OSError, EOFError, TimeoutError):
+            status = None
+        with self.status_lock:
+            self.status_failed = status is None
+            if status is not None:
+                self.status = status
+                self.status_time = time.monotonic()
+        return status
+
+    # 定义函数：立即返回缓存的状态（托盘菜单文本调用），缓存过期时在后台刷新；
+    # 还没有获取过状态时返回 None，最近一次获取失败时 status_failed 为 True
+    def get_cached_status(self):
+        with self.status_lock:
+            refresh = not self.status_refreshing and time.monotonic() - self.status_time > CAPTURE_PROCESS_STATUS_MAX_AGE
+            if refresh:
+                self.status_refreshing = True
+            status = self.status if not self.status_failed else None
+        if refresh:
+            threading.Thread(target=self.refresh_status, daemon=True).start()
+        return status
+
+    # 定义函数：在后台刷新缓存的状态
+    def refresh_status(self):
+        try:
+            self.get_status()
+        finally:
+            with self.status_lock:
+                self.status_refreshing = False
+
+    # 定义函数：把截图进程中的截图耗时统计保存到文件
+    def dump_latency(self, path):
+        self.request("dump_latency", path)
+
+    # 定义函数：结束截图进程（不等待剩余的截图写完）
+    def kill(self):
+        if self.process is not None and self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=5.0)
+        if self.conn is not None:
+            self.conn.close()
+        self.process = None
+        self.conn = None
+        with self.status_lock:
+            self.status = None  # 缓存的状态属于已经结束的截图进程
+            self.status_time = float("-inf")
+
+    # 定义函数：通知截图进程写完剩余的截图后退出
+    def close(self):
+        if self.process is not None and self.process.is_alive():
+            try:
+                self.request("exit", timeout=CAPTURE_PROCESS_STOP_TIMEOUT)
+                self.process.join(timeout=5.0)
+            except (OSError, EOFError, TimeoutError):
+                pass
+        with self.lock:
+            self.kill()
+
+capture_process = None  # 独立截图进程的客户端（未在独立进程中截图时为 None）
+
+# 定义函数：关闭截图进程，之后在本进程中截图
+def close_capture_process():
+    global capture_process, disk_usage_ledger
+    if capture_process is None:
+        return
+    capture_process.close()
+    capture_process = None
+    disk_usage_ledger = None  # 截图期间账本由截图进程维护，重新从磁盘读取
+    config.manifest = None  # 本进程中的计数清单已经过时，丢弃后重新从磁盘载入
+    config.initialize_folder_counter()
+
+# 定义函数：截图进程的状态（托盘菜单和统计窗口中显示的文本由截图进程生成）
+def get_capture_process_status():
+    return {
+        "pid": os.getpid(),
+        "is_running": config.is_running,
+        "project_name": config.project_name,
+        "schedule": format_capture_schedule_stats(),
+        "latency": latency_tracer.format_report(),
+        "has_latency": bool(latency_tracer.get_summary()),
+        "disk_usage": get_disk_usage_status_text(),
+        "flight_recorder": get_flight_recorder_status_text(),
+    }
+
+# 定义函数：在截图进程中执行一条命令，返回回复给托盘进程的结果
+def run_capture_process_command(command, *args):
+    global capture_stop_event, capture_thread
+    if command in ("stop", "exit") and config.is_running:
+        config.is_running = False
+        capture_stop_event.set()
+    if command == "start":
+        if config.is_running:
+            return True
+        if capture_thread is not None:
+            capture_thread.join(timeout=CapturePipeline.CLOSE_TIMEOUT)  # 等待上一次截图写完（与退出时的等待时间一致）
+            if capture_thread.is_alive():
+                raise RuntimeError("上一次截图还没有写完，请稍后再开始截图")
+        config.load_config()  # 读取托盘进程保存的最新设置
+        config.project_name, config.project_path = args
+        config.initialize_folder_counter()  # 同步当前项目的子文件夹计数
+        streams = parse_capture_streams(config.capture_streams)
+        missing = resolve_capture_streams(streams, get_capture_backend())
+        streams = [stream for stream in streams if stream.name not in missing]  # 托盘进程已经提示过找不到的显示器
+        if not streams:
+            raise RuntimeError(f"找不到以下显示器: {'、'.join(missing)}")
+        config.is_running = True
+        capture_stop_event = threading.Event()
+        capture_thread = threading.Thread(target=screenshot_loop, args=(capture_stop_event, streams), daemon=True)
+        capture_thread.start()
+        return True
+    if command == "switch":
+        config.project_name, config.project_path = args
+        config.initialize_folder_counter()
+        return True
+    if command == "status":
+        return get_capture_process_status()
+    if command == "flush_recorder":
+        return flush_flight_recorder()
+    if command == "dump_latency":
+        latency_tracer.dump(*args)
+        return True
+    if command == "flush_staging":
+        return flush_staged_captures()
+    if command == "add_disk_usage":
+        record_disk_usage(*args)
+        return True
+    if command == "disk_usage":
+        return get_disk_usage_details()
+    if command == "recount_disk_usage":
+        return get_disk_usage_ledger().recount(config.project_name)
+    if command == "exit":
+        if capture_thread is not None:
+            capture_thread.join(timeout=CapturePipeline.CLOSE_TIMEOUT)  # 等待流水线中剩余的截图写入磁盘
+        config.flush_manifest()
+        get_disk_usage_ledger().save()
+        return True
+    return True  # "stop" 已在上面处理
+
+# 定义函数：截图进程入口，逐条处理托盘进程发来的命令，托盘进程退出（管道关闭）时随之退出
+def capture_process_main(conn, config_file):
+    global config, capture_process
+    capture_process = None  # 以 fork 方式启动时会继承托盘进程的客户端，截图进程中的命令都在本进程执行
+    set_dpi_aware()  # 截图进程同样需要 DPI 感知，否则高 DPI 显示器上只能截到缩放后的区域
+    config = CaptureProcessConfig(config_file)  # 截图进程根据同一个配置文件创建自己的配置对象
+    while True:
+        try:
+            request_id, command, args = conn.recv()
+        except (EOFError, OSError):
+            request_id, command, args = None, "exit", ()  # 托盘进程已经退出
+        try:
+            result = run_capture_process_command(command, *args)
+        except Exception as e:
+            result = e  # 把错误交给托盘进程提示
+        try:
+            conn.send((request_id, result))
+        except (OSError, EOFError):
+            pass
+        if command == "exit":
+            break
+
+'''检查程序是否已经在运行'''
+# 定义函数：检查指定的进程ID是否正在运行
+def is_pid_running(pid):
+    if os.name != "nt":  # 非 Windows 系统没有 tasklist 命令
+        return psutil.pid_exists(int(pid))
+    try:
+        output = subprocess.check_output(f'tasklist /FI "PID eq {pid}"', shell=True, encoding="oem")  # 使用 tasklist 命令检查进程
+        return str(pid) in output  # 如果输出中包含 PID ，则进程正在运行
+    except subprocess.CalledProcessError:  # 如果命令执行失败，说明进程不存在
+        return False
+
+# 定义函数：设置进程为DPI感知，以支持高分辨率显示
+def set_dpi_aware():
+    if os.name != "nt":  # DPI 感知设置仅适用于 Windows
+        return
+    try:
+        ctypes.windll.shcore.SetProcessDpiAwareness(2)  # 设置为系统级DPI感知
+    except AttributeError:  # 如果系统不支持 SetProcessDpiAwareness ，使用 SetProcessDPIAware 作为备选方案
+        ctypes.windll.user32.SetProcessDPIAware()  # 设置为应用程序级DPI感知
+    except Exception as e:  # 捕获其他异常
+        pass  # 忽略异常，继续执行
+
+'''开机自启功能'''
+# 定义函数：返回 Windows 注册表的 HKEY_CURRENT_USER 根键，表示操作将在当前用户的注册表分支下进行
+def get_startup_key():
+    return reg.HKEY_CURRENT_USER  # 返回Windows注册表的 HKEY_CURRENT_USER 根键
+
+# 定义函数：返回注册表路径 Software\Microsoft\Windows\CurrentVersion\Run ，这是 Windows 系统用于存储开机自启动程序的标准路径
+def get_startup_path():
+    return r"Software\Microsoft\Windows\CurrentVersion\Run" # 返回 Windows 系统用于存储开机自启动程序的标准路径
+
+# 定义函数：设置开机自启
+def set_auto_start(show_message=True):
+    if reg is None:  # 非 Windows 系统不支持注册表开机自启
+        if show_message:
+            messagebox.showinfo("提示", "当前系统不支持开机自启。")
+        return
+    try:
+        key = reg.OpenKey(get_startup_key(), get_startup_path(), 0, reg.KEY_ALL_ACCESS)  # 调用函数 get_startup_key 获取根键、调用函数 get_startup_path 获取子路径，授予 KEY_ALL_ACCESS 完全控制权限，传递 0 作为子键索引
+        script_path = os.path.abspath(sys.argv[0])  # 获取当前执行脚本的绝对路径
+        if getattr(sys, 'frozen', False):  # 判断是否是打包后的EXE
+            command = f'"{script_path}"'  # EXE模式：直接使用双引号包裹路径
+        else:
+            command = f'"{sys.executable}" "{script_path}"'  # 脚本模式：Python解释器 + 脚本路径(双引号包裹)
+        reg.SetValueEx(key, "FrameKeeper", 0, reg.REG_SZ, command)  # 在注册表中创建/修改值，键名称设为"FrameKeeper"，值类型为 REG_SZ (字符串)，值数据是 command 变量
+        reg.CloseKey(key)  # 关闭注册表键
+        config.auto_start = True  # 更新配置为开机自启状态
+        config.save_config()  # 保存配置到文件
+        if show_message:
+            messagebox.showinfo("成功", "已成功设置开机自启！")  # 显示成功消息
+    except Exception as e:  # 捕获异常
+        messagebox.showerror("错误", f"设置开机自启失败: {e}")  # 显示错误消息
+
+# 定义函数：取消开机自启
+def remove_auto_start(show_message=True):
+    if reg is None:  # 非 Windows 系统不支持注册表开机自启
+        config.auto_start = False
+        return
+    try:
+        key = reg.OpenKey(get_startup_key(), get_startup_path(), 0, reg.KEY_ALL_ACCESS)  # 与函数 set_auto_start 相同
+        reg.DeleteValue(key, "FrameKeeper")  # 删除开机自启的注册表值
+        reg.CloseKey(key)  # 关闭注册表键
+        config.auto_start = False  # 更新配置为未开机自启状态
+        config.save_config()  # 保存配置到文件
+        if show_message:
+            messagebox.showinfo("成功", "已成功取消开机自启！")  # 显示成功消息
+    except FileNotFoundError:  # 如果注册表值不存在
+        if show_message:
+            messagebox.showinfo("提示", "程序未被设置为开机自启。")  # 显示提示消息
+        config.auto_start = False  # 更新配置为未开机自启状态
+        config.save_config()  # 保存配置到文件
+    except Exception as e:  # 捕获其他异常
+        messagebox.showerror("错误", f"取消开机自启失败: {e}")  # 显示错误消息
+
+# 定义函数：检查当前是否已设置开机自启
+def check_auto_start():
+    if reg is None:  # 非 Windows 系统不支持注册表开机自启
+        config.auto_start = False
+        return
+    try:
+        key = reg.OpenKey(get_startup_key(), get_startup_path(), 0, reg.KEY_READ)  # 与函数 set_auto_start 基本相同，KEY_READ 权限表示只读访问
+        reg.QueryValueEx(key, "FrameKeeper")  # 查询开机自启的注册表值
+        reg.CloseKey(key)  # 关闭注册表键
+        config.auto_start = True  # 更新配置为开机自启状态
+    except FileNotFoundError:  # 如果注册表值不存在
+        config.auto_start = False  # 更新配置为未开机自启状态
+
+'''自适应DPI缩放'''
+# 定义函数：获取DPI缩放比例
+def get_dpi_scale():
+    root = tk.Tk()   # 创建一个 Tkinter 窗口
+    root.withdraw()  # 隐藏窗口
+    root.update()  # 确保窗口初始化完成
+    try:
+        dpi = root.winfo_fpixels("1i")  # 获取每英寸像素数
+        scale = dpi / 96.0  # 计算缩放比例（ 96 DPI 为标准）
+    except Exception as e:
+        scale = 1.0  # 失败时返回默认值
+    finally:
+        root.destroy()  # 销毁窗口
+    return scale  # 返回缩放比例
+
+'''系统托盘图标'''
+# 定义函数：创建托盘图标
+def create_icon(state="off", base_size=64):
+    scale = get_dpi_scale()  # 调用函数 get_dpi_scale 获取 DPI 缩放比例
+    size = int(base_size * scale)  # 根据缩放比例计算图标大小
+    padding = int(4 * scale)  # 设置图标边距
+    center = size // 2  # 计算图标中心位置
+    image = Image.new("RGBA", (size, size), (0, 0, 0, 0))  # 创建一个透明背景的图像
+    draw = ImageDraw.Draw(image)  # 创建绘图对象
+    if state == "on":  # 如果状态为“开启”
+        radius = center - padding  # 计算外圆半径
+        inner_radius = int(radius * 0.5)  # 计算内圆半径
+        for i in range(radius, radius - int(5*scale), -1):  # 绘制外圆的渐变效果
+            alpha = int(200 * (i / radius))  # 计算透明度
+            draw.ellipse([center-i, center-i, center+i, center+i], fill=(255, 50, 50, alpha), outline=(255, 255, 255, 30))
+        draw.ellipse([center-inner_radius, center-inner_radius, center+inner_radius, center+inner_radius], fill=(230, 0, 0), outline=(255, 255, 255))  # 绘制内圆
+        dot_radius = int(inner_radius * 0.3)  # 计算中心点圆点半径
+        draw.ellipse([center-dot_radius, center-dot_radius, center+dot_radius, center+dot_radius], fill=(255, 255, 255), outline=(200, 200, 200))  # 绘制中心点圆点
+    else:  # 如果状态为“关闭”
+        radius = center - padding  # 计算外圆半径
+        border_width = int(2 * scale)  # 设置边框宽度
+        draw.ellipse([center-radius, center-radius, center+radius, center+radius], fill=(100, 100, 100), outline=(180, 180, 180), width=border_width)  # 绘制外圆
+        inner_radius = int(radius * 0.7)  # 计算内圆半径
+        draw.ellipse([center-inner_radius, center-inner_radius, center+inner_radius, center+inner_radius], fill=(60, 60, 60), outline=(120, 120, 120), width=border_width//2)  # 绘制内圆
+        dot_radius = int(inner_radius * 0.3)  # 计算中心点圆点半径
+        draw.ellipse([center-dot_radius, center-dot_radius, center+dot_radius, center+dot_radius], fill=(150, 0, 0), outline=(100, 0, 0))  # 绘制中心点圆点
+    if "radius" not in locals():  # 如果没有定义 radius 变量
+        radius = center - padding  # 计算外圆半径
+    shadow = Image.new("RGBA", (size, size), (0, 0, 0, 0))  # 创建一个透明背景的阴影图像
+    shadow_draw = ImageDraw.Draw(shadow)  # 创建绘图对象
+    shadow_draw.ellipse([center-radius+2, center-radius+2, center+radius-2, center+radius-2], fill=(0, 0, 0, 30))  # 绘制阴影外圆
+    shadow = shadow.filter(ImageFilter.GaussianBlur(2))  # 应用高斯模糊以创建阴影效果
+    image = Image.alpha_composite(shadow, image)  # 将阴影与图像合成
+    return image  # 返回最终的图标图像
+
+'''清理冗余截图功能'''
+# 定义函数：从按时间排序的 [(截图时刻, 文件名), ...] 中找出与上一张保留的截图间隔小于参考间隔的截图
+def find_redundant_captures(file_times, reference_interval):
+    delete_list = []
+    last_kept_time = file_times[0][0]  # 保留的第一个文件时间
+    has_tile_deltas = any(filename.endswith(TILE_FILE_EXTENSION) for _, filename in file_times)  # 差分图块存储的文件夹
+
+    '''遍历所有文件（从第二个开始）'''
+    for time, filename in file_times[1:]:
+        delta = (time - last_kept_time).total_seconds()  # 计算与上一个保留文件的时间差（秒）
+        if delta < reference_interval and not (has_tile_deltas and not filename.endswith(TILE_FILE_EXTENSION)):  # 如果时间间隔小于参考间隔（差分帧依赖的关键帧始终保留）
+            delete_list.append(filename)  #  加入删除列表
+        else:
+            last_kept_time = time  # 时间间隔大于等于参考间隔，更新保留时间点
+    return delete_list
+
+# 定义函数：清理冗余截图
+def clean_nonstandard_frame(root_directory):
+    reference_interval = config.get_reference_interval()  # 自适应模式下以最小间隔为参考，避免误删活跃时段的截图
+    confirm = messagebox.askyesno("确认清理", f"即将清理【{config.project_name}】项目的冗余截图，参考截图时间间隔为 {reference_interval} 秒\n删除后不可恢复，是否继续?", icon='warning')  # 弹出确认对话框，询问用户是否继续清理操作
+    if not confirm:  # 如果用户点击"否"或关闭对话框
+        return  # 直接退出函数，不执行后续操作
+    flush_staged_captures()  # 启用本地暂存时，先把暂存的截图搬运到项目文件夹
+
+    total_deleted = 0  # 初始化计数器，记录总共删除的文件数
+    freed = 0  # 释放的字节数，清理完成后一次性记入磁盘占用账本
+    log_content = []  # 用于存储详细日志信息的列表
+
+    '''使用os.walk遍历根目录及其所有子目录'''
+    for dirpath, dirnames, filenames in os.walk(root_directory):  # 遍历根目录及其所有子目录
+        '''帧包：按同样的规则找出冗余的帧，然后重写帧包'''
+        for filename in filenames:
+            pack_path = os.path.join(dirpath, filename)
+            if not filename.endswith(PACK_EXTENSION) or pack_path in open_pack_paths:  # 正在写入的帧包不处理
+                continue
+            try:
+                pack_times = sorted((parse_capture_filename(entry["name"]), entry["name"]) for entry in read_pack_index(pack_path))
+                pack_delete = find_redundant_captures(pack_times, reference_interval) if pack_times else []
+                if not pack_delete:
+                    continue
+                log_content.append(f"\n处理帧包: {pack_path}\n删除以下 {len(pack_delete)} 帧:")
+                log_content.extend(f" - {name}" for name in pack_delete)
+                freed += rewrite_pack(pack_path, set(pack_delete))
+                total_deleted += len(pack_delete)
+            except Exception as e:
+                log_content.append(f"  重写帧包失败 {filename}: {str(e)}")
+
+        file_times = []  # 存储当前目录提取到的文件时间和文件名
+        
+        '''收集当前目录下所有符合条件的文件'''
+        for filename in filenames:
+            capture_time = parse_capture_filename(filename)  # 从文件名解析截图时刻（精确到毫秒）
+            if capture_time is not None:  # 时间格式无效或不是截图的文件跳过
+                file_times.append((capture_time, filename))  # 存储(时间, 文件名)元组
+
+        if not file_times:  # 如果没有符合条件的文件
+            continue  # 跳过当前目录
+
+        file_times.sort(key=lambda x: (x[0], x[1]))  # 按时间排序文件列表（同一毫秒内按文件名中的序号）
+
+        '''计算需要删除的文件'''
+        delete_list = find_redundant_captures(file_times, reference_interval)
+
+        if not delete_list:  # 如果没有要删除的文件
+            continue  #  跳过当前目录
+
+        '''记录当前目录信息到日志'''
+        dir_log = f"\n处理目录: {dirpath}\n删除以下 {len(delete_list)} 个文件:"
+        log_content.append(dir_log)
+
+        '''处理删除操作'''
+        dir_deleted = 0  # 初始化当前目录删除计数器
+        for filename in delete_list:  # 遍历需要删除的文件列表
+            filepath = os.path.join(dirpath, filename)  # 构建完整文件路径
+            file_log = f" - {filename}"  # 记录文件名到日志
+            log_content.append(file_log)  # 添加到日志内容
+            try:
+                size = os.path.getsize(filepath)
+                os.remove(filepath)  # 删除文件
+                freed += size
+                dir_deleted += 1  # 删除计数器加 1
+            except Exception as e:  # 捕获删除文件时的异常
+                error_log = f"  删除失败 {filename}: {str(e)}"  # 记录错误信息到日志
+                log_content.append(error_log)  # 添加到日志内容
+
+        total_deleted += dir_deleted  # 更新总删除计数器
+    record_disk_usage(config.project_path, -freed)  # 清理完成后一次性记入，在独立进程中截图时只需通知截图进程一次
+
+    '''将日志写入桌面文件'''
+    desktop_path = os.path.join(os.path.expanduser("~"), "Desktop")  # 获取用户桌面路径
+    log_file = os.path.join(desktop_path, "详细信息.log")  # 构建日志文件路径
+
+    try:
+        with open(log_file, 'w', encoding='utf-8') as f:
+            f.write("\n".join(log_content))  # 将日志内容写入文件
+    except Exception as e:
+        messagebox.showerror("错误", f"无法写入日志文件: {str(e)}")  # 如果写入日志文件失败，显示错误消息
+
+    config.initialize_folder_counter()  # 删除截图后与磁盘重新核对截图计数
+
+    messagebox.showinfo("清理完成", f"已清理冗余截图 {total_deleted} 个\n详细信息请查看桌面上的[详细信息.log]文件")  # 显示完成对话框
+
+'''设置窗口'''
+# 定义函数：打开“设置”窗口
+def open_settings_window(icon):
+    '''窗口创建'''
+    settings_window = tk.Toplevel()  # 创建设置窗口（顶级窗口）
+    settings_window.title("FrameKeeper 设置")  # 设置窗口标题
+    settings_window.geometry("600x650")  # 设置窗口大小(宽x高)
+    settings_window.resizable(False, False)  # 禁止调整窗口大小
+
+    '''创建选项卡容器：常规设置和采集设置分页显示'''
+    notebook = ttk.Notebook(settings_window)  # 创建选项卡控件
+    notebook.pack(fill="both", expand=True, padx=10, pady=(10, 0))  # 填充窗口上方区域
+
+    '''创建主框架容器'''
+    main_frame = ttk.Frame(notebook, padding="10")  # 设置内边距为10像素
+    notebook.add(main_frame, text="常规")  # “常规”选项卡
+    capture_frame = ttk.Frame(notebook, padding="10")  # 采集相关设置的框架
+    notebook.add(capture_frame, text="采集")  # “采集”选项卡
+    storage_frame = ttk.Frame(notebook, padding="10")  # 存储相关设置的框架
+    notebook.add(storage_frame, text="存储")  # “存储”选项卡
+    disk_frame = ttk.Frame(notebook, padding="10")  # 磁盘空间相关设置的框架
+    notebook.add(disk_frame, text="空间")  # “空间”选项卡
+    trigger_frame = ttk.Frame(notebook, padding="10")  # 触发截图相关设置的框架
+    notebook.add(trigger_frame, text="触发")  # “触发”选项卡
+    output_frame = ttk.Frame(notebook, padding="10")  # 向其它程序输出画面的设置框架
+    notebook.add(output_frame, text="输出")  # “输出”选项卡
+
+    '''控件布局'''
+    ttk.Label(main_frame, text="截图间隔 (秒):").grid(row=0, column=0, sticky="w", pady=5)  # 添加截图间隔标签(第0行第0列)
+    interval_var = tk.DoubleVar(value=config.interval)  # 创建并初始化截图间隔变量（支持小数，如 0.05 表示每秒 20 张），绑定到输入框，从配置中读取初始值
+    ttk.Entry(main_frame, textvariable=interval_var).grid(row=0, column=1, sticky="ew")  # 创建输入框并放置在网格布局中(第0行第1列)
+    ttk.Label(main_frame, text="程序储存目录:").grid(row=1, column=0, sticky="w", pady=5)  # 程序储存目录标签(第1行第0列)
+    path_var = tk.StringVar(value=config.base_save_path)  # 创建并初始化保存路径变量，绑定到输入框，从配置中读取初始路径
+    save_path_entry = ttk.Entry(main_frame, textvariable=path_var)  # 创建路径输入框
+    save_path_entry.grid(row=1, column=1, sticky="ew")  # 放置在网格布局中(第1行第1列)
+
+    # 定义函数：选择保存路径
+    def select_path():
+        path = filedialog.askdirectory()  # 打开文件对话框选择目录
+        if path:  # 如果用户选择了路径(未点击取消)
+            config.base_save_path = path  # 更新配置文件中的保存路径
+            '清空并更新路径输入框的内容'
+            save_path_entry.delete(0, tk.END)  # 删除现有内容
+            save_path_entry.insert(0, path)  # 插入新路径
+            config.initialize_folder_counter()  # 重新初始化文件夹计数器
+ 
+    '''图片格式下拉菜单'''
+    ttk.Button(main_frame, text="浏览...", command=select_path).grid(row=1, column=2, padx=5)  # 创建浏览按钮，点击时调用 select_path 函数，放在第 1 行第 2 列(路径输入框旁边)，左右添加 5 像素间距
+    ttk.Label(main_frame, text="图片格式:").grid(row=2, column=0, sticky="w", pady=5)  # 创建标签，放在第 2 行第 0 列，左对齐(w)，上下添加 5 像素间距
+    format_var = tk.StringVar(value=config.format)  # 绑定到配置中的当前格式
+    format_menu = ttk.Combobox(main_frame, textvariable=format_var, values=get_available_image_encoders(), state="readonly")  # 创建一个下拉菜单，readonly 表示禁止直接编辑，只能选择
+    format_menu.grid(row=2, column=1, sticky="ew")  # 放置在第 2 行第 1 列，水平拉伸
+
+    '''JPG质量设置框架'''
+    jpg_frame = ttk.Frame(main_frame)  # 创建框架
+    jpg_frame.grid(row=3, column=0, columnspan=3, sticky="ew", pady=5)  # 跨 3 列，水平拉伸，上下边距为 5 像素
+
+    '''JPG质量调节组件'''
+    '标签'
+    quality_label_text = ttk.Label(jpg_frame, text="JPG 压缩质量:")  # 添加JPG压缩质量标签
+    quality_label_text.pack(side="left")  # 标签靠左放置
+    '滑动条'
+    quality_var = tk.IntVar(value=config.jpg_quality)  # 绑定到配置中的当前质量值
+    quality_scale = ttk.Scale(jpg_frame, from_=1, to=100, orient="horizontal", variable=quality_var)  # 取值范围 1-100 ，水平方向，绑定到变量
+    quality_scale.pack(side="left", expand=True, fill="x", padx=5)  # 设置滑动条填充方式
+    quality_entry = ttk.Entry(jpg_frame, width=4, justify="center")  # 创建输入框用于显示JPG压缩质量
+    '数值输入框'
+    quality_entry.pack(side="left")  # 设置输入框位置
+    quality_entry.insert(0, str(config.jpg_quality))  # 初始化输入框内容为当前JPG压缩质量
+
+    # 定义函数：更新输入框内容为滑动条的值
+    def update_entry_from_scale(val):
+        quality_entry.delete(0, tk.END)  # 清空输入框
+        quality_entry.insert(0, str(int(float(val))))  # 将滑动条值转换为整数并插入到输入框
+
+    # 定义函数：尝试将输入框内容转换为整数
+    def update_scale_from_entry(event=None):
+        try:
+            val = int(quality_entry.get())  # 获取输入框内容
+            if 1 <= val <= 100:  # 如果值在有效范围内
+                quality_var.set(val)  # 更新滑动条值
+            else:  # 如果值不在有效范围内
+                quality_entry.delete(0, tk.END)  # 清空输入框
+                quality_entry.insert(0, str(quality_var.get()))  # 恢复为滑动条当前值
+        except ValueError:  # 如果输入框内容无法转换为整数
+            quality_entry.delete(0, tk.END)  # 清空输入框
+            quality_entry.insert(0, str(quality_var.get()))  # 恢复为滑动条当前值
+
+    quality_scale.config(command=update_entry_from_scale)  # 当滑动条值变化时调用函数 update_entry_from_scale 以更新输入框内容为滑动条的值
+    quality_entry.bind("<Return>", update_scale_from_entry)  # 当按下回车键时调用函数 update_scale_from_entry 以尝试将输入框内容转换为整数
+    quality_entry.bind("<FocusOut>", update_scale_from_entry)  # 当输入框失去焦点时调用函数 update_scale_from_entry 以尝试将输入框内容转换为整数
+
+    # 定义函数：“JPG 压缩质量：”文字、滑动条和输入框的状态切换
+    def toggle_jpg_quality_state(event=None):
+        if not get_image_encoder(format_var.get()).lossy:  # 如果选择的是无损格式（PNG、WebP 无损、QOI）
+            quality_scale.state(["disabled"])  # 禁用滑动条
+            quality_entry.state(["disabled"])  # 禁用输入框
+            quality_label_text.config(foreground="gray")  # 设置标签颜色为灰色
+        else:  # 如果选择的是有损格式（JPG、WebP 有损）
+            quality_scale.state(["!disabled"])  # 启用滑动条
+            quality_entry.state(["!disabled"])  # 启用输入框
+            quality_label_text.config(foreground="")  # 恢复标签颜色
+    format_menu.bind("<<ComboboxSelected>>", toggle_jpg_quality_state)  # 当选择的格式变化时调用 toggle_jpg_quality_state 以实现文字“JPG 压缩质量：”、滑动条和输入框的状态切换
+    toggle_jpg_quality_state()  # 程序初始化时调用一次函数 toggle_jpg_quality_state 以设置文字“JPG 压缩质量：”、滑动条和输入框的状态
+
+    '''视频质量设置'''
+    # 在已有设置下方添加视频质量设置选项
+    ttk.Label(main_frame, text="视频质量(码率):").grid(row=4, column=0, sticky="w", pady=5)
+    
+    # 创建视频质量下拉菜单
+    video_quality_var = tk.StringVar(value=config.video_quality)
+    quality_options = ["最大化压缩", "平衡", "最大化质量"]
+    quality_menu = ttk.Combobox(main_frame, textvariable=video_quality_var, 
+                               values=quality_options, state="readonly")
+    quality_menu.grid(row=4, column=1, sticky="ew")
+
+    '''开机自启动功能'''
+    auto_start_var = tk.BooleanVar(value=config.auto_start)  # 创建布尔变量用于存储开机自启状态
+
+    # 定义函数：开机自启动状态切换
+    def toggle_auto_start():
+        if auto_start_var.get():  # 如果勾选了开机自启
+            set_auto_start()  # 调用函数 set_auto_start 设置开机自启
+        else:  # 如果取消勾选
+            remove_auto_start()  # 调用函数 remove_auto_start 取消开机自启
+        check_auto_start()  # 调用函数 check_auto_start 检查当前开机自启状态
+        auto_start_var.set(config.auto_start)  # 更新复选框状态
+    ttk.Checkbutton(main_frame, text="开机自启", variable=auto_start_var, command=toggle_auto_start).grid(row=5, column=0, columnspan=2, sticky="w", pady=10)  # 创建开机自启复选框，绑定状态变量和回调函数，放在第 4 行，跨 2 列左对齐，带 10 像素边距
+
+    '''采集后端设置'''
+    ttk.Label(capture_frame, text="采集后端:").grid(row=0, column=0, sticky="w", pady=5)
+    backend_var = tk.StringVar(value=config.capture_backend)  # 绑定到配置中的采集后端
+    backend_names = get_available_capture_backends() or list(CAPTURE_BACKENDS)  # 只列出当前系统可用的后端
+    ttk.Combobox(capture_frame, textvariable=backend_var, values=backend_names, state="readonly").grid(row=0, column=1, sticky="ew")
+    ttk.Label(capture_frame, text="可在右键菜单「采集后端测速」中比较各后端的速度", foreground="gray").grid(row=1, column=0, columnspan=2, sticky="w")
+    ttk.Label(capture_frame, text="错过截图时间点时:").grid(row=2, column=0, sticky="w", pady=5)
+    missed_tick_var = tk.StringVar(value=config.missed_tick_policy)  # 绑定到配置中的错过时间点策略
+    ttk.Combobox(capture_frame, textvariable=missed_tick_var, values=CaptureScheduler.MISSED_TICK_POLICIES, state="readonly").grid(row=2, column=1, sticky="ew")
+    ttk.Label(capture_frame, text="重复帧处理:").grid(row=3, column=0, sticky="w", pady=5)
+    duplicate_mode_var = tk.StringVar(value=config.duplicate_mode)  # 绑定到配置中的重复帧处理方式
+    ttk.Combobox(capture_frame, textvariable=duplicate_mode_var, values=DuplicateFrameDetector.MODES, state="readonly").grid(row=3, column=1, sticky="ew")
+    ttk.Label(capture_frame, text="重复帧灵敏度 (0-255):").grid(row=4, column=0, sticky="w", pady=5)
+    duplicate_threshold_var = tk.IntVar(value=config.duplicate_threshold)  # 指纹灰度差不超过该值视为重复，越小越灵敏
+    ttk.Entry(capture_frame, textvariable=duplicate_threshold_var).grid(row=4, column=1, sticky="ew")
+    ttk.Label(capture_frame, text="截图间隔模式:").grid(row=5, column=0, sticky="w", pady=5)
+    interval_mode_var = tk.StringVar(value=config.interval_mode)  # 固定间隔，或根据画面变化自适应
+    ttk.Combobox(capture_frame, textvariable=interval_mode_var, values=INTERVAL_MODES, state="readonly").grid(row=5, column=1, sticky="ew")
+    ttk.Label(capture_frame, text="自适应间隔范围 (秒):").grid(row=6, column=0, sticky="w", pady=5)
+    adaptive_frame = ttk.Frame(capture_frame)  # 最小间隔和最大间隔输入框
+    adaptive_frame.grid(row=6, column=1, sticky="ew")
+    adaptive_min_var = tk.DoubleVar(value=config.adaptive_min_interval)
+    adaptive_max_var = tk.DoubleVar(value=config.adaptive_max_interval)
+    ttk.Entry(adaptive_frame, textvariable=adaptive_min_var, width=10).pack(side="left")
+    ttk.Label(adaptive_frame, text=" 至 ").pack(side="left")
+    ttk.Entry(adaptive_frame, textvariable=adaptive_max_var, width=10).pack(side="left")
+    ttk.Label(capture_frame, text="画面流:").grid(row=7, column=0, sticky="w", pady=5)
+    capture_streams_var = tk.StringVar(value=config.capture_streams)  # 每个画面流单独保存在项目中
+    ttk.Entry(capture_frame, textvariable=capture_streams_var).grid(row=7, column=1, sticky="ew")
+    ttk.Label(capture_frame, text="多个画面流用分号分隔，例如：全屏;显示器2;区域:0,0,800,600", foreground="gray").grid(row=8, column=0, columnspan=2, sticky="w")
+    dual_rate_var = tk.BooleanVar(value=config.dual_rate_capture)  # 每次截图保存缩略图，每隔几次保存全分辨率截图
+    ttk.Checkbutton(capture_frame, text="双速率截图（缩略图 + 全分辨率）", variable=dual_rate_var).grid(row=9, column=0, columnspan=2, sticky="w", pady=5)
+    ttk.Label(capture_frame, text="缩略图比例 (%) / 全分辨率每几次:").grid(row=10, column=0, sticky="w", pady=5)
+    dual_rate_frame = ttk.Frame(capture_frame)
+    dual_rate_frame.grid(row=10, column=1, sticky="ew")
+    thumbnail_scale_var = tk.IntVar(value=config.thumbnail_scale)
+    ttk.Entry(dual_rate_frame, textvariable=thumbnail_scale_var, width=8).pack(side="left")
+    full_frame_every_var = tk.IntVar(value=config.full_frame_every)
+    ttk.Entry(dual_rate_frame, textvariable=full_frame_every_var, width=8).pack(side="left", padx=5)
+    ttk.Label(capture_frame, text="截图跟不上时:").grid(row=11, column=0, sticky="w", pady=5)
+    load_shedding_var = tk.StringVar(value=config.load_shedding)  # 落后于计划或 CPU 占用过高时的降级方式
+    ttk.Combobox(capture_frame, textvariable=load_shedding_var, values=LOAD_SHEDDING_POLICIES, state="readonly").grid(row=11, column=1, sticky="ew")
+    ttk.Label(capture_frame, text="降级的 CPU 占用阈值 (%):").grid(row=12, column=0, sticky="w", pady=5)
+    cpu_shed_var = tk.IntVar(value=config.cpu_shed_percent)
+    ttk.Entry(capture_frame, textvariable=cpu_shed_var).grid(row=12, column=1, sticky="ew")
+    capture_process_var = tk.BooleanVar(value=config.capture_process)  # 截图循环在独立进程中运行，不受导出视频等操作影响
+    ttk.Checkbutton(capture_frame, text="在独立进程中截图（下次开始截图时生效）", variable=capture_process_var).grid(row=13, column=0, columnspan=2, sticky="w", pady=5)
+    capture_frame.columnconfigure(1, weight=1)  # 第2列可扩展
+
+    '''存储方式设置'''
+    ttk.Label(storage_frame, text="存储方式:").grid(row=0, column=0, sticky="w", pady=5)
+    storage_mode_var = tk.StringVar(value=config.storage_mode)  # 绑定到配置中的存储方式
+    ttk.Combobox(storage_frame, textvariable=storage_mode_var, values=STORAGE_MODES, state="readonly").grid(row=0, column=1, sticky="ew")
+    ttk.Label(storage_frame, text="视频直录帧率 (FPS):").grid(row=1, column=0, sticky="w", pady=5)
+    record_fps_var = tk.IntVar(value=config.record_fps)  # 视频直录时每张截图占一帧，按该帧率播放
+    ttk.Entry(storage_frame, textvariable=record_fps_var).grid(row=1, column=1, sticky="ew")
+    ttk.Label(storage_frame, text="视频片段时长 (分钟):").grid(row=2, column=0, sticky="w", pady=5)
+    segment_minutes_var = tk.IntVar(value=config.video_segment_minutes)  # 每个视频片段覆盖的截图时长
+    ttk.Entry(storage_frame, textvariable=segment_minutes_var).grid(row=2, column=1, sticky="ew")
+    ttk.Label(storage_frame, text="环形缓冲时长 (秒):").grid(row=3, column=0, sticky="w", pady=5)
+    ring_seconds_var = tk.IntVar(value=config.ring_buffer_seconds)  # 环形缓冲保留最近多少秒的截图
+    ttk.Entry(storage_frame, textvariable=ring_seconds_var).grid(row=3, column=1, sticky="ew")
+    ttk.Label(storage_frame, text="环形缓冲内存上限 (MB):").grid(row=4, column=0, sticky="w", pady=5)
+    ring_memory_var = tk.IntVar(value=config.ring_buffer_memory_mb)  # 环形缓冲最多占用的内存
+    ttk.Entry(storage_frame, textvariable=ring_memory_var).grid(row=4, column=1, sticky="ew")
+    ttk.Label(storage_frame, text="帧包大小上限 (MB):").grid(row=5, column=0, sticky="w", pady=5)
+    pack_max_mb_var = tk.IntVar(value=config.pack_max_mb)  # 帧包达到该大小后换一个新帧包
+    ttk.Entry(storage_frame, textvariable=pack_max_mb_var).grid(row=5, column=1, sticky="ew")
+    ttk.Label(storage_frame, text="帧包时长 (分钟):").grid(row=6, column=0, sticky="w", pady=5)
+    pack_max_minutes_var = tk.IntVar(value=config.pack_max_minutes)  # 每个帧包覆盖的截图时长
+    ttk.Entry(storage_frame, textvariable=pack_max_minutes_var).grid(row=6, column=1, sticky="ew")
+    ttk.Label(storage_frame, text="当前项目目录结构:").grid(row=7, column=0, sticky="w", pady=5)
+    layout_var = tk.StringVar(value=load_project_layout(config.project_path))  # 只影响当前项目之后的截图
+    ttk.Combobox(storage_frame, textvariable=layout_var, values=PROJECT_LAYOUTS, state="readonly").grid(row=7, column=1, sticky="ew")
+    ttk.Label(storage_frame, text="压缩质量模式:").grid(row=8, column=0, sticky="w", pady=5)
+    quality_mode_var = tk.StringVar(value=config.quality_mode)  # 固定质量，或按每帧大小 / 每日空间自动调节
+    ttk.Combobox(storage_frame, textvariable=quality_mode_var, values=QUALITY_MODES, state="readonly").grid(row=8, column=1, sticky="ew")
+    ttk.Label(storage_frame, text="每帧目标大小 (KB):").grid(row=9, column=0, sticky="w", pady=5)
+    target_frame_kb_var = tk.IntVar(value=config.target_frame_kb)
+    ttk.Entry(storage_frame, textvariable=target_frame_kb_var).grid(row=9, column=1, sticky="ew")
+    ttk.Label(storage_frame, text="每日空间预算 (MB):").grid(row=10, column=0, sticky="w", pady=5)
+    daily_budget_mb_var = tk.IntVar(value=config.daily_budget_mb)
+    ttk.Entry(storage_frame, textvariable=daily_budget_mb_var).grid(row=10, column=1, sticky="ew")
+    storage_frame.columnconfigure(1, weight=1)  # 第2列可扩展
+    ttk.Label(disk_frame, text="当前项目配额 (GB):").grid(row=0, column=0, sticky="w", pady=5)
+    project_quota_var = tk.DoubleVar(value=config.project_quota_gb)  # 0 表示不限制
+    ttk.Entry(disk_frame, textvariable=project_quota_var).grid(row=0, column=1, sticky="ew")
+    ttk.Label(disk_frame, text="全部项目配额 (GB):").grid(row=1, column=0, sticky="w", pady=5)
+    global_quota_var = tk.DoubleVar(value=config.global_quota_gb)
+    ttk.Entry(disk_frame, textvariable=global_quota_var).grid(row=1, column=1, sticky="ew")
+    ttk.Label(disk_frame, text="超出配额时:").grid(row=2, column=0, sticky="w", pady=5)
+    quota_action_var = tk.StringVar(value=config.quota_action)
+    ttk.Combobox(disk_frame, textvariable=quota_action_var, values=QUOTA_ACTIONS, state="readonly").grid(row=2, column=1, sticky="ew")
+    ttk.Label(disk_frame, text="配额为 0 表示不限制；超出项目配额时只删除当前项目中最旧的截图，超出总配额时删除所有项目中最旧的截图", foreground="gray").grid(row=3, column=0, columnspan=2, sticky="w")
+    ttk.Label(disk_frame, text="本地暂存目录:").grid(row=4, column=0, sticky="w", pady=5)
+    staging_path_var = tk.StringVar(value=config.staging_path)  # 为空表示直接写入项目文件夹
+    ttk.Entry(disk_frame, textvariable=staging_path_var).grid(row=4, column=1, sticky="ew")
+
+    # 定义函数：选择本地暂存目录
+    def select_staging_path():
+        path = filedialog.askdirectory(parent=settings_window)
+        if path:
+            staging_path_var.set(path)
+    ttk.Button(disk_frame, text="浏览...", command=select_staging_path).grid(row=4, column=2, padx=5)
+    ttk.Label(disk_frame, text="暂存搬运间隔 (秒):").grid(row=5, column=0, sticky="w", pady=5)
+    staging_flush_var = tk.IntVar(value=config.staging_flush_seconds)
+    ttk.Entry(disk_frame, textvariable=staging_flush_var).grid(row=5, column=1, sticky="ew")
+    ttk.Label(disk_frame, text="储存目录在网络共享或机械硬盘上时，可先把截图写入本地磁盘，再定时批量搬运", foreground="gray").grid(row=6, column=0, columnspan=3, sticky="w")
+    disk_frame.columnconfigure(1, weight=1)  # 第2列可扩展
+    ttk.Label(trigger_frame, text="监视目录:").grid(row=0, column=0, sticky="w", pady=5)
+    trigger_watch_var = tk.StringVar(value=config.trigger_watch_path)  # 其中有文件出现或变化时截图，为空表示不监视
+    ttk.Entry(trigger_frame, textvariable=trigger_watch_var).grid(row=0, column=1, sticky="ew")
+
+    # 定义函数：选择触发截图的监视目录
+    def select_trigger_watch_path():
+        path = filedialog.askdirectory(parent=settings_window)
+        if path:
+            trigger_watch_var.set(path)
+    ttk.Button(trigger_frame, text="浏览...", command=select_trigger_watch_path).grid(row=0, column=2, padx=5)
+    ttk.Label(trigger_frame, text="本机请求端口:").grid(row=1, column=0, sticky="w", pady=5)
+    trigger_port_var = tk.IntVar(value=config.trigger_http_port)  # 0 表示关闭
+    ttk.Entry(trigger_frame, textvariable=trigger_port_var).grid(row=1, column=1, sticky="ew")
+    trigger_window_var = tk.BooleanVar(value=config.trigger_window_change)
+    ttk.Checkbutton(trigger_frame, text="前台窗口切换时截图", variable=trigger_window_var).grid(row=2, column=0, columnspan=2, sticky="w", pady=5)
+    ttk.Label(trigger_frame, text="去抖间隔 (秒):").grid(row=3, column=0, sticky="w", pady=5)
+    trigger_debounce_var = tk.DoubleVar(value=config.trigger_debounce_seconds)
+    ttk.Entry(trigger_frame, textvariable=trigger_debounce_var).grid(row=3, column=1, sticky="ew")
+    ttk.Label(trigger_frame, text="每分钟最多触发次数:").grid(row=4, column=0, sticky="w", pady=5)
+    trigger_max_var = tk.IntVar(value=config.trigger_max_per_minute)
+    ttk.Entry(trigger_frame, textvariable=trigger_max_var).grid(row=4, column=1, sticky="ew")
+    ttk.Label(trigger_frame, text="连拍张数 / 连拍间隔 (秒):").grid(row=5, column=0, sticky="w", pady=5)
+    trigger_burst_frame = ttk.Frame(trigger_frame)
+    trigger_burst_frame.grid(row=5, column=1, sticky="ew")
+    trigger_burst_count_var = tk.IntVar(value=config.trigger_burst_count)
+    ttk.Entry(trigger_burst_frame, textvariable=trigger_burst_count_var, width=8).pack(side="left")
+    trigger_burst_interval_var = tk.DoubleVar(value=config.trigger_burst_interval)
+    ttk.Entry(trigger_burst_frame, textvariable=trigger_burst_interval_var, width=8).pack(side="left", padx=5)
+    ttk.Label(trigger_frame, text="开始截图时生效；截图间隔模式选择“仅触发”时只在触发时截图\n本机请求示例: http://127.0.0.1:端口/capture?burst=3",
+              foreground="gray").grid(row=6, column=0, columnspan=3, sticky="w")
+    trigger_frame.columnconfigure(1, weight=1)  # 第2列可扩展
+    frame_bus_var = tk.BooleanVar(value=config.frame_bus_enabled)  # 每帧原始画面同时发布到共享内存
+    ttk.Checkbutton(output_frame, text="发布原始画面到共享内存", variable=frame_bus_var).grid(row=0, column=0, columnspan=2, sticky="w", pady=5)
+    ttk.Label(output_frame, text="共享内存名称:").grid(row=1, column=0, sticky="w", pady=5)
+    frame_bus_name_var = tk.StringVar(value=config.frame_bus_name)
+    ttk.Entry(output_frame, textvariable=frame_bus_name_var).grid(row=1, column=1, sticky="ew")
+    ttk.Label(output_frame, text="保留最近几帧:").grid(row=2, column=0, sticky="w", pady=5)
+    frame_bus_slots_var = tk.IntVar(value=config.frame_bus_slots)
+    ttk.Entry(output_frame, textvariable=frame_bus_slots_var).grid(row=2, column=1, sticky="ew")
+    ttk.Label(output_frame, text="其它程序可以直接读取最新的未压缩截图，不需要读取和解码截图文件（下次开始截图时生效）", foreground="gray").grid(row=3, column=0, columnspan=2, sticky="w")
+    ttk.Label(output_frame, text="实时预览端口:").grid(row=4, column=0, sticky="w", pady=5)
+    preview_port_var = tk.IntVar(value=config.preview_port)  # 0 表示关闭
+    ttk.Entry(output_frame, textvariable=preview_port_var).grid(row=4, column=1, sticky="ew")
+    preview_remote_var = tk.BooleanVar(value=config.preview_allow_remote)  # 默认只允许本机访问
+    ttk.Checkbutton(output_frame, text="允许其它电脑访问实时预览", variable=preview_remote_var).grid(row=5, column=0, columnspan=2, sticky="w", pady=5)
+    ttk.Label(output_frame, text="访问密钥:").grid(row=6, column=0, sticky="w", pady=5)
+    preview_key_var = tk.StringVar(value=config.preview_key)  # 允许其它电脑访问时自动生成
+    ttk.Entry(output_frame, textvariable=preview_key_var, state="readonly").grid(row=6, column=1, sticky="ew")
+    ttk.Label(output_frame, text="开始截图后可在浏览器中打开 http://127.0.0.1:端口/ ，/stream 为 MJPEG 流，/latest.jpg 为最新一帧\n允许其它电脑访问时，所有地址都需要加上 ?key=访问密钥", foreground="gray").grid(row=7, column=0, columnspan=2, sticky="w")
+    output_frame.columnconfigure(1, weight=1)  # 第2列可扩展
+
+    # 定义函数：重置设置为程序默认值
+    def reset_settings():
+        confirm = messagebox.askyesno(
+            "确认重置",
+            "是否将所有设置恢复为程序默认值？\n已有截图文件不会被删除。",
+            parent=settings_window
+        )
+        if not confirm:
+            return
+
+        check_auto_start()
+        if config.auto_start:
+            remove_auto_start(show_message=False)
+
+        config.reset_to_defaults()
+        interval_var.set(config.interval)
+        path_var.set(config.base_save_path)
+        format_var.set(config.format)
+        video_quality_var.set(config.video_quality)
+        auto_start_var.set(config.auto_start)
+        backend_var.set(config.capture_backend)
+        missed_tick_var.set(config.missed_tick_policy)
+        duplicate_mode_var.set(config.duplicate_mode)
+        duplicate_threshold_var.set(config.duplicate_threshold)
+        interval_mode_var.set(config.interval_mode)
+        adaptive_min_var.set(config.adaptive_min_interval)
+        adaptive_max_var.set(config.adaptive_max_interval)
+        capture_streams_var.set(config.capture_streams)
+        dual_rate_var.set(config.dual_rate_capture)
+        thumbnail_scale_var.set(config.thumbnail_scale)
+        full_frame_every_var.set(config.full_frame_every)
+        load_shedding_var.set(config.load_shedding)
+        cpu_shed_var.set(config.cpu_shed_percent)
+        capture_process_var.set(config.capture_process)
+        storage_mode_var.set(config.storage_mode)
+        record_fps_var.set(config.record_fps)
+        segment_minutes_var.set(config.video_segment_minutes)
+        ring_seconds_var.set(config.ring_buffer_seconds)
+        ring_memory_var.set(config.ring_buffer_memory_mb)
+        pack_max_mb_var.set(config.pack_max_mb)
+        pack_max_minutes_var.set(config.pack_max_minutes)
+        layout_var.set(load_project_layout(config.project_path))
+        quality_mode_var.set(config.quality_mode)
+        target_frame_kb_var.set(config.target_frame_kb)
+        daily_budget_mb_var.set(config.daily_budget_mb)
+        project_quota_var.set(config.project_quota_gb)
+        global_quota_var.set(config.global_quota_gb)
+        quota_action_var.set(config.quota_action)
+        staging_path_var.set(config.staging_path)
+        staging_flush_var.set(config.staging_flush_seconds)
+        trigger_watch_var.set(config.trigger_watch_path)
+        trigger_port_var.set(config.trigger_http_port)
+        trigger_window_var.set(config.trigger_window_change)
+        trigger_debounce_var.set(config.trigger_debounce_seconds)
+        trigger_max_var.set(config.trigger_max_per_minute)
+        trigger_burst_count_var.set(config.trigger_burst_count)
+        trigger_burst_interval_var.set(config.trigger_burst_interval)
+        frame_bus_var.set(config.frame_bus_enabled)
+        frame_bus_name_var.set(config.frame_bus_name)
+        frame_bus_slots_var.set(config.frame_bus_slots)
+        preview_port_var.set(config.preview_port)
+        preview_remote_var.set(config.preview_allow_remote)
+        preview_key_var.set(config.preview_key)
+
+        quality_scale.state(["!disabled"])
+        quality_entry.state(["!disabled"])
+        quality_var.set(config.jpg_quality)
+        quality_entry.delete(0, tk.END)
+        quality_entry.insert(0, str(config.jpg_quality))
+        toggle_jpg_quality_state()
+
+        messagebox.showinfo("成功", "设置已恢复为程序默认值！", parent=settings_window)
+
+    # 定义函数：保存设置
+    def save_settings():
+        try:
+            config.interval = max(Config.MIN_INTERVAL, float(interval_var.get()))  # 截图间隔（不小于最小间隔）
+        except (tk.TclError, ValueError):
+            messagebox.showerror("错误", "截图间隔必须是数字。", parent=settings_window)
+            return
+        try:
+            parse_capture_streams(capture_streams_var.get())  # 检查画面流设置的格式
+        except ValueError as e:
+            messagebox.showerror("错误", f"画面流设置有误: {e}", parent=settings_window)
+            return
+        try:
+            project_quota_gb = max(0.0, project_quota_var.get())
+            global_quota_gb = max(0.0, global_quota_var.get())
+        except tk.TclError:
+            messagebox.showerror("错误", "配额必须是数字。", parent=settings_window)
+            return
+        config.base_save_path = path_var.get()  # 保存路径
+        config.format = format_var.get()  # 图片格式
+        config.jpg_quality = quality_var.get()  # JPG压缩质量
+        config.video_quality = video_quality_var.get()  # 视频质量
+        config.capture_backend = backend_var.get()  # 采集后端
+        config.missed_tick_policy = missed_tick_var.get()  # 错过截图时间点的处理策略
+        config.duplicate_mode = duplicate_mode_var.get()  # 重复帧处理方式
+        config.duplicate_threshold = max(0, min(255, duplicate_threshold_var.get()))  # 重复帧判定阈值
+        config.interval_mode = interval_mode_var.get()  # 截图间隔模式
+        config.adaptive_min_interval = max(Config.MIN_INTERVAL, adaptive_min_var.get())  # 自适应最小间隔
+        config.adaptive_max_interval = max(config.adaptive_min_interval, adaptive_max_var.get())  # 自适应最大间隔
+        config.capture_streams = capture_streams_var.get().strip()  # 画面流（下次开始截图时生效）
+        config.dual_rate_capture = dual_rate_var.get()  # 双速率截图（下次开始截图时生效）
+        config.thumbnail_scale = max(1, min(100, thumbnail_scale_var.get()))  # 缩略图比例
+        config.full_frame_every = max(1, full_frame_every_var.get())  # 全分辨率截图的间隔次数
+        config.load_shedding = load_shedding_var.get()  # 负载降级方式（下次开始截图时生效）
+        config.cpu_shed_percent = max(1, min(100, cpu_shed_var.get()))  # 降级的 CPU 占用阈值
+        config.capture_process = capture_process_var.get()  # 是否在独立进程中截图（下次开始截图时生效）
+        config.storage_mode = storage_mode_var.get()  # 存储方式（下次开始截图时生效）
+        config.record_fps = max(1, min(60, record_fps_var.get()))  # 视频直录帧率
+        config.video_segment_minutes = max(1, segment_minutes_var.get())  # 视频片段时长
+        config.ring_buffer_seconds = max(1, ring_seconds_var.get())  # 环形缓冲时长
+        config.ring_buffer_memory_mb = max(16, ring_memory_var.get())  # 环形缓冲内存上限
+        config.pack_max_mb = max(1, pack_max_mb_var.get())  # 帧包大小上限
+        config.pack_max_minutes = max(1, pack_max_minutes_var.get())  # 帧包时长
+        config.quality_mode = quality_mode_var.get()  # 压缩质量模式（下次开始截图时生效）
+        config.target_frame_kb = max(1, target_frame_kb_var.get())  # 每帧目标大小
+        config.daily_budget_mb = max(1, daily_budget_mb_var.get())  # 每日空间预算
+        config.project_quota_gb = project_quota_gb  # 当前项目配额
+        config.global_quota_gb = global_quota_gb  # 全部项目配额
+        config.quota_action = quota_action_var.get()  # 超出配额时的处理方式
+        config.staging_path = staging_path_var.get().strip()  # 本地暂存目录（下次开始截图时生效）
+        config.staging_flush_seconds = max(1, staging_flush_var.get())  # 暂存搬运间隔
+        config.trigger_watch_path = trigger_watch_var.get().strip()  # 触发截图的监视目录（下次开始截图时生效）
+        config.trigger_http_port = max(0, min(65535, trigger_port_var.get()))  # 触发截图的本机端口
+        config.trigger_window_change = trigger_window_var.get()  # 前台窗口切换时截图
+        config.trigger_debounce_seconds = max(0.0, trigger_debounce_var.get())  # 去抖间隔
+        config.trigger_max_per_minute = max(1, trigger_max_var.get())  # 每分钟最多触发次数
+        config.trigger_burst_count = max(1, min(CaptureTriggerManager.MAX_BURST, trigger_burst_count_var.get()))  # 每次触发连拍张数
+        config.trigger_burst_interval = max(Config.MIN_INTERVAL, trigger_burst_interval_var.get())  # 连拍间隔
+        config.frame_bus_enabled = frame_bus_var.get()  # 是否发布到共享内存（下次开始截图时生效）
+        config.frame_bus_name = frame_bus_name_var.get().strip() or Config.DEFAULT_FRAME_BUS_NAME  # 共享内存名称
+        config.frame_bus_slots = max(1, min(64, frame_bus_slots_var.get()))  # 共享内存中保留的帧数
+        config.preview_port = max(0, min(65535, preview_port_var.get()))  # 实时预览端口（下次开始截图时生效）
+        config.preview_allow_remote = preview_remote_var.get()  # 是否允许其它电脑访问实时预览
+        if config.preview_allow_remote and not config.preview_key:
+            config.preview_key = secrets.token_urlsafe(16)  # 第一次允许其它电脑访问时生成访问密钥
+        if layout_var.get() != load_project_layout(config.project_path):  # 修改当前项目的目录结构
+            try:
+                save_project_layout(config.project_path, layout_var.get())
+            except OSError as e:
+                messagebox.showerror("错误", f"无法保存项目目录结构: {e}", parent=settings_window)
+                return
+            config.initialize_folder_counter()  # 其它画面流在下次开始截图时生效
+        config.save_config()  # 保存配置到文件
+        update_menu(icon)  # 存储方式等设置会影响托盘菜单内容
+        messagebox.showinfo("成功", "设置已保存！")  # 显示保存成功消息
+        settings_window.destroy()  # 关闭设置窗口
+    button_frame = ttk.Frame(settings_window)  # 创建按钮区域
+    button_frame.pack(pady=15)  # 放置在选项卡下方，上下边距 15 像素
+    ttk.Button(button_frame, text="重置为默认值", command=reset_settings).pack(side="left", padx=5)  # 创建重置按钮
+    ttk.Button(button_frame, text="保存并关闭", command=save_settings).pack(side="left", padx=5)  # 创建保存按钮
+    main_frame.columnconfigure(1, weight=1)  # 第2列可扩展，让界面元素能自适应宽度
+
+'''导出为视频功能'''
+# 定义函数：创建主Tkinter窗口
+def run_in_main_thread(func, *args):
+    root.after(0, func, *args)  # 在主线程中执行函数
+
+# 定义函数：获取 ffmpeg.exe 路径(兼容打包和未打包情况)
+def get_ffmpeg_path():
+    if getattr(sys, 'frozen', False):  # 判断是否打包成 EXE
+        base_dir = os.path.dirname(sys.executable)  # EXE 所在目录
+    else:
+        base_dir = os.path.dirname(__file__)  # 脚本所在目录
+    return os.path.join(base_dir, "_internal", "ffmpeg.exe" if os.name == "nt" else "ffmpeg")
+
+# 定义函数：创建 FFmpeg 写入器
+def create_ffmpeg_writer(output_path, width, height, fps, bitrate, pix_fmt='bgr24', extra_args=None):
+    ffmpeg_path = get_ffmpeg_path()
+    if not os.path.exists(ffmpeg_path):
+        messagebox.showerror("错误", "找不到 FFmpeg。请确保主程序所在目录下的_internal/ffmpeg.exe存在。")
+        raise FileNotFoundError("ffmpeg.exe 未找到")
+
+    '''构建 FFmpeg 命令'''
+    # -ffmpeg_path: 使用绝对路径调用 ffmpeg
+    # -y: 覆盖输出文件
+    # -f rawvideo: 输入格式为原始视频数据
+    # -vcodec rawvideo: 输入编解码器
+    # -s: 视频尺寸 (widthxheight)
+    # -pix_fmt bgr24: 输入像素格式 (OpenCV 默认使用 BGR；视频直录直接使用 PIL 的 rgb24)
+    # -r: 输入帧率
+    # -i -: 从标准输入 (stdin) 读取数据
+    # -c:v libx264: 使用 H.264 编码器
+    # -b:v: 视频目标比特率 (例如 '2000k')
+    # -vf pad: 宽或高为奇数时（如自定义区域）在右侧和下方补齐一像素，yuv420p 要求宽高都是偶数
+    # -pix_fmt yuv420p: 输出像素格式，确保在大多数播放器上兼容
+    # -preset: 编码速度与压缩率的权衡 (ultrafast, superfast, veryfast, faster, fast, medium, slow, slower, veryslow)
+    # 'veryfast' 是一个很好的平衡点
+    # extra_args: 附加在输出文件之前的参数（如视频直录使用的 -movflags）
+    command = [
+        ffmpeg_path,
+        '-y',
+        '-f', 'rawvideo',
+        '-vcodec', 'rawvideo',
+        '-s', f'{int(width)}x{int(height)}',
+        '-pix_fmt', pix_fmt,
+        '-r', str(fps),
+        '-i', '-',
+        '-c:v', 'libx264',
+        '-b:v', f'{bitrate // 1000}k',
+        '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+        '-pix_fmt', 'yuv420p',
+        '-preset', 'veryfast',
+        *(extra_args or []),
+        output_path
+    ]
+
+    '''添加 creationflags 参数来隐藏控制台窗口'''
+    if os.name == 'nt':  # 仅适用于 Windows 系统
+        startupinfo = subprocess.STARTUPINFO()  # 创建 STARTUPINFO 对象
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW  # 设置标志以使用窗口显示选项
+        startupinfo.wShowWindow = subprocess.SW_HIDE  # 隐藏窗口
+    else:
+        startupinfo = None  # 对于非 Windows 系统，不需要设置 startupinfo
+
+    '''启动子进程'''
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE,  # 允许向 FFmpeg 写入数据
+        stdout=subprocess.DEVNULL,  # 隐藏 FFmpeg 的控制台输出，避免刷屏
+        stderr=subprocess.DEVNULL,  # 隐藏 FFmpeg 的控制台输出，避免刷屏
+        startupinfo=startupinfo  # 传入 startupinfo 以判断是否隐藏控制台窗口
+    )
+    return process  # 返回 FFmpeg 子进程对象
+
+# 定义函数：比特率计算
+def calculate_bitrate(width, height, fps, quality_mode):
+    pixels = width * height  # 计算总像素数
+
+    '''根据分辨率设置基础比特率'''
+    if pixels <= 640 * 480:      # 480p
+        base = 1_000_000
+    elif pixels <= 1280 * 720:   # 720p
+        base = 1_800_000 
+    elif pixels <= 1920 * 1080:  # 1080p
+        base = 4_000_000
+    else:                      # 4K+
+        base = 5_000_000
+
+    '''根据质量模式调整比特率'''
+    if quality_mode == "最大化压缩":
+        quality_factor = 0.8  # 80%的基准比特率
+    elif quality_mode == "平衡":
+        quality_factor = 1.0  # 100%的基准比特率
+    else:  # 最大化质量
+        quality_factor = 1.3  # 130%的基准比特率
+
+    '''根据帧率调整（0.3-1.5范围）'''
+    fps_factor = max(0.3, min(1.5, fps/24.0))  # 将帧率标准化到 24 FPS 范围内，确保在 0.3 到 1.5 之间
+    adjusted_base = base * quality_factor * fps_factor  # 调整基础比特率
+    return int(adjusted_base)  # 返回最终计算的比特率，转换为整数类型
+
+# 定义函数：生产者线程
+def read_and_decode_worker(path_queue, frame_queue, cancel_flag, memory_threshold=95):
+    consecutive_high_memory = 0  # 连续高内存计数器
+    while True:
+        if cancel_flag.is_set():
+            break
+ 
+        '''内存检查'''
+        mem_percent = psutil.virtual_memory().percent  # 获取当前内存使用率
+        if mem_percent > memory_threshold:  # 如果内存使用率超过阈值(95%)
+            consecutive_high_memory += 1  # 增加连续高内存计数器
+            if consecutive_high_memory >= 3:  # 如果连续高内存超过3次
+                sleep_time = min(0.1 * (2 ** (consecutive_high_memory - 3)), 2.0)  # 动态调整休眠时间，最多休眠2秒
+                time.sleep(sleep_time)  # 休眠一段时间
+                continue  # 跳过当前循环，继续检查内存
+        else:
+            consecutive_high_memory = 0  # 重置计数器
+
+        '''动态调整队列获取速度'''
+        try:
+            if frame_queue.qsize() > frame_queue.maxsize * 0.8:
+                time.sleep(0.05)  # 如果帧队列已满，稍微休眠
+            item = path_queue.get(timeout=0.5)  # 从路径队列中获取图片路径
+            if item is None:
+                break  # 如果图片路径为空，则退出循环
+            index, img_path = item  # 获取图片索引和路径
+        except queue.Empty:
+            continue  # 如果队列为空，则继续下一次循环
+
+        try:
+            image_path_unicode = img_path if isinstance(img_path, str) else img_path.decode('utf-8')  # 确保路径是字符串类型
+            frame = decode_capture_frame(image_path_unicode)  # 使用 OpenCV 读取图片（差分帧在此还原为完整画面）
+            if frame is None:
+                error_msg = f"无法读取图片: {image_path_unicode}"  # 如果读取失败，生成错误信息
+                frame_queue.put((index, None, error_msg))  # 将错误信息放入队列
+                root.after(0, lambda: messagebox.showerror("错误", error_msg, parent=root))  # 弹出错误对话框
+                continue  # 跳过当前循环
+
+            while not cancel_flag.is_set():
+                try:
+                    if frame_queue.full():  # 如果帧队列已满
+                        time.sleep(0.01)  # 等待一段时间，避免阻塞
+                        continue  # 继续检查队列状态
+                    frame_queue.put((index, frame, None), block=False)  # 将帧和索引放入队列
+                    break  # 成功放入队列后跳出循环
+                except queue.Full:
+                    time.sleep(0.01)  # 如果队列已满，稍微休眠再尝试
+        except Exception as e:
+            error_msg = f"处理文件 {os.path.basename(img_path)} 时出错: {e}"  # 捕获异常并生成错误信息
+            frame_queue.put((index, None, error_msg))  # 将错误信息放入队列
+            root.after(0, lambda: messagebox.showerror("错误", error_msg, parent=root))  # 弹出错误对话框
+        finally:
+            path_queue.task_done()  # 标记路径队列任务完成
+
+    frame_queue.put(None)    # 发送生产者结束信号
+
+# 定义函数：消费者线程
+def encode_worker(frame_queue, ffmpeg_stdin, total_frames, update_q, cancel_flag, start_time, num_producers, base_count, total_count):
+    producers_finished = 0  # 初始化已完成的生产者数量
+    processed_count = 0  # 初始化已处理的帧数
+    last_update_time = time.time()  # 获取上次更新进度的时间
+    frame_buffer = {}  # 初始化帧缓冲区
+    next_expected_index = 0  # 初始化下一个预期的帧索引
+
+    try:
+        while producers_finished < num_producers and not cancel_flag.is_set():  # 当所有生产者未完成且未取消时继续循环
+            try:
+                item = frame_queue.get(timeout=2)  # 从帧队列中获取帧数据
+                if item is None:
+                    producers_finished += 1  # 如果获取到的是结束信号，则增加已完成的生产者数量
+                    continue  # 跳过当前循环，等待下一个帧数据
+                
+                index, frame, error_info = item  # 解包帧数据，获取索引、帧和错误信息
+
+                if error_info:
+                    update_q.put((base_count + index, total_count, None, error_info))  # 发送错误信息
+                    if index == next_expected_index:
+                        next_expected_index += 1  # 如果这是预期的帧，增加计数器
+                    continue  # 跳过当前帧，继续处理下一个
+
+                frame_buffer[index] = frame  # 将帧放入缓冲区
+
+                while next_expected_index in frame_buffer:  # 当缓冲区中有下一个预期的帧时
+                    frame_to_write = frame_buffer.pop(next_expected_index)  # 获取并写入帧
+                    ffmpeg_stdin.write(frame_to_write.tobytes())  # 将帧数据写入 FFmpeg 的标准输入
+
+                    '''更新进度'''
+                    processed_count += 1  # 增加已处理的帧数
+                    current_global = base_count + next_expected_index  # 计算当前全局进度
+                    next_expected_index += 1  # 增加下一个预期的帧索引
+
+                    '''限制进度更新频率'''
+                    current_time = time.time()  # 获取当前时间
+                    if current_time - last_update_time > 0.5:  # 如果距离上次更新超过0.5秒
+                        elapsed = current_time - start_time  # 计算从开始到现在的总时间
+                        if processed_count > 0:  # 如果已经处理了帧
+                            time_per_item = elapsed / processed_count  # 计算每帧平均处理时间
+                            remaining = time_per_item * (total_frames - processed_count)  # 计算剩余时间
+                        else:
+                            remaining = 0  # 如果没有处理过帧，则剩余时间为0
+
+                        update_q.put((current_global, total_count, remaining, None))  # 发送进度更新到队列
+                        last_update_time = current_time  # 更新上次更新时间
+            except queue.Empty:
+                time.sleep(0.05)  # 如果队列为空，稍微休眠一下再继续
+
+        while next_expected_index in frame_buffer:  # 当缓冲区中有下一个预期的帧时
+            frame_to_write = frame_buffer.pop(next_expected_index)  # 获取并写入帧
+            ffmpeg_stdin.write(frame_to_write.tobytes())  # 将帧数据写入 FFmpeg 的标准输入
+            next_expected_index += 1  # 增加下一个预期的帧索引
+            processed_count += 1  # 增加已处理的帧数
+            current_global = base_count + next_expected_index - 1  # 计算当前全局进度
+            update_q.put((current_global, total_count, 0, None))  # 发送最终进度更新
+
+    except Exception as e:
+        exception_queue.put(e)  # 将异常放入全局异常队列
+
+# 定义函数：导出视频(调用生产者-消费者模式)
+def do_export_optimized(images, save_path, frame_rate, width, height, update_q, cancel_flag, base_count=0, total_count=None):
+    """
+    images: 当前分辨率组的图片列表
+    save_path: 视频保存路径
+    frame_rate: 帧率
+    width, height: 分辨率
+    update_q: 进度更新队列
+    cancel_flag: 取消标志
+    base_count: 当前组之前的累计进度
+    total_count: 所有组的总图片数
+    """
+
+    '''确保total_count有值（兼容原始调用）'''
+    if total_count is None:
+        total_count = len(images)  # 如果未提供总数，则使用当前组的图片数量
+
+    temp_output = None  # 临时输出文件路径
+    ffmpeg_process = None  # FFmpeg 进程对象
+    try:
+        '''动态调整线程数和队列大小'''
+        num_cores = os.cpu_count() or 4  # 获取 CPU 核心数，默认为4
+        num_reader_threads = max(1, min(num_cores - 1, 4))  # 确保至少有1个线程，最多4个线程
+        
+        '''基于图片数量动态设置队列大小'''
+        if len(images) < 100:  # 如果图片数量少于100
+            max_queue_size = 10  # 小队列
+        elif len(images) < 500:  # 如果图片数量少于500
+            max_queue_size = 20  # 中等队列
+        else:  # 如果图片数量大于等于500
+            max_queue_size = 30  # 大队列
+
+        '''创建队列'''
+        path_queue = queue.Queue()  # 图片路径队列
+        frame_queue = queue.Queue(maxsize=max_queue_size)  # 帧队列，设置最大队列大小以防止内存溢出
+
+        '''将图片路径与索引一起放入队列'''
+        for idx, img_path in enumerate(images):
+            path_queue.put((idx, img_path))  # 将索引和图片路径作为元组放入路径队列
+
+        '''确保临时目录存在'''
+        temp_dir = tempfile.gettempdir()  # 获取系统临时目录
+        if not os.path.exists(temp_dir):
+            os.makedirs(temp_dir)  # 如果临时目录不存在，则创建它
+
+        temp_output = os.path.join(temp_dir, f"temp_export_{os.getpid()}_{time.time()}.mp4")  # 创建一个唯一的临时输出文件名，避免冲突
+
+        '''初始化 FFmpeg 编码器'''
+        bitrate = calculate_bitrate(width, height, frame_rate, config.video_quality)  # 根据分辨率和质量模式计算比特率
+        ffmpeg_process = create_ffmpeg_writer(temp_output, width, height, frame_rate, bitrate)  # 创建 FFmpeg 编码器
+        
+        '''创建并启动线程'''
+        start_time = time.time()  # 记录开始时间
+        threads = []  # 初始化线程列表
+
+        '''消费者线程'''
+        encoder_thread = threading.Thread(target=encode_worker, args=(frame_queue, ffmpeg_process.stdin, len(images), update_q, cancel_flag, start_time, num_reader_threads, base_count, total_count), daemon=True)  # 创建消费者线程
+        encoder_thread.start()  # 启动消费者线程
+        threads.append(encoder_thread)  # 添加到消费者线程列表
+
+        '''生产者线程'''
+        for _ in range(num_reader_threads):
+            reader_thread = threading.Thread(target=read_and_decode_worker, args=(path_queue, frame_queue, cancel_flag, 95), daemon=True)  # 创建生产者线程
+            reader_thread.start()  # 启动生产者线程
+            threads.append(reader_thread)  # 添加到生产者线程列表
+
+        path_queue.join()  # 等待路径队列处理完毕
+
+        '''发送结束信号'''
+        for _ in range(num_reader_threads):
+            path_queue.put(None)  # 向每个生产者线程发送结束信号
+            
+        '''等待线程结束'''
+        for t in threads:
+            t.join(timeout=10.0)  # 等待所有线程结束，设置超时时间以防止死锁
+        if cancel_flag.is_set():
+            root.after(0, lambda: messagebox.showinfo("导出取消", "视频导出已被取消。"))  # 如果取消标志被设置，显示取消消息
+            return  # 退出函数
+
+        '''完成导出'''
+        # 关闭 FFmpeg 的标准输入并等待进程结束（仅在 ffmpeg_process 存在且具有 stdin 时）
+        if ffmpeg_process is not None:
+            try:
+                stdin_obj = getattr(ffmpeg_process, 'stdin', None)
+                if stdin_obj is not None:
+                    try:
+                        stdin_obj.close()
+                    except Exception:
+                        pass
+                try:
+                    ffmpeg_process.wait()
+                except Exception:
+                    pass
+            except Exception:
+                pass
+
+        if ffmpeg_process.returncode != 0:
+            messagebox.showerror("错误", f"FFmpeg 编码失败，返回码: {ffmpeg_process.returncode}。请检查控制台输出。")  # 如果 FFmpeg 返回非零码，表示编码失败，显示错误消息
+
+        shutil.move(temp_output, save_path)  # 将临时文件移动到最终保存路径
+        final_size = os.path.getsize(save_path) / (1024 * 1024)  # 获取最终文件大小，单位为 MB
+        duration = len(images) / frame_rate  # 计算视频时长，单位为秒
+        root.after(0, lambda: messagebox.showinfo("视频导出成功",
+            f"视频已成功导出:\n视频路径: {save_path}\n视频尺寸: {width}x{height}\n"
+            f"视频时长: {duration:.1f}秒\n视频大小: {final_size:.1f}MB"))
+
+    except Exception as e:
+        cancel_flag.set()  # 设置取消标志以通知其他线程停止工作
+        run_in_main_thread(messagebox.showerror, "导出错误", f"导出过程中发生严重错误:\n{str(e)}")  # 在主线程中显示错误消息
+
+    finally:
+        if ffmpeg_process:
+            if ffmpeg_process.poll() is None:  # 检查 FFmpeg 进程是否仍在运行
+                ffmpeg_process.terminate()  # 如果 FFmpeg 进程仍在运行，则终止它
+                ffmpeg_process.wait()  # 等待进程终止
+        if temp_output and os.path.exists(temp_output):  # 如果临时文件存在
+            try:
+                os.remove(temp_output)  # 删除临时文件
+            except OSError:
+                pass  # 忽略删除文件时的错误
+
+# 定义函数：扫描图片分辨率
+def scan_image_resolutions(images, update_q, cancel_flag):
+    resolution_count = {}  # 初始化用于存储分辨率计数的字典
+    total = len(images)  # 获取总图片数量
+    processed_count = 0  # 初始化已处理的图片数量
+    last_update_time = 0  # 初始化上次更新进度的时间
+    update_threshold = 100  # 每处理100张图片才更新一次进度
+
+    # 定义函数：扫描图片分辨率的子任务
+    def scan_chunk(chunk):
+        nonlocal processed_count, last_update_time  # 使用外部变量
+        local_count = {}  # 本地分辨率计数
+        chunk_processed = 0  # 本 chunk 已处理数量
+        for img_path in chunk:
+            if cancel_flag.is_set():
+                return {}  # 如果取消标志被设置，立即返回
+            try:
+                resolution = get_capture_frame_size(img_path)  # 获取图片分辨率
+                local_count[resolution] = local_count.get(resolution, 0) + 1  # 更新本地计数
+                chunk_processed += 1  # 增加本 chunk 已处理数量
+                processed_count += 1  # 增加全局已处理数量
+                if chunk_processed % update_threshold == 0:
+                    update_q.put(processed_count)  # 发送进度更新
+
+            except Exception:
+                continue  # 忽略无法打开的图片
+        return local_count  # 返回本 chunk 的分辨率计数
+
+    with concurrent.futures.ThreadPoolExecutor() as executor:  # 使用线程池执行扫描任务
+        chunk_size = max(10, len(images) // (os.cpu_count() or 4))  # 动态调整 chunk 大小，确保每个线程有足够的工作量
+        chunks = [images[i:i + chunk_size] for i in range(0, len(images), chunk_size)]  # 将图片列表分割成多个 chunk
+        futures = []  # 存储未来对象
+        for chunk in chunks:
+            futures.append(executor.submit(scan_chunk, chunk))  # 提交扫描任务
+        for future in concurrent.futures.as_completed(futures):  # 等待所有任务完成
+            if cancel_flag.is_set():
+                break  # 如果取消标志被设置，跳出循环
+            chunk_result = future.result()  # 获取任务结果
+            for res, count in chunk_result.items():  # 合并本 chunk 的结果到全局计数
+                resolution_count[res] = resolution_count.get(res, 0) + count  # 更新全局计数
+            update_q.put(processed_count)  # 确保每个 chunk 结束时更新进度
+
+    update_q.put(total)  # 最终强制更新到100%
+    return resolution_count  # 返回最终的分辨率计数
+
+# 定义函数：显示扫描进度窗口
+def show_scan_progress(images, progress_window, cancel_flag):
+
+    '''创建进度窗口'''
+    progress_frame = ttk.Frame(progress_window, padding=15)  # 创建进度窗口的主框架
+    progress_frame.pack(fill=tk.BOTH, expand=True)  # 填充整个窗口
+    ttk.Label(progress_frame, text="正在扫描图片分辨率...", font=("Arial", 10, "bold")).pack(anchor="w")  # 标题标签
+    ttk.Separator(progress_frame).pack(fill=tk.X, pady=5)  # 分隔线
+
+    '''创建进度条'''
+    progress_var = tk.DoubleVar(value=0)  # 进度变量
+    progress_bar = ttk.Progressbar(
+        progress_frame,  # 进度条所在的框架
+        variable=progress_var,  # 绑定进度变量
+        maximum=len(images),  # 设置最大值为图片总数
+        length=350,  # 进度条长度
+        mode="determinate"  # “确定”模式
+    )
+    progress_bar.pack(fill=tk.X, pady=(0, 10))  # 填充 X 轴，底部边距 10 像素
+    status_frame = ttk.Frame(progress_frame)  # 创建状态信息框架
+    status_frame.pack(fill=tk.X, pady=(0, 15))  # 填充 X 轴，底部边距 15 像素
+    percent_var = tk.StringVar(value="0%")  # 百分比变量
+    ttk.Label(status_frame, textvariable=percent_var, font=("Arial", 10)).pack(anchor="w")  # 百分比标签
+    files_var = tk.StringVar(value=f"0 / {len(images)} 图片已扫描")  # 文件计数变量
+    ttk.Label(status_frame, textvariable=files_var, font=("Arial", 9)).pack(anchor="w")  # 文件计数标签
+
+    '''创建取消按钮'''
+    def cancel_scan():
+        if messagebox.askyesno("确认取消", "确定要取消分辨率扫描吗？", parent=progress_window):
+            cancel_flag.set()  # 设置取消标志
+    button_frame = ttk.Frame(progress_frame)  # 创建按钮框架
+    button_frame.pack(fill=tk.X, pady=(10, 0))  # 填充 X 轴，顶部边距 10 像素
+
+    cancel_button = ttk.Button(
+        button_frame,  # 按钮所在的框架
+        text="取消扫描",  # 按钮文本
+        command=cancel_scan,  # 绑定取消函数
+        width=15  # 按钮宽度
+    )
+    cancel_button.pack(pady=5)  # 按钮底部边距 5 像素
+    update_queue = queue.Queue()  # 创建更新队列
+    scanned_count = 0  # 已扫描图片计数
+    total_images = len(images)  # 总图片数量
+
+    # 定义函数：更新进度条
+    def update_progress():
+        nonlocal scanned_count  # 使用外部变量
+        try:
+            while not update_queue.empty():
+                new_count = update_queue.get_nowait()  # 非阻塞获取新进度
+                if new_count > scanned_count:  # 只更新当进度值确实变化时
+                    scanned_count = new_count  # 更新已扫描图片计数
+                    progress_var.set(scanned_count)  # 更新进度条
+                    percent = min(100, int(scanned_count * 100 / total_images))  # 计算百分比，确保不超过100%
+                    percent_var.set(f"{percent}%")  # 更新百分比标签
+                    files_var.set(f"{scanned_count} / {total_images} 图片已扫描")  # 更新文件计数标签
+        except queue.Empty:
+            pass  # 如果队列为空，忽略错误
+
+        try:
+            if scanned_count >= total_images or cancel_flag.is_set():
+                progress_window.destroy()  # 如果扫描完成或取消，关闭进度窗口
+        except:
+            pass  # 如果窗口已经不存在，忽略错误
+
+        else:
+            progress_window.after(100, update_progress)  # 降低UI刷新频率到100ms
+
+    progress_window.after(100, update_progress)  # 启动进度更新循环
+    return progress_var, percent_var, files_var, update_queue  # 返回进度变量和更新队列
+
+# 定义函数：剩余时间估计
+def format_time(seconds):
+    minutes = int(seconds // 60)
+    seconds = int(seconds % 60)
+    return f"{minutes:02d}:{seconds:02d}"
+
+# 定义函数：解析时间范围 “开始 ~ 结束”（可精确到日、分钟或秒），返回 (开始, 结束)
+def parse_time_range(text):
+    parts = text.replace("～", "~").split("~")
+    if len(parts) != 2:
+        raise ValueError("请用 ~ 分隔开始时间和结束时间")
+
+    def parse_moment(value, is_end):
+        value = value.strip()
+        for time_format in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", TIME_SHARD_DATE_FORMAT):
+            try:
+                moment = datetime.strptime(value, time_format)
+            except ValueError:
+                continue
+            if is_end and time_format == TIME_SHARD_DATE_FORMAT:
+                moment += timedelta(days=1) - timedelta(microseconds=1)  # 结束时间只写日期时包含当天
+            return moment
+        raise ValueError(f"无法识别的时间: {value}")
+    start, end = parse_moment(parts[0], False), parse_moment(parts[1], True)
+    if end < start:
+        raise ValueError("结束时间早于开始时间")
+    return start, end
+
+# 定义函数：获取图片列表中相邻截图的时间间隔（秒），有无法解析时间的文件时返回 None
+def get_capture_gaps(images):
+    times = [parse_capture_filename(os.path.basename(path)) for path in images]
+    if any(t is None for t in times):
+        return None
+    return [(b - a).total_seconds() for a, b in zip(times, times[1:])]
+
+# 定义函数：判断截图间隔是否不固定（最长间隔超过中位间隔的 1.5 倍）
+def has_irregular_capture_times(images):
+    gaps = get_capture_gaps(images)
+    if not gaps:
+        return False
+    positive_gaps = sorted(gap for gap in gaps if gap > 0)
+    if not positive_gaps:
+        return False
+    median = positive_gaps[(len(positive_gaps) - 1) // 2]
+    return positive_gaps[-1] > median * 1.5
+
+# 定义函数：按真实截图时间展开图片列表：以中位间隔为一帧的时长，间隔较长的截图重复若干次；
+# 超过 max_gap 的间隔视为截图会话之间的中断，不做填充
+def expand_images_by_capture_time(images, max_gap):
+    gaps = get_capture_gaps(images)
+    positive_gaps = sorted(gap for gap in gaps or [] if gap > 0)
+    if not positive_gaps:
+        return images
+    step = positive_gaps[(len(positive_gaps) - 1) // 2]  # 每一帧代表的时长（中位间隔）
+    expanded = []
+    for path, gap in zip(images, gaps):
+        repeat = 1 if gap > max_gap else max(1, round(gap / step))
+        expanded.extend([path] * repeat)
+    expanded.append(images[-1])
+    return expanded
+
+# 定义函数：导出为视频(右键菜单直接调用的函数)
+def export_to_video(icon=None):
+    dialog_parent = tk.Toplevel(root)  # 创建顶层对话框窗口
+    dialog_parent.withdraw()  # 先隐藏对话框，等待用户选择
+
+    '''选择需要导出为视频的项目'''
+    source_dir = filedialog.askdirectory(title="请选择需要导出为视频的项目：", initialdir=config.base_save_path, parent=dialog_parent)  # 打开目录选择对话框
+    if not source_dir:  # 如果用户取消选择
+        dialog_parent.destroy()  # 销毁对话框
+        return  # 直接返回
+    flush_staged_captures()  # 启用本地暂存时，先把暂存的截图搬运到项目文件夹
+
+    '''按日期/小时结构的项目可以只导出一段时间，范围外的文件夹不会被列出'''
+    time_range = None  # (开始, 结束)，None 表示导出全部
+    if TIME_SHARDED_LAYOUT in (load_project_layout(source_dir), load_project_layout(os.path.dirname(source_dir))):
+        range_text = simpledialog.askstring("导出时间范围", "只导出一段时间内的截图（留空导出全部）：\n格式：2024-05-01 09:00 ~ 2024-05-01 18:00", parent=dialog_parent)
+        if range_text is None:  # 用户取消
+            dialog_parent.destroy()
+            return
+        if range_text.strip():
+            try:
+                time_range = parse_time_range(range_text)
+            except ValueError as e:
+                messagebox.showerror("错误", f"时间范围格式有误: {e}", parent=dialog_parent)
+                dialog_parent.destroy()
+                return
+
+    '''遍历子文件夹收集图片文件'''
+    images = []  # 存储找到的图片路径
+    stream_dirs = []  # 项目中其它画面流的文件夹（每个画面流单独导出）
+    for root_dir, dirs, files in os.walk(source_dir):  # 遍历目录树
+        if time_range is not None:
+            prune_time_shards(root_dir, dirs, *time_range)  # 跳过时间范围外的 日期/小时 文件夹
+        if root_dir == source_dir:  # 跳过根目录本身
+            stream_dirs = [d for d in dirs if is_capture_stream_folder(os.path.join(root_dir, d))]
+            dirs[:] = [d for d in dirs if d not in stream_dirs]  # 不同画面流的截图不混在同一个视频中
+            continue
+        for file in files:  # 检查每个文件
+            if file.lower().endswith((".png", ".jpg", ".jpeg", ".webp", ".qoi", TILE_FILE_EXTENSION)):  # 检查图片扩展名（包括差分帧）
+                images.append(os.path.join(root_dir, file))  # 添加完整路径
+            elif file.endswith(PACK_EXTENSION):  # 帧包：展开为其中每一帧的路径
+                try:
+                    images.extend(list_pack_members(os.path.join(root_dir, file)))
+                except OSError:
+                    continue  # 索引文件缺失的帧包无法读取
+
+    if time_range is not None:  # 范围边缘的小时文件夹中可能有范围外的截图
+        images = [path for path in images if time_range[0] <= (parse_capture_filename(os.path.basename(path)) or datetime.min) <= time_range[1]]
+
+    '''检查是否找到图片'''
+    if not images:  # 如果没有找到图片
+        if stream_dirs:
+            messagebox.showwarning("无图片", f"所选项目的截图保存在画面流文件夹中：{'、'.join(stream_dirs)}\n请选择要导出的画面流文件夹。", parent=dialog_parent)
+        else:
+            messagebox.showwarning("无图片", "所选文件夹的子文件夹中没有找到图片文件", parent=dialog_parent)
+        dialog_parent.destroy()  # 关闭对话框
+        return  # 结束函数
+    if stream_dirs:
+        messagebox.showinfo("画面流", f"所选项目还包含以下画面流：{'、'.join(stream_dirs)}\n"
+                            "本次只导出全屏画面流；如需导出其它画面流，请在选择文件夹时选择对应的画面流文件夹。", parent=dialog_parent)
+
+    images.sort(key=lambda x: os.path.basename(x))  # 按文件名排序
+
+    '''选择视频保存路径'''
+    save_path = filedialog.asksaveasfilename(
+        defaultextension=".mp4",  # 默认扩展名
+        filetypes=[("MP4 文件", "*.mp4")],  # 文件类型过滤器
+        title="保存视频文件",  # 对话框标题
+        initialdir=os.path.join(os.path.expanduser("~"), "Desktop"),  # 默认目录
+        parent=dialog_parent
+    )
+    if not save_path:  # 如果用户取消保存
+        dialog_parent.destroy()  # 关闭对话框
+        return  # 结束函数
+    
+    '''扫描所有图片的分辨率'''
+    scan_cancel_flag = threading.Event()  # 创建取消标志
+    scan_progress_window = tk.Toplevel(root)  # 创建扫描进度窗口
+    scan_progress_window.title("扫描图片分辨率")  # 窗口标题
+    scan_progress_window.geometry("450x300")  # 窗口大小
+    scan_progress_window.resizable(False, False)  # 禁止调整大小
+    scan_progress_window.protocol("WM_DELETE_WINDOW", lambda: None)  # 禁用关闭按钮
+    progress_var, percent_var, files_var, scan_update_queue = show_scan_progress(images, scan_progress_window, scan_cancel_flag)  # 显示扫描进度窗口
+    resolution_count = {}  # 初始化分辨率计数
+    def scan_task():
+        nonlocal resolution_count  # 使用外部变量
+        try:
+            resolution_count = scan_image_resolutions(images, scan_update_queue, scan_cancel_flag)  # 扫描图片分辨率
+        finally:
+            try:
+                if scan_progress_window.winfo_exists():
+                    scan_progress_window.destroy()  # 确保扫描完成时关闭窗口
+            except:
+                pass  # 如果窗口已经不存在，忽略错误
+    threading.Thread(target=scan_task, daemon=True).start()  # 启动扫描线程
+    root.wait_window(scan_progress_window)  # 等待扫描窗口关闭
+    if scan_cancel_flag.is_set():
+        return  # 如果扫描被取消，直接返回
+
+    '''分析分辨率统计结果'''
+    total_images = len(images)  # 总图片数量
+    resolutions = sorted(resolution_count.items(), key=lambda x: x[1], reverse=True)  # 按数量排序分辨率
+    resolution_types = len(resolutions)  # 不同分辨率的种类数
+
+    '''直接生成所有分辨率的统计信息'''
+    resolution_stats = "\n".join([
+        f"- {res[0]}x{res[1]}: {count} 张 ({count/total_images*100:.1f}%)"
+        for res, count in resolutions
+    ])
+
+    '''始终在遇到多种分辨率时提供分组导出选项'''
+    if resolution_types > 1:
+        msg = (
+            f"检测到 {resolution_types} 种不同的图片分辨率:\n\n"
+            f"{resolution_stats}\n\n"
+            "导出为单一视频可能导致乱码。是否按分辨率分组导出为多个视频？"
+        )
+
+        if messagebox.askyesno("分辨率警告", msg, parent=root):  # 如果用户选择分组导出
+
+            '''按分辨率分组图片'''
+            grouped_images = {}  # 初始化分组字典
+            for img_path in images:  # 遍历所有图片
+                try:
+                    res = get_capture_frame_size(img_path)  # 获取分辨率
+                    if res not in grouped_images:  # 如果该分辨率尚未分组
+                        grouped_images[res] = []  # 创建新组
+                    grouped_images[res].append(img_path)  # 添加图片到对应组
+                except Exception:
+                    continue  # 忽略无法打开的图片
+        else:
+            return  # 用户选择不分组导出，直接返回
+
+    '''获取用户设置的帧率'''
+    frame_rate = simpledialog.askinteger(
+        "帧率",
+        "请输入视频帧率 (FPS):",
+        initialvalue=30,  # 默认值 30
+        minvalue=1,  # 最小值 1
+        maxvalue=60,  # 最大值 60
+        parent=dialog_parent  # 对话框为父窗口
+    )
+    dialog_parent.destroy()  # 关闭对话框
+    if not frame_rate:  # 如果用户取消输入
+        return  # 用户选择不分组导出，直接返回
+
+    '''按分辨率分组图片'''
+    grouped_images = {}  # 初始化分组字典
+    for img_path in images:
+        try:
+            res = get_capture_frame_size(img_path)  # 获取分辨率
+            if res not in grouped_images:  # 如果该分辨率尚未分组
+                grouped_images[res] = []  # 创建新组
+            grouped_images[res].append(img_path)  # 添加图片到对应组
+        except Exception:
+            continue  # 忽略无法打开的图片
+
+    '''按组内文件名排序（确保顺序）'''
+    for img_list in grouped_images.values():
+        img_list.sort(key=lambda x: os.path.basename(x))  # 按文件名排序
+
+    '''截图间隔不固定时（自适应截图间隔、跳过重复帧等），可按真实截图时间导出'''
+    if has_irregular_capture_times(images):
+        if messagebox.askyesno("按真实时间导出", "检测到截图间隔不固定（例如使用了自适应截图间隔或跳过了重复帧）。\n"
+                               "是否按真实截图时间导出？\n选择“是”时，间隔较长的截图会重复显示，使视频中的时间比例与实际一致。", parent=root):
+            max_gap = 2 * max(config.interval, config.adaptive_max_interval)  # 超过该间隔视为两次截图会话之间的中断，不做填充
+            images = expand_images_by_capture_time(images, max_gap)
+            for res in grouped_images:
+                grouped_images[res] = expand_images_by_capture_time(grouped_images[res], max_gap)
+
+    if resolution_types == 1:
+        # 单分辨率导出
+        try:
+            first_image = decode_capture_frame(images[0])  # 解码为彩色图像
+            if first_image is None:
+                messagebox.showerror("错误", f"无法读取第一帧图片: {images[0]}")  # 显示错误消息
+                return  # 结束函数
+            height, width, _ = first_image.shape  # 获取图片尺寸
+        except Exception as e:
+            messagebox.showerror("错误", f"读取首帧图片失败: {e}", parent=root)  # 显示错误消息
+            return  # 结束函数
+
+        '''读取第一帧图片获取视频尺寸'''
+        try:
+            first_image = decode_capture_frame(images[0])  # 读取第一张图片（差分帧会还原为完整画面）
+            if first_image is None:  # 如果读取失败
+                messagebox.showerror("错误", f"无法读取第一帧图片: {images[0]}")  # 显示错误消息
+                return
+            height, width, _ = first_image.shape  # 获取图片尺寸
+        except Exception as e:  # 捕获所有异常
+            messagebox.showerror("错误", f"读取首帧图片失败: {e}", parent=root)  # 显示错误消息
+            return  # 结束函数
+
+        '''进度窗口'''
+        progress_window = tk.Toplevel(root)  # 创建进度窗口作为根窗口的子窗口
+        progress_window.title("正在导出视频...")  # 设置窗口标题
+        progress_window.geometry("450x300")  # 设置固定窗口大小
+        progress_window.resizable(False, False)  # 禁止调整窗口大小
+        progress_window.protocol("WM_DELETE_WINDOW", lambda: None)  # 禁用窗口关闭按钮
+
+        '''主框架容器'''
+        progress_frame = ttk.Frame(progress_window, padding=15)  # 带内边距的框架
+        progress_frame.pack(fill=tk.BOTH, expand=True)  # 填充整个窗口
+
+        '''标题标签'''
+        ttk.Label(progress_frame, text="正在导出视频...", font=("Arial", 10, "bold")).pack(anchor="w")  # 左对齐的粗体标题
+        ttk.Separator(progress_frame).pack(fill=tk.X, pady=5)  # 分隔线
+
+        '''进度条组件'''
+        progress_var = tk.DoubleVar(value=0)  # 进度值变量(0 - 100)
+        progress_bar = ttk.Progressbar(
+            progress_frame, 
+            variable=progress_var,  # 绑定变量
+            maximum=len(images),  # 最大值设为图片总数
+            length=350,  # 进度条长度
+            mode="determinate"  # 确定模式(有明确终点)
+        )
+        progress_bar.pack(fill=tk.X, pady=(0, 10))  # 填充水平空间
+
+        '''状态信息区域'''
+        status_frame = ttk.Frame(progress_frame)  # 状态信息容器
+        status_frame.pack(fill=tk.X, pady=(0, 15))  # 填充水平空间
+
+        '''左侧状态信息(百分比和文件数)'''
+        left_status = ttk.Frame(status_frame)  # 左侧容器
+        left_status.pack(side=tk.LEFT, fill=tk.X, expand=True)  # 左对齐
+        percent_var = tk.StringVar(value="0%")  # 百分比显示变量
+        ttk.Label(left_status, textvariable=percent_var, font=("Arial", 10)).pack(anchor="w")  # 百分比标签
+        files_var = tk.StringVar(value=f"0 / {len(images)} 文件已处理")  # 文件计数变量
+        ttk.Label(left_status, textvariable=files_var, font=("Arial", 9)).pack(anchor="w")  # 文件计数标签
+
+        '''右侧状态信息(分辨率)'''
+        size_info = ttk.Frame(status_frame)  # 右侧容器
+        size_info.pack(side=tk.RIGHT, fill=tk.X)  # 右对齐
+        res_var = tk.StringVar(value=f"{width}x{height}")  # 分辨率变量
+        ttk.Label(size_info, textvariable=res_var, font=("Arial", 9)).pack(anchor="e")  # 分辨率标签
+
+        '''剩余时间显示'''
+        time_frame = ttk.Frame(progress_frame)  # 时间信息容器
+        time_frame.pack(fill=tk.X)  # 填充水平空间
+        time_var = tk.StringVar(value="估计剩余时间: --:--")  # 剩余时间变量
+        ttk.Label(time_frame, textvariable=time_var, font=("Arial", 9)).pack(anchor="w")  # 剩余时间标签
+
+        cancel_flag = threading.Event()  # 创建线程事件对象，用于控制导出线程的取消
+
+        # 定义函数：取消导出
+        def cancel_export():
+            if messagebox.askyesno("确认取消", "你确定要取消视频导出吗？", parent=progress_window):  # 设置 parent 参数为父窗口以确保对话框居中
+                cancel_flag.set()  # 设置取消标志，通知所有工作线程停止
+
+        '''创建取消按钮区域'''
+        button_frame = ttk.Frame(progress_frame)  # 按钮容器框架
+        button_frame.pack(fill=tk.X, pady=(10, 0))  # 填充水平空间，上方留白 10 px
+
+        '''创建取消按钮'''
+        cancel_button = ttk.Button(
+            button_frame, 
+            text="取消导出",  # 按钮文本
+            command=cancel_export,  # 绑定点击事件处理函数
+            width=15  # 固定按钮宽度
+        )
+        cancel_button.pack(pady=5)  # 添加按钮，垂直方向留白 5 px
+
+        '''更新UI并设置窗口焦点'''
+        root.update_idletasks()  # 强制刷新UI，确保所有组件正确渲染
+        progress_window.grab_set()  # 设置模态窗口，阻止与其他窗口交互
+
+        update_queue = queue.Queue()  # 创建进度更新队列，用于工作线程向主线程传递进度更新
+
+        # 定义函数：UI更新循环
+        def update_from_queue():
+            if not progress_window.winfo_exists():  # 检查进度窗口是否仍然存在
+                return  # 如果窗口已关闭则停止更新
+            try:
+                while not update_queue.empty():
+                    current, total, remaining_time, _ = update_queue.get_nowait()  # 从队列获取进度数据(当前进度,总数,剩余时间,错误信息)
+                    percent = int(current * 100 / total)  # 计算并更新百分比显示
+                    percent_var.set(f"{percent}%")  # 更新百分比文本
+                    files_var.set(f"{current} / {total} 文件已处理")  # 更新已处理文件计数
+                    time_var.set(f"估计剩余时间: {format_time(remaining_time) if remaining_time is not None else '--:--'}")  # 更新剩余时间显示
+                    progress_var.set(current)  # 更新进度条值
+            except queue.Empty:  # 捕获队列为空的异常
+                pass  # 忽略空队列异常
+            finally:
+                if not (cancel_flag.is_set() or progress_var.get() >= len(images)):  # 检查是否应该继续更新(未取消且未完成)
+                    progress_window.after(100, update_from_queue)  # 100ms后再次调用自身实现持续更新
+
+        # 定义函数：启动导出任务
+        def start_export():
+            # 定义函数：导出任务包装器
+            def export_task_wrapper():
+                try:
+                    do_export_optimized(images, save_path, frame_rate, width, height, update_queue, cancel_flag)  # 调用核心导出函数
+                finally:
+                    if progress_window.winfo_exists():  # 确保完成后关闭进度窗口
+                        root.after(100, progress_window.destroy)  # 使用after确保在主线程执行UI操作
+            threading.Thread(target=export_task_wrapper, daemon=True).start()  # 创建并启动导出线程(守护线程)
+        progress_window.after(100, update_from_queue)  # 启动UI更新循环(100ms 后开始)
+        start_export()  # 启动导出任务
+
+    else:
+        # 多分辨率分组导出
+        progress_window = tk.Toplevel(root)  # 创建进度窗口作为根窗口的子窗口
+        progress_window.title("正在导出多个视频...")  # 设置窗口标题
+        progress_window.geometry("450x300")  # 设置固定窗口大小
+        progress_window.resizable(False, False)  # 禁止调整窗口大小
+        progress_window.protocol("WM_DELETE_WINDOW", lambda: None)  # 禁用窗口关闭按钮
+        progress_frame = ttk.Frame(progress_window, padding=15)  # 带内边距的框架
+        progress_frame.pack(fill=tk.BOTH, expand=True)  # 填充整个窗口
+        ttk.Label(progress_frame, text="正在按分辨率导出多个视频...", font=("Arial", 10, "bold")).pack(anchor="w")  # 左对齐的粗体标题
+        ttk.Separator(progress_frame).pack(fill=tk.X, pady=5)  # 分隔线
+
+        '''进度条（全局进度）'''
+        total_images_count = sum(len(imgs) for imgs in grouped_images.values())  # 计算所有分辨率组的总图片数量
+        progress_var = tk.DoubleVar(value=0)  # 进度值变量(0 - 总图片数)
+        progress_bar = ttk.Progressbar(
+            progress_frame,   # 进度条所在的框架
+            variable=progress_var,  # 绑定变量
+            maximum=total_images_count,  # 最大值设为所有图片总数
+            length=350,  # 进度条长度
+            mode="determinate"  # 确定模式(有明确终点)
+        )
+        progress_bar.pack(fill=tk.X, pady=(0, 10))  # 填充水平空间
+
+        '''状态信息'''
+        status_frame = ttk.Frame(progress_frame)  # 状态信息容器
+        status_frame.pack(fill=tk.X, pady=(0, 15))  # 填充水平空间
+
+        '''分辨率信息'''
+        res_var = tk.StringVar(value="当前分辨率: --")  # 分辨率显示变量
+        ttk.Label(status_frame, textvariable=res_var, font=("Arial", 10)).pack(anchor="w")  # 分辨率标签
+
+        '''文件计数'''
+        files_var = tk.StringVar(value=f"0 / {total_images_count} 文件已处理")  # 文件计数变量
+        ttk.Label(status_frame, textvariable=files_var, font=("Arial", 9)).pack(anchor="w")  # 文件计数标签
+
+        '''取消按钮'''
+        cancel_flag = threading.Event()  # 创建线程事件对象，用于控制导出线程的取消
+        def cancel_export():
+            if messagebox.askyesno("确认取消", "确定要取消视频导出吗？", parent=progress_window):
+                cancel_flag.set()  # 设置取消标志，通知所有工作线程停止
+        button_frame = ttk.Frame(progress_frame)  # 按钮容器框架
+        button_frame.pack(fill=tk.X, pady=(10, 0))  # 填充水平空间，上方留白 10 px
+        cancel_button = ttk.Button(button_frame, text="取消导出", command=cancel_export, width=15)  # 创建取消按钮
+        cancel_button.pack(pady=5)  # 添加按钮，垂直方向留白 5 px
+
+        '''更新UI'''
+        root.update_idletasks()  # 强制刷新UI，确保所有组件正确渲染
+        progress_window.grab_set()  # 设置模态窗口，阻止与其他窗口交互
+        update_queue = queue.Queue()  # 进度更新队列
+
+        # 定义函数：导出任务
+        def export_task():
+            try:
+                base_path, ext = os.path.splitext(save_path)  # 生成新文件名模板
+                current_count = 0  # 当前已处理图片计数
+
+                '''按分辨率分组导出'''
+                for i, (resolution, img_paths) in enumerate(grouped_images.items()):
+                    if cancel_flag.is_set():
+                        break  # 如果取消标志被设置，跳出循环
+                    w, h = resolution  # 获取当前分辨率
+                    res_var.set(f"当前分辨率: {w}x{h} (视频 {i+1}/{len(grouped_images)})")  # 更新分辨率信息
+                    new_save_path = f"{base_path}_{w}x{h}{ext}"  # 生成新文件名
+                    do_export_optimized(img_paths, new_save_path, frame_rate, w, h, update_queue, cancel_flag, base_count=current_count, total_count=total_images_count)  # 调用核心导出函数
+                    current_count += len(img_paths)  # 更新累计进度
+            finally:
+                if progress_window.winfo_exists():
+                    progress_window.destroy()  # 确保完成后关闭进度窗口
+                messagebox.showinfo("导出完成", f"成功导出 {len(grouped_images)} 个分辨率视频！", parent=root)  # 显示导出完成消息
+
+        # UI更新函数
+        def update_from_queue():
+            if not progress_window.winfo_exists():
+                return  # 检查进度窗口是否仍然存在
+            try:
+                while not update_queue.empty():
+                    current, total, remaining_time, error_info = update_queue.get_nowait()  # 从队列获取进度数据(当前进度,总数,剩余时间,错误信息)
+                    progress_var.set(current)  # 更新进度条
+                    files_var.set(f"{current} / {total} 文件已处理")  # 更新文件计数
+                    if error_info:
+                        # messagebox functions may not accept a 'parent' kw in some environments; omit it
+                        run_in_main_thread(messagebox.showwarning, "处理警告", error_info)  # 如果有错误信息，显示警告对话框
+            except queue.Empty:
+                pass  # 捕获队列为空的异常
+            
+            '''检查导出是否完成'''
+            if progress_var.get() >= total_images_count or cancel_flag.is_set():
+                if progress_window.winfo_exists():  # 如果进度窗口仍然存在
+                    progress_window.destroy()  # 关闭进度窗口
+            else:
+                progress_window.after(100, update_from_queue)  # 100ms后再次调用自身实现持续更新
+        threading.Thread(target=export_task, daemon=True).start()  # 启动更新线程和导出线程
+        progress_window.after(100, update_from_queue)  # 启动UI更新循环(100ms后开始)
+
+# 定义函数：退出程序时的处理函数
+def on_quit(icon):
+    stop_screenshotting(icon)  # 停止截图功能
+    close_capture_process()  # 截图进程写完剩余的截图后退出
+    if capture_thread is not None:
+        capture_thread.join(timeout=CapturePipeline.CLOSE_TIMEOUT)  # 等待流水线中剩余的截图写入磁盘（与流水线关闭时的等待时间一致）
+    config.flush_manifest()  # 退出前持久化截图计数清单
+    icon.stop()  # 停止托盘图标
+    root.quit()  # 退出 Tkinter 主循环
+
+# 定义函数：获取当前保存目录下的项目文件夹
+def get_project_names():
+    if not os.path.isdir(config.base_save_path):
+        return []
+
+    project_names = []
+    try:
+        for project_name in os.listdir(config.base_save_path):
+            project_path = os.path.join(config.base_save_path, project_name)
+            if os.path.isdir(project_path):
+                project_names.append(project_name)
+    except OSError:
+        return []
+
+    return sorted(project_names, key=str.casefold)
+
+# 定义函数：校验项目名称
+def validate_project_name(project_name):
+    if not project_name:
+        return "项目名不能为空。"
+    if project_name in (".", ".."):
+        return "项目名不能为 . 或 ..。"
+    if re.search(r'[<>:"/\\|?*]', project_name) or any(ord(ch) < 32 for ch in project_name):
+        return '项目名不能包含以下字符：< > : " / \\ | ? *'
+    if project_name.endswith("."):
+        return "项目名不能以英文句号结尾。"
+
+    reserved_names = {"CON", "PRN", "AUX", "NUL"}
+    reserved_names.update({f"COM{i}" for i in range(1, 10)})
+    reserved_names.update({f"LPT{i}" for i in range(1, 10)})
+    if project_name.split(".")[0].upper() in reserved_names:
+        return "该项目名是 Windows 保留名称，请换一个名称。"
+
+    return None
+
+# 定义函数：切换项目
+def switch_project(project_name, icon=None):
+    new_project_path = os.path.join(config.base_save_path, project_name)  # 构建新的项目路径
+    if not os.path.isdir(new_project_path):
+        messagebox.showwarning("项目不存在", f"项目文件夹不存在或已被删除: {project_name}", parent=root)
+        return
+
+    '''更新当前项目配置'''
+    config.project_path = new_project_path  # 更新项目路径
+    config.project_name = project_name  # 更新项目名称
+    if capture_process is not None:
+        try:
+            capture_process.switch_project(project_name, new_project_path)  # 截图进程维护自己的计数
+        except (OSError, EOFError, TimeoutError) as e:
+            messagebox.showwarning("切换项目", f"截图进程没有响应，下次开始截图时使用新项目: {e}", parent=root)
+        config.manifest = None  # 本进程中的计数清单可能已经过时，不能写回旧项目
+    config.initialize_folder_counter()  # 切换后重新同步当前项目的子文件夹计数
+    if icon is not None:
+        update_menu(icon)
+
+    messagebox.showinfo("切换成功", f"已切换到项目: {project_name}", parent=root)  # 显示切换成功消息
+
+# 定义函数：弹出新建项目对话框，返回 (项目名, 目录结构)，取消时返回 None
+def ask_project_name():
+    dialog = tk.Toplevel(root)
+    dialog.title("新建项目")
+    dialog.geometry("420x210")
+    dialog.resizable(False, False)
+    dialog.transient(root)
+    dialog.grab_set()
+
+    result = {"value": ""}
+    confirmed = {"value": False}
+    name_var = tk.StringVar()
+
+    main_frame = ttk.Frame(dialog, padding=16)
+    main_frame.pack(fill="both", expand=True)
+
+    ttk.Label(main_frame, text="请输入项目名：").pack(anchor="w")
+    name_entry = ttk.Entry(main_frame, textvariable=name_var, width=46)
+    name_entry.pack(fill="x", pady=(8, 10))
+
+    ttk.Label(main_frame, text="目录结构：").pack(anchor="w")
+    layout_var = tk.StringVar(value=NUMBERED_LAYOUT)  # 按日期/小时结构便于按时间查找和导出
+    ttk.Combobox(main_frame, textvariable=layout_var, values=PROJECT_LAYOUTS, state="readonly").pack(fill="x", pady=(8, 18))
+
+    button_frame = ttk.Frame(main_frame)
+    button_frame.pack(anchor="e")
+
+    def confirm(event=None):
+        confirmed["value"] = True
+        result["value"] = (name_var.get(), layout_var.get())
+        dialog.destroy()
+
+    def cancel(event=None):
+        dialog.destroy()
+
+    ttk.Button(button_frame, text="确定", command=confirm, width=10).pack(side="left", padx=(0, 8))
+    ttk.Button(button_frame, text="取消", command=cancel, width=10).pack(side="left")
+
+    dialog.bind("<Return>", confirm)
+    dialog.bind("<Escape>", cancel)
+    dialog.protocol("WM_DELETE_WINDOW", cancel)
+
+    dialog.update_idletasks()
+    width = dialog.winfo_width()
+    height = dialog.winfo_height()
+    x = (dialog.winfo_screenwidth() - width) // 2
+    y = (dialog.winfo_screenheight() - height) // 2
+    dialog.geometry(f"{width}x{height}+{x}+{y}")
+    dialog.deiconify()
+    dialog.attributes("-topmost", True)
+    dialog.after(200, lambda: dialog.attributes("-topmost", False))
+    dialog.lift()
+    name_entry.focus_set()
+    root.wait_window(dialog)
+
+    return result["value"] if confirmed["value"] else None
+
+# 定义函数：新建项目
+def create_project(icon=None):
+    while True:
+        answer = ask_project_name()
+        if answer is None:
+            return
+
+        project_name, layout = answer
+        project_name = project_name.strip()
+        error_message = validate_project_name(project_name)
+        if error_message:
+            messagebox.showwarning("项目名无效", error_message, parent=root)
+            continue
+
+        project_path = os.path.join(config.base_save_path, project_name)
+        if os.path.exists(project_path):
+            messagebox.showwarning("项目已存在", f"项目已存在: {project_name}", parent=root)
+            continue
+
+        try:
+            os.makedirs(project_path, exist_ok=False)
+            save_project_layout(project_path, layout)  # 记录项目的目录结构
+        except OSError as e:
+            messagebox.showerror("创建失败", f"无法创建项目文件夹:\n{e}", parent=root)
+            return
+
+        config.project_name = project_name
+        config.project_path = project_path
+        config.initialize_folder_counter()
+        if icon is not None:
+            update_menu(icon)
+        messagebox.showinfo("创建成功", f"已创建并切换到项目: {project_name}", parent=root)
+        return
+
+# 定义函数：生成项目菜单项
+def project_menu_items(icon):
+    def create_project_action(icon, menu_item):
+        create_project(icon)
+
+    menu_items = [
+        item("新建项目...", create_project_action),
+        pystray.Menu.SEPARATOR
+    ]
+
+    project_names = get_project_names()
+    if not project_names:
+        menu_items.append(item("(无项目)", None, enabled=False))
+        return tuple(menu_items)
+
+    def make_project_item(project_name):
+        def switch_project_action(icon, menu_item):
+            switch_project(project_name, icon)
+
+        def is_current_project(menu_item):
+            return config.project_name == project_name
+
+        return item(project_name, switch_project_action, checked=is_current_project)
+
+    menu_items.extend(make_project_item(name) for name in project_names)
+    return tuple(menu_items)
+
+# 定义函数：获取项目菜单快照
+def get_project_menu_snapshot():
+    return config.base_save_path, tuple(get_project_names())
+
+# 定义函数：监听项目目录变化并刷新托盘菜单
+def watch_project_menu_changes(icon):
+    last_snapshot = get_project_menu_snapshot()
+    while True:
+        time.sleep(0.5)
+        try:
+            current_snapshot = get_project_menu_snapshot()
+            if current_snapshot != last_snapshot:
+                last_snapshot = current_snapshot
+                update_menu(icon)
+        except Exception:
+            pass
+
+# 定义函数：生成环形缓冲的菜单项（仅在环形缓冲模式下显示）
+def flight_recorder_menu_items():
+    if config.storage_mode != "环形缓冲" and flight_recorder is None:
+        return ()
+    return (
+        item(get_flight_recorder_status_text, None, enabled=False),  # 文本在每次打开菜单时刷新
+        item("保存缓冲区截图", lambda: save_flight_recorder()),
+    )
+
+# 定义函数：更新托盘菜单
+def update_menu(icon):
+    status_text = "运行中" if config.is_running else "已停止"  # 获取当前状态文本
+    start_stop_text = "停止截图" if config.is_running else "开始截图"  # 获取开始/停止按钮文本
+    start_stop_action = lambda: stop_screenshotting(icon) if config.is_running else start_screenshotting(icon)  # 定义开始/停止按钮的操作
+
+    '''创建包含所有项目的主菜单'''
+    icon.menu = pystray.Menu(
+        item(f"状态: {status_text}", None, enabled=False),
+        pystray.Menu.SEPARATOR,
+        item(start_stop_text, start_stop_action),
+        *flight_recorder_menu_items(),
+        item(get_disk_usage_status_text, lambda: run_in_main_thread(show_disk_usage, icon)),  # 文本在每次打开菜单时刷新，点击显示详情
+        item("切换项目", pystray.Menu(lambda: project_menu_items(icon))),
+        item("清理冗余截图", lambda: clean_nonstandard_frame(config.project_path)),
+        item("导出为视频", lambda: run_in_main_thread(export_to_video, icon)),
+        item("采集后端测速", lambda: show_capture_backend_benchmark(icon)),
+        item("编码器测速", lambda: show_image_encoder_benchmark(icon)),
+        item("截图节拍统计", lambda: run_in_main_thread(show_capture_schedule_stats, icon)),
+        item("截图耗时分析", lambda: run_in_main_thread(show_capture_latency_report, icon)),
+        *((item("打开实时预览", lambda: open_preview(icon)),) if config.preview_port else ()),
+        item("高频截图自测", lambda: show_capture_throughput_test(icon)),
+        item("内存分配自测", lambda: show_allocation_test(icon)),
+        item("设置", lambda: open_settings_window(icon)),
+        pystray.Menu.SEPARATOR,
+        item("退出", lambda: on_quit(icon))
+    )
+
+# 定义函数：检查进程是否在运行
+def main():
+    set_dpi_aware()  # 设置DPI感知
+    global root  # 声明全局变量root
+    root = tk.Tk()  # 创建主Tkinter窗口
+    root.withdraw()  # 隐藏主窗口
+    check_auto_start()  # 检查当前是否已设置开机自启
+    icon_image = create_icon("off")  # 创建初始托盘图标
+    icon = pystray.Icon("FrameKeeper", icon_image, "FrameKeeper")  # 创建托盘图标对象
+    update_menu(icon)  # 更新托盘菜单
+    threading.Thread(target=recover_staged_captures, daemon=True).start()  # 搬运上次异常退出时留在本地暂存目录中的截图
+    project_menu_watcher_thread = threading.Thread(target=watch_project_menu_changes, args=(icon,), daemon=True)
+    project_menu_watcher_thread.start()
+    def run_icon(icon):  # 定义托盘图标运行函数
+        icon.run()  # 启动托盘图标
+    pystray_thread = threading.Thread(target=run_icon, args=(icon,), daemon=True)  # 创建托盘图标线程
+    pystray_thread.start()  # 启动托盘图标线程
+    root.mainloop()  # 启动Tkinter主循环
+
+'''确保脚本作为主程序运行'''
+# 定义函数：命令行运行内存分配自测（使用合成画面和临时配置，不需要桌面环境），全部通过时返回 0
+def run_allocation_test_cli(formats):
+    global config
+    temp_dir = tempfile.mkdtemp(prefix="framekeeper_alloctest_")
+    try:
+        config = Config(os.path.join(temp_dir, "config.ini"))
+        config.capture_backend = "合成画面"
+        passed = True
+        for image_format in formats or [config.format]:
+            config.format = image_format
+            result = run_allocation_test()
+            print(json.dumps(result, ensure_ascii=False))
+            passed = passed and result["passed"]
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return 0 if passed else 1
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # 打包为 exe 后启动截图进程时需要
+    if sys.argv[1:2] == ["--allocation-test"]:  # 命令行内存分配自测：--allocation-test [图片格式 ...]
+        sys.exit(run_allocation_test_cli(sys.argv[2:]))
+    try:
+        temp_dir = os.environ.get("TEMP", os.path.expanduser("~"))  # 获取临时目录路径
+        lock_file_path = os.path.join(temp_dir, "framekeeper.lock")  # 定义锁文件路径
+        if os.path.exists(lock_file_path):  # 如果锁文件已存在
+            with open(lock_file_path, "r") as f:  # 打开锁文件
+                existing_pid = f.read().strip()  # 读取锁文件中的进程ID
+            if existing_pid and is_pid_running(existing_pid):  # 如果锁文件中的进程ID存在且进程仍在运行
+                if os.name == "nt":
+                    ctypes.windll.user32.MessageBoxW(0, "FrameKeeper 已在运行中。", "错误", 0x10)  # 显示错误消息框
+                else:
+                    print("FrameKeeper 已在运行中。", file=sys.stderr)
+                sys.exit(1)  # 退出程序
+            else:  # 如果锁文件中的进程ID不存在或进程已结束
+                os.remove(lock_file_path)  # 删除锁文件
+        with open(lock_file_path, "w") as f:  # 创建或覆盖锁文件
+            f.write(str(os.getpid()))  # 写入当前进程ID到锁文件
+        config_dir = os.path.join(os.path.expanduser("~"), "AppData", "Roaming", "FrameKeeper")  # 定义配置文件目录路径
+        if not os.path.exists(config_dir):  # 如果配置目录不存在
+            os.makedirs(config_dir)  # 创建配置目录
+        config_file = os.path.join(config_dir, "config.ini")  # 定义配置文件路径
+        config = Config(config_file)  # 创建配置对象
+        main()  # 启动主程序
+    finally:  # 确保在程序退出时删除锁文件
+        if os.path.exists(lock_file_path):  # 如果锁文件仍然存在
+            os.remove(lock_file_path)  # 删除锁文件